@@ -6,17 +6,22 @@ Portado completo desde bot.py monolítico.
 
 import os
 import json
+import time
+import hashlib
+import asyncio
 import anthropic
 import pytz
 from datetime import datetime
-from config import ANTHROPIC_API_KEY, DEFAULT_MODEL, MAX_HISTORY, MAX_TOOL_ROUNDS, MAX_TOKENS_NORMAL, MAX_TOKENS_DOCUMENT, logger
-from tools_registry import TOOLS_SCHEMA, execute_tool, user_locations
-from memory_manager import get_all_facts, get_fact, save_fact
+from config import ANTHROPIC_API_KEY, DEFAULT_MODEL, MAX_HISTORY, MAX_TOOL_ROUNDS, MAX_TOKENS_NORMAL, MAX_TOKENS_DOCUMENT, STREAM_RESPONSES, MAX_PARALLEL_TOOLS, MAX_HISTORY_TOKENS, CHARS_PER_TOKEN, IMAGE_TOKENS, COMPACT_TOOL_RESULT_CHARS, MORNING_SOURCE_TIMEOUT, logger
+from tools_registry import TOOLS_SCHEMA, execute_tool, get_tool_policy, user_locations
+from memory_manager import get_all_facts, get_all_facts_async, get_fact, get_fact_async, save_fact
+from telegram_stream import TelegramStreamWriter
+from conversation_store import ConversationStore, compact_block, summarize_text
 
 client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
 
-# --- HISTORIAL EN MEMORIA ---
-conversation_history = {}
+# --- HISTORIAL (LRU en memoria + PostgreSQL/SQLite) ---
+conversation_store = ConversationStore()
 
 # --- USER MODES ---
 user_modes = {}
@@ -77,18 +82,123 @@ def _next_is_tool_result(messages, index):
     return False
 
 
-def trim_history_safe(messages, max_length=20):
-    """Recorta historial sin romper pares tool_use/tool_result."""
-    if len(messages) <= max_length:
-        return messages
-    trimmed = messages[-max_length:]
+def trim_history_safe(messages, max_length=20, max_tokens=None):
+    """
+    Recorta historial sin romper pares tool_use/tool_result.
+    Con max_tokens además respeta un presupuesto de tokens: primero compacta los
+    bloques grandes más viejos (transcripciones, documentos, tool_results) y si
+    no alcanza descarta turnos completos desde el inicio.
+    """
+    trimmed = messages
+    if len(messages) > max_length:
+        trimmed = _drop_orphans(messages[-max_length:]) or messages[-2:]
+    if max_tokens:
+        trimmed = _fit_token_budget(trimmed, max_tokens)
+    return trimmed
+
+
+def _drop_orphans(trimmed):
     # No empezar con un tool_result suelto
     while trimmed and _is_tool_result_message(trimmed[0]):
         trimmed = trimmed[1:]
     # No empezar con un tool_use sin su tool_result después
     while trimmed and _is_tool_use_message(trimmed[0]) and not _next_is_tool_result(trimmed, 0):
         trimmed = trimmed[1:]
-    return trimmed if trimmed else messages[-2:]
+    return trimmed
+
+
+# --- Estimación de tokens (local, sin llamar a la API) ---
+
+def _text_tokens(text):
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def _block_tokens(block):
+    if isinstance(block, str):
+        return _text_tokens(block)
+    if not isinstance(block, dict):
+        return _text_tokens(str(block))
+    btype = block.get('type')
+    if btype == 'image':
+        return IMAGE_TOKENS
+    if btype == 'tool_use':
+        return _text_tokens(block.get('name', '') + json.dumps(block.get('input', {}), ensure_ascii=False))
+    if btype == 'tool_result':
+        content = block.get('content', '')
+        if isinstance(content, list):
+            return sum(_block_tokens(b) for b in content)
+        return _text_tokens(str(content))
+    return _text_tokens(block.get('text', ''))
+
+
+def estimate_tokens(messages):
+    """Tokens aproximados de una lista de mensajes (sin el system prompt)."""
+    total = 0
+    for msg in messages:
+        content = msg.get('content', '')
+        if isinstance(content, list):
+            total += sum(_block_tokens(b) for b in content) + 4
+        else:
+            total += _block_tokens(content) + 4
+    return total
+
+
+def _compact_message(msg):
+    content = msg.get('content')
+    if isinstance(content, str):
+        return {**msg, "content": summarize_text(content, COMPACT_TOOL_RESULT_CHARS)}
+    if isinstance(content, list):
+        compacted = []
+        for block in content:
+            if isinstance(block, dict) and block.get('type') == 'text':
+                block = {**block, "text": summarize_text(block.get('text', ''), COMPACT_TOOL_RESULT_CHARS)}
+            else:
+                block = compact_block(block, COMPACT_TOOL_RESULT_CHARS)
+            compacted.append(block)
+        return {**msg, "content": compacted}
+    return msg
+
+
+def _fit_token_budget(messages, max_tokens):
+    """
+    Ajusta el historial a max_tokens. El último mensaje (el turno actual) nunca se toca.
+    1. Compacta del más viejo al más nuevo los mensajes grandes
+    2. Si sigue excediendo, descarta turnos desde el inicio (sin romper pares)
+    """
+    total = estimate_tokens(messages)
+    if total <= max_tokens:
+        return messages
+
+    messages = list(messages)
+    big = COMPACT_TOOL_RESULT_CHARS / CHARS_PER_TOKEN * 2
+    for i in range(len(messages) - 1):
+        if total <= max_tokens:
+            return messages
+        before = estimate_tokens([messages[i]])
+        if before > big:
+            messages[i] = _compact_message(messages[i])
+            total -= before - estimate_tokens([messages[i]])
+
+    while total > max_tokens and len(messages) > 1:
+        messages = _drop_orphans(messages[1:]) or messages[-1:]
+        # Empezar siempre en un turno del usuario
+        while len(messages) > 1 and messages[0].get('role') != 'user':
+            messages = _drop_orphans(messages[1:]) or messages[-1:]
+        total = estimate_tokens(messages)
+
+    logger.info(f"✂️ Historial ajustado a ~{total} tokens ({len(messages)} mensajes)")
+    return messages
+
+
+def get_history_token_limit(chat_id):
+    """Techo de tokens del historial para este chat (fact System_History_Tokens_<id>)."""
+    try:
+        value = get_fact(f"System_History_Tokens_{chat_id}")
+        if value:
+            return int(value)
+    except Exception as e:
+        logger.warning(f"Error leyendo techo de tokens: {e}")
+    return MAX_HISTORY_TOKENS
 
 
 # =====================================================
@@ -123,45 +233,11 @@ def serialize_content(content_obj):
 # SYSTEM PROMPT BUILDER
 # =====================================================
 
-def build_system_prompt(chat_id):
-    """Construye el system prompt completo con contexto dinámico."""
-    tz = pytz.timezone('America/Costa_Rica')
-    now = datetime.now(tz)
-
-    # Cargar memoria persistente
-    all_facts = get_all_facts() or {}
-    memory_text = ""
-    if all_facts:
-        memory_lines = [f"- {k}: {v}" for k, v in all_facts.items()
-                        if not k.startswith("System_Location")]
-        if memory_lines:
-            memory_text = "\n=== MEMORIA PERSISTENTE (datos que el usuario me pidió recordar) ===\n" + "\n".join(memory_lines) + "\n"
-
-    # Ubicación
-    from config import DEFAULT_LOCATION
-    loc = user_locations.get(chat_id, DEFAULT_LOCATION)
-
-    # Modo
-    current_mode = user_modes.get(chat_id, "normal")
-    mode_instruction = "MODO: NORMAL ⚡. Sé breve."
-    if current_mode == "profundo":
-        mode_instruction = "MODO: PROFUNDO 🧘â€♀️. Analiza detalladamente."
-
-    # Mini-calendario de referencia (próximos 7 días)
-    from datetime import timedelta
-    dias_semana = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
-    week_ref = []
-    for i in range(7):
-        d = now + timedelta(days=i)
-        dia_nombre = dias_semana[d.weekday()]
-        prefix = "HOY" if i == 0 else ("MAÃ‘ANA" if i == 1 else dia_nombre.upper())
-        week_ref.append(f"  {prefix}: {dia_nombre} {d.strftime('%d/%m/%Y')}")
-    week_calendar = "\n".join(week_ref)
-
-    return f"""{CLAUDETTE_CORE}
+# Parte estática: se arma una sola vez al importar y se cachea en Anthropic.
+# NO meter aquí nada que cambie entre mensajes (hora, ubicación, memoria, modo).
+STATIC_SYSTEM_PROMPT = f"""{CLAUDETTE_CORE}
 {USER_PROFILE}
 {VIRTUDES_FUNDACIONALES}
-{memory_text}
 === BIBLIOTECA Y ESCRITOS DE PABLO ===
 Tienes acceso a los escritos, libros y biblioteca de Pablo en Google Drive.
 - Usa 'read_book_from_drive("INDICE_BIBLIOTECA")' para consultar qué hay disponible.
@@ -252,8 +328,61 @@ Pablo tiene una biblioteca indexada de ~2100 libros con extractos sustanciales.
 - Usa 'library_stats' para dar estadísticas generales.
 - IMPORTANTE: Cuando Pablo haga preguntas filosóficas, existenciales, o sobre cualquier tema intelectual, BUSCA PRIMERO en la biblioteca antes de responder genéricamente. Sus extractos son profundos y relevantes.
 - Cruza información entre libros cuando sea pertinente (ej: conectar a Han con Heidegger, o a Jung con Weil).
+"""
+
+CACHE = {"type": "ephemeral"}
+
+# Bloque de memoria versionado por hash de los facts (mismo hash → mismo texto → cache hit)
+_memory_block_cache = {"hash": None, "block": None}
+
+
+def _memory_block(facts=None):
+    """Bloque con la memoria persistente; None si no hay facts visibles."""
+    all_facts = (facts if facts is not None else get_all_facts()) or {}
+    memory_lines = [f"- {k}: {v}" for k, v in sorted(all_facts.items())
+                    if not k.startswith("System_")]
+    facts_hash = hashlib.sha1("\n".join(memory_lines).encode('utf-8')).hexdigest()
+    if facts_hash != _memory_block_cache["hash"]:
+        block = None
+        if memory_lines:
+            text = "=== MEMORIA PERSISTENTE (datos que el usuario me pidió recordar) ===\n" + "\n".join(memory_lines)
+            block = {"type": "text", "text": text, "cache_control": CACHE}
+        _memory_block_cache.update(hash=facts_hash, block=block)
+    return _memory_block_cache["block"]
+
+
+def build_system_prompt(chat_id, facts=None):
+    """
+    Construye el system prompt como lista de bloques para la API:
+    1. Estático (core, perfil, virtudes, guía de herramientas) — cacheado
+    2. Memoria persistente — cacheado, cambia solo cuando cambian los facts
+    3. Contexto dinámico (hora, ubicación, calendario, modo) — sin cache
+    """
+    tz = pytz.timezone('America/Costa_Rica')
+    now = datetime.now(tz)
+
+    # Ubicación
+    from config import DEFAULT_LOCATION
+    loc = user_locations.get(chat_id, DEFAULT_LOCATION)
+
+    # Modo
+    current_mode = user_modes.get(chat_id, "normal")
+    mode_instruction = "MODO: NORMAL ⚡. Sé breve."
+    if current_mode == "profundo":
+        mode_instruction = "MODO: PROFUNDO 🧘â€♀️. Analiza detalladamente."
+
+    # Mini-calendario de referencia (próximos 7 días)
+    from datetime import timedelta
+    dias_semana = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+    week_ref = []
+    for i in range(7):
+        d = now + timedelta(days=i)
+        dia_nombre = dias_semana[d.weekday()]
+        prefix = "HOY" if i == 0 else ("MAÃ‘ANA" if i == 1 else dia_nombre.upper())
+        week_ref.append(f"  {prefix}: {dia_nombre} {d.strftime('%d/%m/%Y')}")
+    week_calendar = "\n".join(week_ref)
 
-=== CONTEXTO ===
+    dynamic_context = f"""=== CONTEXTO ===
 ðŸ“… {now.strftime("%A %d-%m-%Y %H:%M")} (hora Costa Rica, UTC-6)
 ðŸ“ {loc['name']} (GPS: {loc['lat']}, {loc['lng']})
 
@@ -264,29 +393,113 @@ Pablo tiene una biblioteca indexada de ~2100 libros con extractos sustanciales.
 {mode_instruction}
 """
 
+    blocks = [{"type": "text", "text": STATIC_SYSTEM_PROMPT, "cache_control": CACHE}]
+    memory = _memory_block(facts)
+    if memory:
+        blocks.append(memory)
+    blocks.append({"type": "text", "text": dynamic_context})
+    return blocks
+
+
+# Métricas acumuladas del prompt cache (se loguean por respuesta)
+cache_stats = {"calls": 0, "input": 0, "cache_read": 0, "cache_write": 0}
+
+
+def log_cache_usage(response, label="chat"):
+    """Registra tokens leídos/escritos del prompt cache según response.usage."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    fresh = getattr(usage, "input_tokens", 0) or 0
+    cache_stats["calls"] += 1
+    cache_stats["input"] += fresh
+    cache_stats["cache_read"] += read
+    cache_stats["cache_write"] += write
+    total = read + write + fresh
+    hit = (read / total * 100) if total else 0
+    logger.info(f"💾 Prompt cache ({label}): read={read} write={write} input={fresh} → {hit:.0f}% desde cache")
+
 
 # =====================================================
 # CEREBRO PRINCIPAL
 # =====================================================
 
-async def process_chat(update, context, text, image_data=None):
+async def _call_claude(writer, **kwargs):
+    """
+    Llama a Claude. Sin writer espera la respuesta completa; con writer usa la API
+    de streaming y va empujando cada fragmento de texto al mensaje de Telegram.
+    En ambos casos retorna el Message final (con stop_reason y bloques tool_use).
+    """
+    if writer is None:
+        response = await client.messages.create(**kwargs)
+    else:
+        async with client.messages.stream(**kwargs) as stream:
+            async for delta in stream.text_stream:
+                await writer.append(delta)
+            response = await stream.get_final_message()
+    log_cache_usage(response)
+    return response
+
+
+async def _run_tool(block, chat_id, context, semaphore):
+    """Ejecuta un tool_use con su timeout; nunca lanza, retorna el texto del resultado."""
+    timeout = get_tool_policy(block.name)["timeout"]
+    async with semaphore:
+        try:
+            result = await asyncio.wait_for(execute_tool(block.name, block.input, chat_id, context), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Tool {block.name} excedió {timeout}s")
+            result = f"Error: {block.name} no respondió en {timeout}s"
+        except Exception as e:
+            result = f"Error: {str(e)}"
+    return str(result)
+
+
+async def _run_tool_round(blocks, chat_id, context):
+    """
+    Ejecuta los tool_use de una ronda. Los bloques consecutivos sin efectos secundarios
+    corren juntos con asyncio.gather (limitados por MAX_PARALLEL_TOOLS); los marcados
+    serial en TOOL_POLICIES corren solos, respetando el orden en que Claude los pidió.
+    Retorna los resultados en el mismo orden que blocks.
+    """
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_TOOLS)
+    results = []
+    batch = []
+    for block in blocks + [None]:
+        if block is not None and not get_tool_policy(block.name)["serial"]:
+            batch.append(block)
+            continue
+        if batch:
+            results.extend(await asyncio.gather(*(_run_tool(b, chat_id, context, semaphore) for b in batch)))
+            batch = []
+        if block is not None:
+            results.append(await _run_tool(block, chat_id, context, semaphore))
+    return results
+
+
+async def process_chat(update, context, text, image_data=None, stream=False):
     """
     Procesa un mensaje completo:
     1. Construye historial
     2. Llama a Claude con herramientas
     3. Loop multi-ronda (hasta MAX_TOOL_ROUNDS)
     4. Retorna texto final
+
+    Con stream=True (y STREAM_RESPONSES activo) la respuesta se publica en Telegram
+    mientras se genera; el caller NO debe volver a enviarla.
     """
     chat_id = update.effective_chat.id
-
-    if chat_id not in conversation_history:
-        conversation_history[chat_id] = []
+    writer = None
+    if stream and STREAM_RESPONSES:
+        writer = TelegramStreamWriter(context.bot, chat_id)
 
     # Recuperar ubicación guardada si no la tenemos
     if chat_id not in user_locations:
         try:
-            saved_lat = get_fact(f"System_Location_Lat_{chat_id}")
-            saved_lng = get_fact(f"System_Location_Lng_{chat_id}")
+            saved_lat = await get_fact_async(f"System_Location_Lat_{chat_id}")
+            saved_lng = await get_fact_async(f"System_Location_Lng_{chat_id}")
             if saved_lat and saved_lng:
                 user_locations[chat_id] = {
                     "lat": float(saved_lat),
@@ -305,16 +518,14 @@ async def process_chat(update, context, text, image_data=None):
             {"type": "text", "text": text}
         ]
 
-    messages = conversation_history[chat_id]
+    messages = list(await conversation_store.get(chat_id))
     messages.append({"role": "user", "content": user_msg_content})
 
-    # Safe trim
-    if len(messages) > MAX_HISTORY:
-        conversation_history[chat_id] = trim_history_safe(messages, MAX_HISTORY)
-        messages = conversation_history[chat_id]
+    # Safe trim (por cantidad de mensajes y por presupuesto de tokens)
+    messages = trim_history_safe(messages, MAX_HISTORY, get_history_token_limit(chat_id))
 
     try:
-        system_prompt = build_system_prompt(chat_id)
+        system_prompt = build_system_prompt(chat_id, facts=await get_all_facts_async())
 
         # Detectar si el mensaje pide generación de documentos → más tokens
         doc_keywords = ['documento', 'reporte', 'informe', 'bitácora', 'bitacora',
@@ -327,16 +538,22 @@ async def process_chat(update, context, text, image_data=None):
         needs_document = any(kw in text_lower for kw in doc_keywords)
         max_tokens = MAX_TOKENS_DOCUMENT if needs_document else MAX_TOKENS_NORMAL
 
+        if writer:
+            await writer.start()
+
         # Primera llamada a Claude
-        response = await client.messages.create(
+        response = await _call_claude(
+            writer,
             model=DEFAULT_MODEL,
             max_tokens=max_tokens,
-            system=[{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+            system=system_prompt,
             tools=TOOLS_SCHEMA,
             messages=messages
         )
 
         final_text = ""
+        # True si final_text ya se mostró vía streaming (no hay que volver a publicarlo)
+        final_streamed = writer is not None
 
         # Loop de herramientas (hasta MAX_TOOL_ROUNDS rondas)
         for round_num in range(MAX_TOOL_ROUNDS):
@@ -351,31 +568,34 @@ async def process_chat(update, context, text, image_data=None):
             clean_content = serialize_content(response.content)
             messages.append({"role": "assistant", "content": clean_content})
 
-            # Procesar herramientas
+            # Procesar herramientas (independientes en paralelo, con efectos en serie)
+            tool_blocks = [block for block in response.content if block.type == "tool_use"]
+            tool_names = ", ".join(block.name for block in tool_blocks)
+            logger.info(f"🔧 Tools (ronda {round_num + 1}): {tool_names}")
+            if writer:
+                await writer.set_status(f"🔧 {tool_names}...")
+            await context.bot.send_chat_action(chat_id=chat_id, action="typing")
+
+            tool_outputs = await _run_tool_round(tool_blocks, chat_id, context)
+
             tool_results = []
             deep_analysis_result = None
-            for block in response.content:
-                if block.type == "tool_use":
-                    logger.info(f"🔧 Tool (ronda {round_num + 1}): {block.name}")
-                    await context.bot.send_chat_action(chat_id=chat_id, action="typing")
-                    try:
-                        tool_result = await execute_tool(block.name, block.input, chat_id, context)
-                    except Exception as e:
-                        tool_result = f"Error: {str(e)}"
-                    # analyze_content_deep: usar su resultado directamente sin ronda extra
-                    if block.name == "analyze_content_deep":
-                        deep_analysis_result = str(tool_result)
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": block.id,
-                        "content": str(tool_result)
-                    })
+            for block, tool_result in zip(tool_blocks, tool_outputs):
+                # analyze_content_deep: usar su resultado directamente sin ronda extra
+                if block.name == "analyze_content_deep":
+                    deep_analysis_result = tool_result
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": tool_result
+                })
 
             messages.append({"role": "user", "content": tool_results})
 
             # Si analyze_content_deep fue el unico tool, devolver directo
             if deep_analysis_result and len(tool_results) == 1:
                 final_text = deep_analysis_result
+                final_streamed = False
                 break
 
             # Si se usó generate_document o generate_spreadsheet, asegurar tokens altos
@@ -384,10 +604,11 @@ async def process_chat(update, context, text, image_data=None):
                     max_tokens = MAX_TOKENS_DOCUMENT
 
             # Siguiente ronda
-            response = await client.messages.create(
+            response = await _call_claude(
+                writer,
                 model=DEFAULT_MODEL,
                 max_tokens=max_tokens,
-                system=[{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+                system=system_prompt,
                 tools=TOOLS_SCHEMA,
                 messages=messages
             )
@@ -399,6 +620,12 @@ async def process_chat(update, context, text, image_data=None):
 
         if not final_text:
             final_text = "✅ He procesado la solicitud."
+            final_streamed = False
+
+        if writer:
+            if not final_streamed:
+                await writer.append(final_text)
+            await writer.finish()
 
 
         # AUTO SELF-LEARNING: guardar decisiones en KB automaticamente
@@ -409,7 +636,8 @@ async def process_chat(update, context, text, image_data=None):
             _projs = ["midas", "arepartir", "claudette", "novela", "arquimath"]
             if any(t in _tl for t in _dtriggers):
                 _proj = next((p.capitalize() for p in _projs if p in _tl), "General")
-                kb_save_insight(
+                await asyncio.to_thread(
+                    kb_save_insight,
                     category="decision",
                     title=text[:80] if len(text) > 80 else text,
                     content="Pablo dijo: " + text + "\n\nRespuesta: " + final_text[:500],
@@ -420,17 +648,56 @@ async def process_chat(update, context, text, image_data=None):
             logger.warning("Self-learning error: " + str(_sl_err))
 
         messages.append({"role": "assistant", "content": final_text})
+        await conversation_store.save(chat_id, messages)
         return final_text
 
     except Exception as e:
         logger.error(f"Brain Error: {e}", exc_info=True)
-        return f"ðŸ¤¯ Error interno: {e}"
+        error_text = f"ðŸ¤¯ Error interno: {e}"
+        if writer:
+            try:
+                await writer.append("\n\n" + error_text)
+                await writer.finish()
+            except Exception as stream_err:
+                logger.warning(f"Stream error: {stream_err}")
+        return error_text
 
 
 # =====================================================
 # RESUMEN MATUTINO INTELIGENTE
 # =====================================================
 
+_SOURCE_UNAVAILABLE = "(no disponible hoy)"
+
+
+async def _gather_sources(sources):
+    """
+    Corre las fuentes bloqueantes del resumen en threads, todas a la vez.
+    sources: {nombre: (func, args, timeout)}. Una fuente que falla o excede su
+    timeout devuelve _SOURCE_UNAVAILABLE sin demorar a las demás.
+    Loguea la latencia de cada una para ver cuál es la lenta.
+    """
+    async def run(name, func, args, timeout):
+        t = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+            logger.info(f"🌅 Matutino {name}: {(time.perf_counter() - t) * 1000:.0f} ms")
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Matutino {name}: sin respuesta en {timeout}s")
+            result = _SOURCE_UNAVAILABLE
+        except Exception as e:
+            logger.warning(f"Morning {name} error ({(time.perf_counter() - t) * 1000:.0f} ms): {e}")
+            result = _SOURCE_UNAVAILABLE
+        return name, result
+
+    return dict(await asyncio.gather(*(run(name, *spec) for name, spec in sources.items())))
+
+
+def _book_of_the_day(day):
+    from library import get_book_of_the_day
+    return get_book_of_the_day(day)
+
+
 async def generate_morning_summary(chat_id):
     """
     Genera el resumen matutino completo pasando por Claude.
@@ -457,78 +724,56 @@ async def generate_morning_summary(chat_id):
     _fecha_es = f"{_dias[now.weekday()]} {now.day} de {_meses[now.month-1]} de {now.year}"
     raw_data.append(f"FECHA: {_fecha_es} — {now.strftime('%H:%M')} hora Costa Rica")
 
-    # Clima
-    try:
-        loc = user_locations.get(chat_id, DEFAULT_LOCATION)
-        weather = get_weather(loc['lat'], loc['lng'])
-        raw_data.append(f"\nCLIMA:\n{weather}")
-    except Exception as e:
-        logger.warning(f"Morning weather error: {e}")
+    # Clima, agenda, tareas, libro del día y Midas en paralelo
+    loc = user_locations.get(chat_id, DEFAULT_LOCATION)
+    start = now.replace(hour=0, minute=0, second=0).strftime("%Y-%m-%dT%H:%M:%S-06:00")
+    end = now.replace(hour=23, minute=59, second=59).strftime("%Y-%m-%dT%H:%M:%S-06:00")
+    sources = {
+        "clima": (get_weather, (loc['lat'], loc['lng']), MORNING_SOURCE_TIMEOUT),
+        "agenda": (google_calendar.get_calendar_events, (start, end), MORNING_SOURCE_TIMEOUT),
+        "tareas": (google_tasks.list_tasks, (False,), MORNING_SOURCE_TIMEOUT),
+        # Mismo libro si se reintenta el resumen
+        "biblioteca": (_book_of_the_day, (now.date(),), MORNING_SOURCE_TIMEOUT),
+    }
+    if _midas_available:
+        sources["midas"] = (generate_midas_report, (), MORNING_SOURCE_TIMEOUT)
+    t = time.perf_counter()
+    data = await _gather_sources(sources)
+    logger.info(f"🌅 Datos del matutino listos en {(time.perf_counter() - t) * 1000:.0f} ms")
 
-    # Agenda
-    try:
-        start = now.replace(hour=0, minute=0, second=0).strftime("%Y-%m-%dT%H:%M:%S-06:00")
-        end = now.replace(hour=23, minute=59, second=59).strftime("%Y-%m-%dT%H:%M:%S-06:00")
-        events = google_calendar.get_calendar_events(start, end)
-        if events and "No hay eventos" not in str(events):
-            raw_data.append(f"\nAGENDA DEL DÍA:\n{events}")
-        else:
-            raw_data.append("\nAGENDA: Sin eventos programados hoy.")
-    except Exception as e:
-        logger.warning(f"Morning calendar error: {e}")
+    raw_data.append(f"\nCLIMA:\n{data['clima']}")
 
-    # Tareas
-    try:
-        tasks = google_tasks.list_tasks(False)
-        if tasks and "No hay tareas" not in str(tasks):
-            raw_data.append(f"\nTAREAS PENDIENTES:\n{tasks}")
-    except Exception as e:
-        logger.warning(f"Morning tasks error: {e}")
+    events = data["agenda"]
+    if events and "No hay eventos" not in str(events):
+        raw_data.append(f"\nAGENDA DEL DÍA:\n{events}")
+    else:
+        raw_data.append("\nAGENDA: Sin eventos programados hoy.")
 
-    # --- BIBLIOTECA: Libro aleatorio del día ---
+    tasks = data["tareas"]
+    if tasks and "No hay tareas" not in str(tasks):
+        raw_data.append(f"\nTAREAS PENDIENTES:\n{tasks}")
+
+    # --- BIBLIOTECA: Libro del día ---
     book_data = ""
-    try:
-        from library import _get_conn
-        conn = _get_conn()
-        cur = conn.cursor()
-        # Seleccionar un libro al azar que tenga contenido sustancial
-        cur.execute("""
-            SELECT title, author, category, tags, content
-            FROM library
-            WHERE word_count > 200
-            ORDER BY RANDOM()
-            LIMIT 1
-        """)
-        row = cur.fetchone()
-        if row:
-            b_title, b_author, b_category, b_tags, b_content = row
-            b_tags_str = ', '.join(b_tags) if b_tags else ''
-            # Limitar contenido para no explotar tokens
-            if len(b_content) > 3000:
-                b_content = b_content[:3000] + "\n[...]"
-            book_data = f"""
+    book = data["biblioteca"]
+    if book == _SOURCE_UNAVAILABLE:
+        book_data = "\n(Biblioteca no disponible hoy)\n"
+    elif book:
+        b_tags_str = ', '.join(book['tags'])
+        book_data = f"""
 LIBRO DEL DÍA (seleccionado al azar de la biblioteca de Pablo):
-📖 Título: {b_title}
-👤 Autor: {b_author}
-📂 Categoría: {b_category}
+📖 Título: {book['title']}
+👤 Autor: {book['author']}
+📂 Categoría: {book['category']}
 🏷️ Tags: {b_tags_str}
 
 EXTRACTO:
-{b_content}
+{book['excerpt']}
 """
-        cur.close()
-        conn.close()
-    except Exception as e:
-        logger.warning(f"Morning library error: {e}")
-        book_data = "\n(Biblioteca no disponible hoy)\n"
 
-    if _midas_available:
-        try:
-            midas_report = generate_midas_report()
-            if midas_report:
-                raw_data.append("\nMIDAS MONITOR:\n" + midas_report)
-        except Exception as e:
-            logger.warning("Morning midas error: " + str(e))
+    midas_report = data.get("midas")
+    if midas_report and midas_report != _SOURCE_UNAVAILABLE:
+        raw_data.append("\nMIDAS MONITOR:\n" + midas_report)
 
     context_block = "\n".join(raw_data)
 
@@ -583,9 +828,10 @@ REGLAS:
         response = await client.messages.create(
             model=DEFAULT_MODEL,
             max_tokens=2048,
-            system=[{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}],
+            system=system,
             messages=[{"role": "user", "content": morning_prompt}]
         )
+        log_cache_usage(response, "morning")
 
         result = ""
         for block in response.content:
@@ -768,9 +1014,10 @@ REGLAS: basa todo en los datos, tono reflexivo y directo, si hay pocos datos dil
         response = await client.messages.create(
             model=DEFAULT_MODEL,
             max_tokens=2000,
-            system=[{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}],
+            system=system,
             messages=[{"role": "user", "content": synthesis_prompt}]
         )
+        log_cache_usage(response, "weekly")
         result = "".join(b.text for b in response.content if b.type == "text")
         return result if result else "No se pudo generar la sintesis semanal."
     except Exception as e:
@@ -29,6 +29,37 @@ MAX_TOOL_ROUNDS = 5
 MAX_TOKENS_NORMAL = 4096
 MAX_TOKENS_DOCUMENT = 16000  # Para generaciÃ³n de documentos largos
 
+# Streaming: la respuesta se publica y se edita en Telegram mientras Claude la genera
+STREAM_RESPONSES = os.environ.get('STREAM_RESPONSES', '1') != '0'
+STREAM_EDIT_INTERVAL = 1.5   # segundos minimos entre ediciones del mismo mensaje
+TELEGRAM_MAX_MESSAGE = 4000
+
+# Herramientas: varias tool_use de una misma ronda corren en paralelo
+TOOL_TIMEOUT = 60           # segundos por herramienta (override en TOOL_POLICIES)
+MAX_PARALLEL_TOOLS = 4
+
+# Historial de conversación (conversation_store): LRU en memoria + DB
+CONVERSATION_HOT_CHATS = 50         # chats que se mantienen en memoria
+CONVERSATION_MAX_BYTES = 256_000    # tope por chat (JSON serializado)
+CONVERSATION_RECENT_WINDOW = 6      # mensajes recientes que nunca se compactan
+COMPACT_TOOL_RESULT_CHARS = 600     # largo de un tool_result viejo tras compactarlo
+
+# Presupuesto de tokens del historial enviado a Claude (override por chat con /contexto)
+MAX_HISTORY_TOKENS = int(os.environ.get('MAX_HISTORY_TOKENS', '30000'))
+CHARS_PER_TOKEN = 3.5               # estimador local (texto mayormente en español)
+IMAGE_TOKENS = 1600                 # costo aproximado de una imagen 1024px
+
+# Watcher del vault de Obsidian: re-indexa en vivo las notas que cambian
+VAULT_WATCH = os.environ.get('VAULT_WATCH', '1') != '0'
+VAULT_WATCH_DEBOUNCE = 3.0          # segundos sin cambios antes de re-indexar el lote
+VAULT_WATCH_POLL_INTERVAL = 30      # fallback sin inotify (watchdog): escaneo por stat
+
+# Resumen matutino: cada fuente (clima, agenda, tareas, libro, Midas) corre en paralelo
+MORNING_SOURCE_TIMEOUT = 20         # segundos por fuente; si no responde se usa un texto de respaldo
+
+# verify_content: URL + Reddit/HN/web en paralelo; al vencer el plazo se analiza con lo que llegó
+VERIFY_DEADLINE = 20                # segundos totales para juntar fuentes (antes de la llamada a Claude)
+
 DEFAULT_LOCATION = {"lat": 9.9281, "lng": -84.0907, "name": "San JosÃ©, Costa Rica (Default)"}
 
 NEWS_TOPICS = [
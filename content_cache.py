@@ -0,0 +1,378 @@
+"""
+Caché de contenido web para Claudette Bot (fetch_url, Firecrawl, YouTube).
+Un link pegado lo leen fetch_url, después verify_content y después
+analyze_content_deep; un video lo transcriben get_youtube_transcript y la
+rama YouTube de fetch_url. Con esta caché cada uno se descarga una vez.
+
+- Clave: URL canónica. Sin parámetros de tracking (utm_*, fbclid, si, ...),
+  sin fragmento, query ordenada, host en minúsculas y sin "www.";
+  youtube.com/watch?v=ID, youtu.be/ID, shorts/ID y embed/ID → "youtube:ID".
+- Dos niveles: memoria (LRU con tope en bytes) y SQLite en disco (sobrevive
+  a un restart), comprimido con zstd si está instalado (si no, zlib).
+- TTL por tipo de contenido (CONTENT_TTLS): una transcripción no cambia,
+  una página sí. Tope de tamaño en disco con desalojo LRU.
+- Dos pedidos simultáneos de la misma URL → una sola descarga.
+
+Uso:
+    import content_cache
+    text = content_cache.cached_fetch("page", url, lambda: _download(url))
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger("claudette")
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+    _zstd_compressor = zstandard.ZstdCompressor(level=6)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+except ImportError:
+    ZSTD_AVAILABLE = False
+    logger.warning("🗜️ zstandard no instalado: caché de contenido comprimida con zlib")
+
+CONTENT_CACHE_PATH = os.environ.get(
+    "CONTENT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "content_cache.db"),
+)
+CONTENT_MEMORY_BYTES = 32 * 1024 * 1024     # tope del nivel en memoria (sin comprimir)
+CONTENT_DISK_BYTES = 256 * 1024 * 1024      # tope del nivel en disco (comprimido)
+EVICT_EVERY_WRITES = 50                     # cada cuántas escrituras se revisa el tope en disco
+
+# Segundos de vida por tipo de contenido
+CONTENT_TTLS = {
+    "page": 6 * 3600,            # HTML de un artículo: puede actualizarse
+    "firecrawl": 7 * 86400,      # cuesta plata: se reutiliza más tiempo
+    "tweet": 86400,
+    "transcript": 30 * 86400,    # la transcripción de un video no cambia
+    "video_meta": 7 * 86400,     # título/canal vía oEmbed
+}
+DEFAULT_TTL = 3600
+
+# Parámetros que no cambian el contenido
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "yclid", "mc_cid", "mc_eid",
+    "ref_src", "ref_url", "si", "feature", "_hsenc", "_hsmi", "spm", "cmpid", "smid", "smtyp",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+# Mensajes de sqlite3 que indican un problema permanente del archivo o del disco
+_PERSISTENT_DISK_ERRORS = ("readonly", "read-only", "disk is full", "unable to open",
+                           "disk i/o error", "not a database", "malformed")
+
+_YOUTUBE_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+
+_CACHE_DDL = """
+    CREATE TABLE IF NOT EXISTS content_cache (
+        key TEXT PRIMARY KEY,          -- tipo:url canónica
+        kind TEXT NOT NULL,
+        codec TEXT NOT NULL,           -- 'zstd' | 'zlib'
+        value BLOB NOT NULL,           -- JSON comprimido
+        size INTEGER NOT NULL,         -- bytes comprimidos
+        expires_at REAL NOT NULL,      -- epoch
+        accessed_at REAL NOT NULL
+    )
+"""
+
+
+# =====================================================
+# URL CANÓNICA
+# =====================================================
+
+def _youtube_id(host, path, query):
+    if host == "youtu.be":
+        candidate = path.strip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        parts = path.strip("/").split("/")
+        if parts[0] == "watch":
+            candidate = dict(query).get("v", "")
+        elif parts[0] in ("shorts", "embed", "live", "v") and len(parts) > 1:
+            candidate = parts[1]
+        else:
+            return None
+    else:
+        return None
+    return candidate if len(candidate) == 11 else None
+
+
+def canonical_url(url):
+    """
+    URL normalizada para usar como clave:
+    "https://www.Example.com/a/?utm_source=x&b=2&a=1#top" → "https://example.com/a?a=1&b=2".
+    Los videos de YouTube quedan como "youtube:ID".
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url if "://" in url else "https://" + url)
+        host = (parts.hostname or "").lower().removeprefix("www.")
+        port = parts.port
+    except ValueError:
+        return url   # no parsea (p. ej. IPv6 mal formada): la URL tal cual
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+
+    video_id = _youtube_id(host, parts.path, query)
+    if video_id:
+        return f"youtube:{video_id}"
+
+    if host in ("twitter.com", "mobile.twitter.com", "mobile.x.com"):
+        host = "x.com"
+    if host == "x.com":
+        query = []   # ?s=20&t=... de "compartir": el tweet es el mismo
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", netloc, path, urlencode(sorted(query)), ""))
+
+
+# =====================================================
+# SERIALIZACIÓN
+# =====================================================
+
+def _encode(value):
+    raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    if ZSTD_AVAILABLE:
+        return "zstd", _zstd_compressor.compress(raw), len(raw)
+    return "zlib", zlib.compress(raw, 6), len(raw)
+
+
+def _decode(codec, blob):
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise ValueError("entrada zstd sin zstandard instalado")
+        raw = _zstd_decompressor.decompress(blob)
+    else:
+        raw = zlib.decompress(blob)
+    return json.loads(raw)
+
+
+# =====================================================
+# CACHÉ
+# =====================================================
+
+class ContentCache:
+    def __init__(self, path=CONTENT_CACHE_PATH, memory_bytes=CONTENT_MEMORY_BYTES,
+                 disk_bytes=CONTENT_DISK_BYTES):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()   # key → (expira_en epoch, valor, bytes)
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}           # key → Lock: una sola descarga por URL
+        self._ready = False
+        self._disk_ok = True
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evicted": 0}
+
+    # --- memoria ---
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._drop_memory(key)
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _drop_memory(self, key):
+        entry = self._memory.pop(key, None)
+        if entry:
+            self._memory_size -= entry[2]
+
+    def _put_memory(self, key, expires_at, value, size):
+        if size > self.memory_bytes // 4:
+            return   # una transcripción enorme no desaloja todo lo demás: queda solo en disco
+        with self._lock:
+            self._drop_memory(key)
+            self._memory[key] = (expires_at, value, size)
+            self._memory_size += size
+            while self._memory_size > self.memory_bytes:
+                _, (_, _, dropped) = self._memory.popitem(last=False)
+                self._memory_size -= dropped
+
+    # --- disco ---
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_CACHE_DDL)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_content_cache_accessed ON content_cache (accessed_at)")
+            conn.commit()
+            self._ready = True
+        return closing(conn)
+
+    def _disk_error(self, e):
+        """
+        Errores que no se van a arreglar solos (disco de solo lectura o lleno,
+        archivo corrupto, DDL fallida) deshabilitan el nivel en disco: se sigue
+        solo con memoria. El resto (p. ej. "database is locked") se loguea y
+        la operación se saltea.
+        """
+        message = str(e).lower()
+        persistent = "locked" not in message and (
+            not self._ready or any(m in message for m in _PERSISTENT_DISK_ERRORS)
+        )
+        if not persistent:
+            logger.warning(f"🗜️ Caché de contenido en disco: {e}")
+            return
+        if self._disk_ok:
+            logger.warning(f"🗜️ Caché de contenido en disco deshabilitada: {e}")
+        self._disk_ok = False
+
+    def _get_disk(self, key):
+        if not self._disk_ok:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT codec, value, expires_at FROM content_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if not row:
+                    return None
+                codec, blob, expires_at = row
+                if expires_at < time.time():
+                    conn.execute("DELETE FROM content_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute("UPDATE content_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            return expires_at, _decode(codec, blob)
+        except Exception as e:
+            self._disk_error(e)
+            return None
+
+    def _put_disk(self, key, kind, expires_at, codec, blob):
+        if not self._disk_ok:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO content_cache (key, kind, codec, value, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, kind, codec, blob, len(blob), expires_at, time.time()),
+                )
+                self._writes += 1
+                if self._writes % EVICT_EVERY_WRITES == 1:
+                    self._evict_disk(conn)
+                conn.commit()
+        except Exception as e:
+            self._disk_error(e)
+
+    def _evict_disk(self, conn):
+        """Borra lo vencido y, si se pasa del tope, lo menos usado recientemente."""
+        conn.execute("DELETE FROM content_cache WHERE expires_at < ?", (time.time(),))
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM content_cache").fetchone()
+        excess = total - self.disk_bytes
+        if excess <= 0:
+            return
+        removed = 0
+        for key, size in conn.execute("SELECT key, size FROM content_cache ORDER BY accessed_at").fetchall():
+            if excess <= 0:
+                break
+            conn.execute("DELETE FROM content_cache WHERE key = ?", (key,))
+            excess -= size
+            removed += 1
+        self.stats["evicted"] += removed
+        logger.info(f"🗜️ Caché de contenido: {removed} entradas desalojadas (tope {self.disk_bytes // 2**20} MB)")
+
+    # --- API ---
+
+    def get(self, kind, url):
+        key = f"{kind}:{canonical_url(url)}"
+        entry = self._get_memory(key)
+        if entry:
+            self.stats["memory_hits"] += 1
+            return entry[1]
+        entry = self._get_disk(key)
+        if entry:
+            expires_at, value = entry
+            self.stats["disk_hits"] += 1
+            self._put_memory(key, expires_at, value, len(json.dumps(value, ensure_ascii=False)))
+            return value
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, kind, url, value, ttl=None):
+        key = f"{kind}:{canonical_url(url)}"
+        expires_at = time.time() + (ttl or CONTENT_TTLS.get(kind, DEFAULT_TTL))
+        codec, blob, size = _encode(value)
+        self._put_memory(key, expires_at, value, size)
+        self._put_disk(key, kind, expires_at, codec, blob)
+
+    def fetch(self, kind, url, loader, cacheable=bool):
+        """Valor cacheado de (kind, url) o loader(); solo se guarda si cacheable(valor)."""
+        key = f"{kind}:{canonical_url(url)}"
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(kind, url)
+            if value is not None:
+                return value
+            value = loader()
+            if value is not None and cacheable(value):
+                self.set(kind, url, value)
+        with self._lock:
+            if not key_lock.locked():
+                self._key_locks.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        if self._disk_ok:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM content_cache")
+                    conn.commit()
+            except Exception as e:
+                self._disk_error(e)
+
+    def summary(self):
+        s = dict(self.stats)
+        with self._lock:
+            s["memory_entries"] = len(self._memory)
+            s["memory_bytes"] = self._memory_size
+        s["disk_entries"], s["disk_bytes"] = 0, 0
+        if self._disk_ok:
+            try:
+                with self._connect() as conn:
+                    s["disk_entries"], s["disk_bytes"] = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM content_cache"
+                    ).fetchone()
+            except Exception as e:
+                self._disk_error(e)
+        return s
+
+
+CONTENT_CACHE = ContentCache()
+
+
+def cached_fetch(kind, url, loader, cacheable=bool):
+    """Atajo sobre CONTENT_CACHE.fetch."""
+    return CONTENT_CACHE.fetch(kind, url, loader, cacheable)
+
+
+def format_stats():
+    """Resumen legible para /progreso."""
+    s = CONTENT_CACHE.summary()
+    total = s["memory_hits"] + s["disk_hits"] + s["misses"]
+    rate = (s["memory_hits"] + s["disk_hits"]) / total * 100 if total else 0.0
+    return (f"🗜️ Caché de contenido: {rate:.0f}% hits "
+            f"({s['memory_hits']} memoria, {s['disk_hits']} disco, {s['misses']} descargas)\n"
+            f"   memoria {s['memory_entries']} entradas / {s['memory_bytes'] / 2**20:.1f} MB, "
+            f"disco {s['disk_entries']} / {s['disk_bytes'] / 2**20:.1f} MB "
+            f"({'zstd' if ZSTD_AVAILABLE else 'zlib'})")
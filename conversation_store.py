@@ -0,0 +1,221 @@
+"""
+Conversation Store para Claudette Bot.
+Historial de conversación por chat_id en dos niveles:
+- Hot: LRU en memoria (los chats activos, sin tocar la DB)
+- Cold: PostgreSQL (tabla conversation_history) o SQLite local si no hay DATABASE_URL
+
+Los tool_result viejos (páginas, transcripciones) y las imágenes se compactan
+al salir de la ventana reciente, y cada chat tiene un tope en bytes.
+Tras un restart la conversación se retoma desde el cold tier sin llamar a Claude.
+"""
+
+import os
+import json
+import sqlite3
+import asyncio
+import threading
+from contextlib import closing
+from collections import OrderedDict
+from config import (DATABASE_URL, CONVERSATION_HOT_CHATS, CONVERSATION_MAX_BYTES,
+                    CONVERSATION_RECENT_WINDOW, COMPACT_TOOL_RESULT_CHARS, logger)
+
+SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversations.db")
+
+
+# =====================================================
+# COMPACTACIÓN
+# =====================================================
+
+def summarize_text(text, limit):
+    """Resumen local (sin Claude): cabeza del texto + cuánto se omitió."""
+    if len(text) <= limit:
+        return text
+    head = text[:limit].rsplit(' ', 1)[0]
+    return f"{head}\n[... compactado: {len(text) - len(head)} chars omitidos]"
+
+
+def compact_block(block, limit):
+    """Compacta un bloque de contenido. Retorna el mismo objeto si no hay cambios."""
+    if not isinstance(block, dict):
+        return block
+    btype = block.get('type')
+    if btype == 'tool_result':
+        content = block.get('content')
+        if isinstance(content, list):
+            content = "\n".join(b.get('text', '') for b in content if isinstance(b, dict))
+        if isinstance(content, str) and len(content) > limit:
+            return {**block, "content": summarize_text(content, limit)}
+    elif btype == 'image':
+        return {"type": "text", "text": "[imagen enviada por el usuario]"}
+    return block
+
+
+def _is_tool_result_message(msg):
+    content = msg.get('content')
+    return msg.get('role') == 'user' and isinstance(content, list) and any(
+        isinstance(b, dict) and b.get('type') == 'tool_result' for b in content
+    )
+
+
+def compact_messages(messages, recent_window=CONVERSATION_RECENT_WINDOW, limit=COMPACT_TOOL_RESULT_CHARS):
+    """Compacta tool_results e imágenes fuera de los últimos recent_window mensajes."""
+    cutoff = max(0, len(messages) - recent_window)
+    compacted = []
+    for i, msg in enumerate(messages):
+        content = msg.get('content')
+        if i < cutoff and isinstance(content, list):
+            msg = {**msg, "content": [compact_block(b, limit) for b in content]}
+        compacted.append(msg)
+    return compacted
+
+
+def _size(messages):
+    return len(json.dumps(messages, ensure_ascii=False).encode('utf-8'))
+
+
+def enforce_byte_cap(messages, max_bytes=CONVERSATION_MAX_BYTES):
+    """
+    Descarta turnos viejos hasta quedar bajo max_bytes.
+    Siempre deja el historial empezando en un mensaje de usuario normal
+    (nunca un tool_result huérfano) y conserva al menos el último mensaje.
+    """
+    messages = list(messages)
+    while len(messages) > 1 and _size(messages) > max_bytes:
+        messages.pop(0)
+        while len(messages) > 1 and (messages[0].get('role') != 'user' or _is_tool_result_message(messages[0])):
+            messages.pop(0)
+    return messages
+
+
+# =====================================================
+# STORE
+# =====================================================
+
+class ConversationStore:
+    """
+    Historial por chat_id con LRU en memoria + persistencia.
+    - get(chat_id): lista de mensajes (carga del cold tier si no está en memoria)
+    - save(chat_id, messages): compacta, aplica el tope en bytes y persiste
+    - clear(chat_id): borra el historial en ambos niveles
+    """
+
+    def __init__(self, max_chats=CONVERSATION_HOT_CHATS, max_bytes=CONVERSATION_MAX_BYTES,
+                 dsn=DATABASE_URL, sqlite_path=SQLITE_PATH):
+        self.max_chats = max_chats
+        self.max_bytes = max_bytes
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+        self._dsn = dsn
+        self._sqlite_path = sqlite_path
+        self._ready = False
+        if dsn:
+            try:
+                import psycopg2  # noqa: F401
+            except ImportError:
+                logger.warning("💬 Historial: SQLite local (psycopg2 no instalado)")
+                self._dsn = None
+
+    # --- API async (la usa brain) ---
+
+    async def get(self, chat_id):
+        with self._lock:
+            if chat_id in self._hot:
+                self._hot.move_to_end(chat_id)
+                return self._hot[chat_id]
+        messages = await asyncio.to_thread(self._load_cold, chat_id)
+        self._put_hot(chat_id, messages)
+        return messages
+
+    async def save(self, chat_id, messages):
+        messages = enforce_byte_cap(compact_messages(messages), self.max_bytes)
+        self._put_hot(chat_id, messages)
+        await asyncio.to_thread(self._save_cold, chat_id, messages)
+        return messages
+
+    async def clear(self, chat_id):
+        self._put_hot(chat_id, [])
+        await asyncio.to_thread(self._save_cold, chat_id, [])
+
+    # --- hot tier ---
+
+    def _put_hot(self, chat_id, messages):
+        with self._lock:
+            self._hot[chat_id] = messages
+            self._hot.move_to_end(chat_id)
+            while len(self._hot) > self.max_chats:
+                self._hot.popitem(last=False)
+
+    # --- cold tier ---
+
+    def _connect(self):
+        """Context manager: conexión del pool compartido o SQLite local."""
+        if self._dsn:
+            from db_pool import connection
+            return connection()
+        return closing(sqlite3.connect(self._sqlite_path))
+
+    def _setup(self, conn):
+        if self._ready:
+            return
+        cur = conn.cursor()
+        if self._dsn:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_history (
+                    chat_id BIGINT PRIMARY KEY,
+                    messages JSONB NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        else:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_history (
+                    chat_id INTEGER PRIMARY KEY,
+                    messages TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        conn.commit()
+        cur.close()
+        self._ready = True
+
+    def _load_cold(self, chat_id):
+        try:
+            with self._connect() as conn:
+                self._setup(conn)
+                cur = conn.cursor()
+                placeholder = "%s" if self._dsn else "?"
+                cur.execute(f"SELECT messages FROM conversation_history WHERE chat_id = {placeholder}", (chat_id,))
+                row = cur.fetchone()
+                cur.close()
+            if not row:
+                return []
+            data = row[0]
+            return json.loads(data) if isinstance(data, str) else data
+        except Exception as e:
+            logger.error(f"Historial: error cargando chat {chat_id}: {e}")
+            return []
+
+    def _save_cold(self, chat_id, messages):
+        payload = json.dumps(messages, ensure_ascii=False)
+        try:
+            with self._connect() as conn:
+                self._setup(conn)
+                cur = conn.cursor()
+                if self._dsn:
+                    cur.execute("""
+                        INSERT INTO conversation_history (chat_id, messages, updated_at)
+                        VALUES (%s, %s::jsonb, CURRENT_TIMESTAMP)
+                        ON CONFLICT (chat_id)
+                        DO UPDATE SET messages = EXCLUDED.messages, updated_at = CURRENT_TIMESTAMP
+                    """, (chat_id, payload))
+                else:
+                    cur.execute("""
+                        INSERT INTO conversation_history (chat_id, messages, updated_at)
+                        VALUES (?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT (chat_id)
+                        DO UPDATE SET messages = excluded.messages, updated_at = CURRENT_TIMESTAMP
+                    """, (chat_id, payload))
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            logger.error(f"Historial: error guardando chat {chat_id}: {e}")
@@ -0,0 +1,89 @@
+"""
+Capa async de PostgreSQL para Claudette Bot (psycopg 3 + psycopg_pool).
+Las tools de KB, biblioteca y memoria la usan desde el event loop de Telegram
+sin bloquearlo; las versiones sync (db_pool / psycopg2) siguen para scripts.
+
+Uso:
+    from db_async import run_queries
+    rows, = await run_queries([(sql, params)], dict_rows=True)
+
+Si psycopg 3 o psycopg_pool no están instalados, run_queries cae a
+db_pool.run_queries en un thread: misma interfaz, sin bloquear el loop.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from db_pool import DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, dsn
+
+logger = logging.getLogger("claudette")
+
+try:
+    from psycopg.rows import dict_row, tuple_row
+    from psycopg_pool import AsyncConnectionPool
+    ASYNC_DB_AVAILABLE = True
+except ImportError:
+    ASYNC_DB_AVAILABLE = False
+    logger.warning("🔌 psycopg_pool no instalado: consultas async via threads (psycopg2)")
+
+_pool = None
+_pool_lock = None
+
+
+async def _get_pool():
+    """Abre el pool en el loop actual la primera vez que se usa."""
+    global _pool, _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                pool = AsyncConnectionPool(
+                    dsn(),
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                _pool = pool
+                logger.info(f"🔌 Pool async PostgreSQL listo (min={DB_POOL_MIN}, max={DB_POOL_MAX})")
+    return _pool
+
+
+@asynccontextmanager
+async def connection(dict_rows=False):
+    """Presta una conexión async del pool (commit o rollback al devolverla, según haya error)."""
+    pool = await _get_pool()
+    async with pool.connection() as conn:
+        conn.row_factory = dict_row if dict_rows else tuple_row
+        yield conn
+
+
+async def run_queries(queries, dict_rows=False, commit=False):
+    """
+    Ejecuta [(sql, params), ...] en una sola conexión y retorna una lista con
+    las filas de cada consulta ([] si no devuelve filas). Misma forma que db_pool.run_queries.
+    """
+    if not ASYNC_DB_AVAILABLE:
+        from db_pool import run_queries as run_queries_sync
+        return await asyncio.to_thread(run_queries_sync, queries, dict_rows, commit)
+
+    results = []
+    async with connection(dict_rows=dict_rows) as conn:
+        async with conn.cursor() as cur:
+            for sql, params in queries:
+                await cur.execute(sql, params)
+                results.append(await cur.fetchall() if cur.description else [])
+        if commit:
+            await conn.commit()
+    return results
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
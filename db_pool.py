@@ -0,0 +1,205 @@
+"""
+Pool compartido de conexiones PostgreSQL para Claudette Bot.
+Lo usan knowledge_base, library, memory_manager, conversation_store y migrate_library
+en lugar de abrir un psycopg2.connect (con handshake SSL) por cada consulta.
+
+Uso:
+    from db_pool import connection
+    with connection() as conn:                  # cursores normales (tuplas)
+        ...
+    with connection(dict_cursor=True) as conn:  # RealDictCursor
+        ...
+
+Al salir del with la conexión vuelve al pool: se hace rollback de lo no
+commiteado y se restaura autocommit. Configurable con DB_POOL_MIN / DB_POOL_MAX.
+Lee DATABASE_URL directo del entorno para que los scripts puedan usarlo sin config.py.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger("claudette")
+
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "8"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "15"))   # espera maxima por una conexion libre
+HEALTH_CHECK_IDLE = 60   # segundos inactiva antes de verificar con SELECT 1 al sacarla
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+_last_used = {}
+
+_stats = {
+    "checkouts": 0,
+    "wait_total": 0.0,
+    "wait_max": 0.0,
+    "created": 0,
+    "discarded": 0,
+    "in_use": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def dsn():
+    """DATABASE_URL con sslmode=require para hosts remotos (Render)."""
+    db_url = os.environ.get("DATABASE_URL")
+    if not db_url:
+        raise ValueError("DATABASE_URL no configurado")
+    local = "localhost" in db_url or "127.0.0.1" in db_url
+    if "sslmode" not in db_url and not local:
+        db_url += ("&" if "?" in db_url else "?") + "sslmode=require"
+    return db_url
+
+
+class _CountingPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool que cuenta cuántas conexiones reales se abren."""
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        _last_used[id(conn)] = time.monotonic()   # recién abierta: no necesita SELECT 1
+        with _stats_lock:
+            _stats["created"] += 1
+        return conn
+
+
+def _get_pool():
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _CountingPool(DB_POOL_MIN, DB_POOL_MAX, dsn())
+                _slots = threading.BoundedSemaphore(DB_POOL_MAX)
+                logger.info(f"🔌 Pool PostgreSQL listo (min={DB_POOL_MIN}, max={DB_POOL_MAX})")
+    return _pool
+
+
+def _healthy(conn):
+    if conn.closed:
+        return False
+    if time.monotonic() - _last_used.get(id(conn), 0) < HEALTH_CHECK_IDLE:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def _checkout(pool):
+    # Tras un corte de la DB todas las inactivas pueden estar caídas: se descartan
+    # hasta DB_POOL_MAX y la siguiente ya es una conexión nueva
+    for _ in range(DB_POOL_MAX + 1):
+        conn = pool.getconn()
+        if _healthy(conn):
+            return conn
+        with _stats_lock:
+            _stats["discarded"] += 1
+        logger.warning("🔌 Conexion del pool caida, descartada")
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError(f"Pool PostgreSQL: {DB_POOL_MAX + 1} conexiones seguidas caidas")
+
+
+def _release(pool, conn):
+    broken = conn.closed
+    if not broken:
+        try:
+            conn.rollback()
+            conn.autocommit = False
+        except Exception:
+            broken = True
+    if broken:
+        _last_used.pop(id(conn), None)
+    else:
+        _last_used[id(conn)] = time.monotonic()
+    pool.putconn(conn, close=broken)
+
+
+@contextmanager
+def connection(dict_cursor=False):
+    """Presta una conexión del pool durante el bloque with."""
+    pool = _get_pool()
+    started = time.monotonic()
+    if not _slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise TimeoutError(f"Pool PostgreSQL agotado ({DB_POOL_MAX} conexiones en uso)")
+    try:
+        conn = _checkout(pool)
+    except Exception:
+        _slots.release()
+        raise
+    waited = time.monotonic() - started
+    with _stats_lock:
+        _stats["checkouts"] += 1
+        _stats["wait_total"] += waited
+        _stats["wait_max"] = max(_stats["wait_max"], waited)
+        _stats["in_use"] += 1
+
+    conn.cursor_factory = RealDictCursor if dict_cursor else psycopg2.extensions.cursor
+    try:
+        yield conn
+    finally:
+        try:
+            _release(pool, conn)
+        finally:
+            with _stats_lock:
+                _stats["in_use"] -= 1
+            _slots.release()
+
+
+def run_queries(queries, dict_cursor=False, commit=False):
+    """
+    Ejecuta [(sql, params), ...] en una sola conexión y retorna una lista con
+    las filas de cada consulta ([] si no devuelve filas). Misma forma que
+    db_async.run_queries, para que las versiones sync y async compartan SQL y formato.
+    """
+    results = []
+    with connection(dict_cursor=dict_cursor) as conn:
+        cur = conn.cursor()
+        for sql, params in queries:
+            cur.execute(sql, params)
+            results.append(cur.fetchall() if cur.description else [])
+        if commit:
+            conn.commit()
+        cur.close()
+    return results
+
+
+def get_stats():
+    """Copia de las métricas del pool."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["wait_avg_ms"] = (stats["wait_total"] / stats["checkouts"] * 1000) if stats["checkouts"] else 0.0
+    stats["reuse_ratio"] = (1 - stats["created"] / stats["checkouts"]) if stats["checkouts"] else 0.0
+    return stats
+
+
+def format_stats():
+    """Línea legible para /progreso."""
+    s = get_stats()
+    return (
+        f"🔌 Pool DB: {s['checkouts']} usos, {s['created']} conexiones abiertas "
+        f"({s['reuse_ratio'] * 100:.0f}% reutilizadas), espera media {s['wait_avg_ms']:.1f} ms "
+        f"(max {s['wait_max'] * 1000:.0f} ms), {s['discarded']} descartadas"
+    )
+
+
+def close_pool():
+    """Cierra todas las conexiones (fin de scripts)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
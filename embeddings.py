@@ -0,0 +1,320 @@
+"""
+Índice semántico local para Claudette Bot (KB + biblioteca).
+Complementa la búsqueda full-text de PostgreSQL: las preguntas conceptuales
+("qué tengo sobre la fragilidad del yo") encuentran notas aunque usen otras palabras.
+
+- Modelo CPU local vía fastembed (ONNX): se descarga una vez al indexar y
+  se carga al arrancar (warm_up_embeddings), sin red ni carga en las consultas.
+- Vectores en la tabla embeddings (BYTEA float32) y en memoria como una
+  matriz NumPy normalizada: búsqueda exacta por producto punto. Con ~10k
+  vectores de 384 dims son ~15 MB y < 5 ms por consulta, sin IVF/HNSW.
+- Indexado incremental: update_kb_index / update_library_index solo
+  embeben lo que cambió (md5 del texto calculado en PostgreSQL).
+- rrf_fuse combina el ranking full-text con el semántico (reciprocal rank fusion).
+
+Sin fastembed/numpy (o con EMBEDDINGS=0) todo sigue funcionando solo con full-text.
+"""
+
+import os
+import time
+import logging
+import threading
+from functools import lru_cache
+
+from db_pool import connection, run_queries
+from ttl_cache import VAULT_VERSION, LIBRARY_VERSION, KB_META_DDL
+
+logger = logging.getLogger("claudette")
+
+try:
+    import numpy as np
+    from fastembed import TextEmbedding
+    EMBEDDINGS_AVAILABLE = os.environ.get("EMBEDDINGS", "1") != "0"
+except ImportError:
+    EMBEDDINGS_AVAILABLE = False
+    logger.warning("🧭 fastembed/numpy no instalados: búsqueda solo full-text")
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_BATCH = 64
+INDEX_RECHECK_SECONDS = 60   # cada cuánto se verifica si la tabla cambió (otro proceso indexó)
+RRF_K = 60
+SEMANTIC_MIN_SCORE = 0.3     # similitud coseno mínima para entrar en la fusión
+
+EMBEDDINGS_DDL = """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        source TEXT NOT NULL,                 -- 'KB' (chunk de nota) | 'LIBRO' (ficha)
+        ref TEXT NOT NULL,                    -- filepath de la nota o id del libro
+        chunk_index INTEGER NOT NULL DEFAULT 0,
+        content_hash TEXT NOT NULL,
+        model TEXT NOT NULL,
+        vector BYTEA NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (source, ref, chunk_index)
+    )
+"""
+
+# Textos a embeber, con su md5 calculado en PostgreSQL (mismo texto → mismo hash)
+_KB_PENDING_SQL = """
+    SELECT c.filepath AS ref, c.chunk_index, t.text, md5(t.text) AS content_hash
+    FROM document_chunks c
+    JOIN documents d ON d.filepath = c.filepath AND d.is_active = TRUE
+    CROSS JOIN LATERAL (
+        SELECT d.title || E'\\n' || COALESCE(c.heading, '') || E'\\n' || c.content AS text
+    ) t
+    LEFT JOIN embeddings e ON e.source = 'KB' AND e.ref = c.filepath
+                          AND e.chunk_index = c.chunk_index AND e.model = %s
+    WHERE e.content_hash IS DISTINCT FROM md5(t.text)
+"""
+
+_KB_ORPHANS_SQL = """
+    DELETE FROM embeddings e
+    WHERE e.source = 'KB' AND NOT EXISTS (
+        SELECT 1 FROM document_chunks c
+        JOIN documents d ON d.filepath = c.filepath AND d.is_active = TRUE
+        WHERE c.filepath = e.ref AND c.chunk_index = e.chunk_index
+    )
+"""
+
+_LIBRARY_PENDING_SQL = """
+    SELECT CAST(l.id AS TEXT) AS ref, 0 AS chunk_index, t.text, md5(t.text) AS content_hash
+    FROM library l
+    CROSS JOIN LATERAL (
+        SELECT l.title || E'\\n' || COALESCE(l.author, '') || E'\\n'
+               || COALESCE(array_to_string(l.tags, ', '), '') || E'\\n'
+               || LEFT(COALESCE(l.summary, '') || E'\\n' || COALESCE(l.content, ''), 2000) AS text
+    ) t
+    LEFT JOIN embeddings e ON e.source = 'LIBRO' AND e.ref = CAST(l.id AS TEXT) AND e.model = %s
+    WHERE e.content_hash IS DISTINCT FROM md5(t.text)
+"""
+
+_LIBRARY_ORPHANS_SQL = """
+    DELETE FROM embeddings e
+    WHERE e.source = 'LIBRO' AND NOT EXISTS (
+        SELECT 1 FROM library l WHERE CAST(l.id AS TEXT) = e.ref
+    )
+"""
+
+
+# =====================================================
+# MODELO
+# =====================================================
+
+_model = None               # se asigna solo si la carga terminó bien
+_model_lock = threading.Lock()
+_loader_thread = None
+_loader_started_at = 0.0
+MODEL_RETRY_SECONDS = 300   # tras una carga fallida, espera antes de reintentar en background
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                t = time.perf_counter()
+                _model = TextEmbedding(model_name=EMBEDDING_MODEL,
+                                       cache_dir=os.environ.get("EMBEDDING_CACHE_DIR"))
+                logger.info(f"🧭 Modelo de embeddings cargado ({time.perf_counter() - t:.1f}s): {EMBEDDING_MODEL}")
+    return _model
+
+
+def _embed(texts):
+    """Embebe textos → matriz float32 normalizada (n, dims)."""
+    vectors = np.array(list(_get_model().embed(texts, batch_size=EMBEDDING_BATCH)), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+@lru_cache(maxsize=256)
+def _embed_query(query):
+    return _embed([query])[0]
+
+
+# =====================================================
+# INDEXADO INCREMENTAL
+# =====================================================
+
+def _update_index(source, pending_sql, orphans_sql, version):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(orphans_sql)
+        removed = cur.rowcount
+        cur.execute(pending_sql, (EMBEDDING_MODEL,))
+        pending = cur.fetchall()
+        if pending:
+            from psycopg2.extras import execute_values
+            for i in range(0, len(pending), EMBEDDING_BATCH * 4):
+                batch = pending[i:i + EMBEDDING_BATCH * 4]
+                vectors = _embed([text for _, _, text, _ in batch])
+                execute_values(cur, """
+                    INSERT INTO embeddings (source, ref, chunk_index, content_hash, model, vector)
+                    VALUES %s
+                    ON CONFLICT (source, ref, chunk_index) DO UPDATE SET
+                        content_hash = EXCLUDED.content_hash, model = EXCLUDED.model,
+                        vector = EXCLUDED.vector, updated_at = CURRENT_TIMESTAMP
+                """, [
+                    (source, ref, chunk_index, content_hash, EMBEDDING_MODEL, vec.tobytes())
+                    for (ref, chunk_index, _, content_hash), vec in zip(batch, vectors)
+                ])
+        if pending or removed:
+            version.bump(cur)   # los rankings híbridos cambian: invalida las cachés
+        conn.commit()
+    if pending or removed:
+        _index.invalidate()
+    return {"embedded": len(pending), "removed": removed}
+
+
+def update_kb_index():
+    """Embebe los chunks del vault nuevos o modificados y borra los huérfanos."""
+    if not EMBEDDINGS_AVAILABLE:
+        return {"embedded": 0, "removed": 0}
+    return _update_index("KB", _KB_PENDING_SQL, _KB_ORPHANS_SQL, VAULT_VERSION)
+
+
+def update_library_index():
+    """Embebe las fichas de la biblioteca nuevas o modificadas y borra las huérfanas."""
+    if not EMBEDDINGS_AVAILABLE:
+        return {"embedded": 0, "removed": 0}
+    return _update_index("LIBRO", _LIBRARY_PENDING_SQL, _LIBRARY_ORPHANS_SQL, LIBRARY_VERSION)
+
+
+# =====================================================
+# ÍNDICE EN MEMORIA
+# =====================================================
+
+class _FlatIndex:
+    """Matriz NumPy con todos los vectores; se recarga si la tabla cambió."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._sources = None
+        self._matrix = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+    def is_empty(self):
+        with self._lock:
+            self._refresh()
+            return self._matrix is None
+
+    def _refresh(self):
+        if time.monotonic() - self._checked_at < INDEX_RECHECK_SECONDS:
+            return
+        (signature,), = run_queries([(
+            "SELECT COUNT(*), MAX(updated_at) FROM embeddings WHERE model = %s", (EMBEDDING_MODEL,)
+        )])
+        self._checked_at = time.monotonic()
+        if signature == self._signature:
+            return
+        rows, = run_queries([(
+            "SELECT source, ref, chunk_index, vector FROM embeddings WHERE model = %s", (EMBEDDING_MODEL,)
+        )])
+        self._keys = [(r[0], r[1], r[2]) for r in rows]
+        self._sources = np.array([r[0] for r in rows])
+        self._matrix = (np.vstack([np.frombuffer(bytes(r[3]), dtype=np.float32) for r in rows])
+                        if rows else None)
+        self._signature = signature
+        logger.info(f"🧭 Índice semántico cargado: {len(rows)} vectores")
+
+    def search(self, query_vec, source=None, k=20, min_score=SEMANTIC_MIN_SCORE):
+        with self._lock:
+            self._refresh()
+            if self._matrix is None:
+                return []
+            scores = self._matrix @ query_vec
+            if source:
+                scores = np.where(self._sources == source, scores, -np.inf)
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._keys[i][1], self._keys[i][2], float(scores[i]))
+                    for i in top if scores[i] >= min_score]
+
+
+_index = _FlatIndex()
+
+
+def semantic_search(query, source=None, k=20):
+    """
+    Top-k por similitud coseno: [(ref, chunk_index, score), ...].
+    source: 'KB' o 'LIBRO' (None = ambos). Lista vacía si no hay embeddings.
+    """
+    if not EMBEDDINGS_AVAILABLE or not query or not query.strip():
+        return []
+    try:
+        # Sin vectores no hace falta el modelo. Sin modelo cargado la consulta no lo
+        # carga (ni lo descarga): queda pedido en background y se responde solo full-text
+        if _index.is_empty():
+            return []
+        if _model is None:
+            _load_model_in_background()
+            return []
+        return _index.search(_embed_query(query.strip()), source, k)
+    except Exception as e:
+        logger.warning(f"semantic_search error: {e}")
+        return []
+
+
+def rrf_fuse(rankings, k=RRF_K):
+    """Reciprocal rank fusion: listas de claves ordenadas → claves ordenadas por score fusionado."""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _load_model_in_background():
+    """Lanza la carga del modelo en un thread (una a la vez; reintento cada MODEL_RETRY_SECONDS)."""
+    global _loader_thread, _loader_started_at
+    with _model_lock:
+        if _model is not None or (_loader_thread and _loader_thread.is_alive()):
+            return
+        if _loader_thread and time.monotonic() - _loader_started_at < MODEL_RETRY_SECONDS:
+            return
+
+        def run():
+            try:
+                _get_model()
+            except Exception as e:
+                logger.warning(f"🧭 Carga del modelo de embeddings falló: {e}")
+
+        _loader_started_at = time.monotonic()
+        _loader_thread = threading.Thread(target=run, name="embeddings-model", daemon=True)
+        _loader_thread.start()
+
+
+def warm_up_embeddings():
+    """
+    Al arrancar el bot: si hay vectores, carga el modelo en background.
+    Así la primera consulta no paga los segundos de carga del modelo ONNX.
+    Si todavía no hay vectores, lo pide la primera consulta que los encuentre.
+    """
+    if not EMBEDDINGS_AVAILABLE:
+        return
+    try:
+        if not _index.is_empty():
+            _load_model_in_background()
+    except Exception as e:
+        logger.warning(f"🧭 Precarga de embeddings falló: {e}")
+
+
+def setup_embeddings_table():
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(EMBEDDINGS_DDL)
+        cur.execute(KB_META_DDL)
+        conn.commit()
+
+
+if __name__ == "__main__":
+    # python embeddings.py → (re)indexa KB y biblioteca
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    setup_embeddings_table()
+    print("KB:", update_kb_index())
+    print("Biblioteca:", update_library_index())
@@ -0,0 +1,81 @@
+"""
+Búsqueda difusa por título/autor/ruta con pg_trgm + unaccent.
+Reemplaza los LIKE '%x%' (sin índice posible) de kb_read, get_book_content,
+search_by_author y el fallback de search_library.
+
+- f_unaccent(text): wrapper IMMUTABLE de unaccent, necesario para indexar
+  f_unaccent(lower(col)). Sin la extensión unaccent queda como identidad.
+- Índices GIN gin_trgm_ops sobre f_unaccent(lower(col)).
+- Ranking: GREATEST(similarity, word_similarity) → tolera typos ("nietzche"),
+  acentos ("godel" → "Gödel") y fragmentos ("han" → "Byung-Chul Han").
+
+Uso:
+    from fuzzy import setup_fuzzy_search, trgm_index_sql, fuzzy_query
+    sql, params = fuzzy_query("library", ["title"], "el extranjero",
+                              "title, author", limit=5)
+"""
+
+import logging
+
+logger = logging.getLogger("claudette")
+
+FUZZY_LIMIT = 5
+
+_F_UNACCENT_SQL = """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+    $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+"""
+
+# Sin permisos para unaccent: mismo nombre, sin quitar acentos (los índices siguen valiendo)
+_F_UNACCENT_IDENTITY_SQL = """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+    $$ SELECT $1 $$
+"""
+
+
+def setup_fuzzy_search(cur):
+    """Extensiones pg_trgm/unaccent y función f_unaccent (commit a cargo del llamador)."""
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cur.execute("SAVEPOINT fuzzy_unaccent")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        cur.execute(_F_UNACCENT_SQL)
+        cur.execute("RELEASE SAVEPOINT fuzzy_unaccent")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT fuzzy_unaccent")
+        logger.warning(f"unaccent no disponible, búsqueda difusa sin normalizar acentos: {e}")
+        cur.execute("SELECT 1 FROM pg_proc WHERE proname = 'f_unaccent'")
+        if not cur.fetchone():
+            cur.execute(_F_UNACCENT_IDENTITY_SQL)
+
+
+def _key(column):
+    return f"f_unaccent(lower({column}))"
+
+
+def trgm_index_sql(index_name, table, column):
+    """CREATE INDEX GIN de trigramas sobre f_unaccent(lower(column))."""
+    return f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING GIN ({_key(column)} gin_trgm_ops)"
+
+
+def fuzzy_query(table, columns, text, select, limit=FUZZY_LIMIT, where=None, order=None,
+                select_params=()):
+    """
+    (sql, params) con las filas de `table` más parecidas a `text` en alguna de `columns`.
+    Agrega la columna fuzzy_score (0-1) al final del SELECT, ordenado de mayor a menor
+    (`order` desempata). Los operadores % y <% usan los índices de trgm_index_sql.
+    select_params: parámetros de los %s que haya en `select`.
+    """
+    score = "GREATEST(" + ", ".join(
+        f"similarity({_key(c)}, q.t), word_similarity(q.t, {_key(c)})" for c in columns
+    ) + ")"
+    match = " OR ".join(f"{_key(c)} %% q.t OR q.t <%% {_key(c)}" for c in columns)
+    return (f"""
+        SELECT {select}, {score} AS fuzzy_score
+        FROM {table}, (SELECT f_unaccent(lower(%s)) AS t) q
+        WHERE ({match}){f" AND {where}" if where else ""}
+        ORDER BY fuzzy_score DESC{f", {order}" if order else ""}
+        LIMIT %s
+    """, (*select_params, text.strip(), limit))
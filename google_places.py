@@ -1,4 +1,5 @@
 import requests
+import http_client
 import json
 import os
 import logging
@@ -30,7 +31,7 @@ def search_nearby_places(query, lat, lon, radius=2000):
     
     try:
         logger.info(f"ðŸ” Places API: query='{query}', location={location}, radius={radius}")
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params)
         data = response.json()
         
         status = data.get('status')
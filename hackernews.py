@@ -0,0 +1,108 @@
+"""
+Cliente de Hacker News (API de Firebase) para Claudette Bot.
+Lo usan fetch_hackernews_top (tool), verify_content y el boletín de noticias.
+
+- Pedidos por http_client (keep-alive): los ~20 items de una consulta
+  reutilizan las mismas conexiones TLS.
+- Los items se piden en paralelo (HN_MAX_WORKERS a la vez), en tandas por
+  orden de ranking hasta juntar `limit` stories: normalmente una sola tanda.
+- Caché de items: título/url/tipo no cambian; score y comentarios sí, por
+  eso un item se reutiliza HN_ITEM_TTL segundos. Lo que no es story
+  (jobs, polls, borrados) se recuerda para siempre.
+- topstories se cachea HN_TOP_TTL segundos.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+
+logger = logging.getLogger("claudette")
+
+HN_API = "https://hacker-news.firebaseio.com/v0"
+HN_TOP_TTL = 60            # segundos: lista de topstories
+HN_ITEM_TTL = 300          # segundos: score y comentarios de un item
+HN_MAX_WORKERS = 16
+HN_CANDIDATES = 50         # cuántas top stories se consideran
+HN_CACHE_SIZE = 2000
+
+_pool = ThreadPoolExecutor(max_workers=HN_MAX_WORKERS, thread_name_prefix="hn")
+
+_lock = threading.Lock()
+_items = OrderedDict()     # id → (expira_en, item o None)
+_top = (0.0, [])           # (expira_en, ids)
+
+
+def _top_ids():
+    global _top
+    if _top[0] > time.monotonic():
+        return _top[1]
+    resp = http_client.get(f"{HN_API}/topstories.json", timeout=10)
+    resp.raise_for_status()
+    ids = resp.json()[:HN_CANDIDATES]
+    _top = (time.monotonic() + HN_TOP_TTL, ids)
+    return ids
+
+
+def _cached_item(story_id):
+    with _lock:
+        entry = _items.get(story_id)
+        if entry and entry[0] > time.monotonic():
+            _items.move_to_end(story_id)
+            return True, entry[1]
+    return False, None
+
+
+def _store_item(story_id, item):
+    # Lo que no es story nunca lo va a ser: sin vencimiento
+    is_story = bool(item) and item.get("type") == "story"
+    expires = time.monotonic() + (HN_ITEM_TTL if is_story else float("inf"))
+    with _lock:
+        _items[story_id] = (expires, item if is_story else None)
+        _items.move_to_end(story_id)
+        while len(_items) > HN_CACHE_SIZE:
+            _items.popitem(last=False)
+
+
+def _fetch_item(story_id):
+    hit, item = _cached_item(story_id)
+    if hit:
+        return item
+    try:
+        resp = http_client.get(f"{HN_API}/item/{story_id}.json")   # timeout por host: 5s
+        resp.raise_for_status()
+        item = resp.json()
+    except Exception as e:
+        logger.debug(f"HN item {story_id}: {e}")
+        return None   # sin cachear: se reintenta en la próxima consulta
+    _store_item(story_id, item)
+    return item if item and item.get("type") == "story" else None
+
+
+def top_stories(limit=10, min_points=50):
+    """
+    Top stories con al menos min_points, en orden de ranking:
+    [{"id", "title", "url", "score", "comments"}, ...]. Lanza si falla topstories.
+    """
+    t = time.perf_counter()
+    ids = _top_ids()
+    results = []
+    for i in range(0, len(ids), HN_MAX_WORKERS):
+        wave = ids[i:i + HN_MAX_WORKERS]
+        for story_id, item in zip(wave, _pool.map(_fetch_item, wave)):
+            if not item or item.get("score", 0) < min_points:
+                continue
+            results.append({
+                "id": story_id,
+                "title": item.get("title", ""),
+                "url": item.get("url", f"https://news.ycombinator.com/item?id={story_id}"),
+                "score": item.get("score", 0),
+                "comments": item.get("descendants", 0),
+            })
+        if len(results) >= limit:
+            break
+    logger.info(f"🔶 HN: {min(len(results), limit)} stories en {(time.perf_counter() - t) * 1000:.0f} ms")
+    return results[:limit]
@@ -0,0 +1,143 @@
+"""
+Cliente HTTP compartido para Claudette Bot.
+Todas las llamadas salientes (clima, Reddit, HN, fetch_url, Firecrawl,
+Google Places, oEmbed/Supadata) pasan por acá en lugar de requests.get
+sueltos, que abrían una conexión TCP+TLS nueva en cada llamada.
+
+- Una requests.Session con pools keep-alive por host (urllib3).
+- Reintentos con backoff exponencial ante 429/5xx (respeta Retry-After),
+  solo en métodos idempotentes: un POST a Firecrawl no se repite.
+- Timeout por host (HOST_TIMEOUTS) si la llamada no pasa uno explícito.
+- Métricas por host (llamadas, errores, latencia media/máxima) para /progreso.
+- Interfaz async (aget/apost): la misma sesión en un thread, así ambas
+  variantes comparten pool, reintentos, métricas y tipos de excepción
+  (requests.exceptions.*).
+
+Uso:
+    import http_client
+    resp = http_client.get(url, params={...})
+    resp = await http_client.aget(url)
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("claudette")
+
+POOL_HOSTS = 20            # hosts con pool propio en memoria
+POOL_MAXSIZE = 16          # conexiones simultáneas por host (HN pide 16 items a la vez)
+RETRY_TOTAL = 2
+RETRY_BACKOFF = 0.5        # 0.5s, 1s, ...
+RETRY_STATUS = (429, 500, 502, 503, 504)
+DEFAULT_TIMEOUT = 15
+
+# Segundos por host (lectura); el resto usa DEFAULT_TIMEOUT
+HOST_TIMEOUTS = {
+    "api.openweathermap.org": 10,
+    "maps.googleapis.com": 10,
+    "hacker-news.firebaseio.com": 5,
+    "www.youtube.com": 5,
+    "www.reddit.com": 15,
+    "api.fxtwitter.com": 15,
+    "api.supadata.ai": 15,
+    "api.firecrawl.dev": 30,
+}
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}                # host → {"calls", "errors", "retries", "total", "max"}
+_stats_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=RETRY_TOTAL,
+                    backoff_factor=RETRY_BACKOFF,
+                    status_forcelist=RETRY_STATUS,
+                    respect_retry_after_header=True,
+                    raise_on_status=False,   # tras agotar reintentos se devuelve la última respuesta
+                )
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _record(host, elapsed, error, retries):
+    with _stats_lock:
+        s = _stats.setdefault(host, {"calls": 0, "errors": 0, "retries": 0, "total": 0.0, "max": 0.0})
+        s["calls"] += 1
+        s["errors"] += error
+        s["retries"] += retries
+        s["total"] += elapsed
+        s["max"] = max(s["max"], elapsed)
+
+
+def request(method, url, **kwargs):
+    """Como requests.request, sobre la sesión compartida. Lanza las mismas excepciones."""
+    host = urlsplit(url).hostname or "?"
+    kwargs.setdefault("timeout", HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT))
+    t = time.perf_counter()
+    resp = None
+    try:
+        resp = _get_session().request(method, url, **kwargs)
+        return resp
+    finally:
+        retries = getattr(getattr(resp, "raw", None), "retries", None)
+        _record(host, time.perf_counter() - t,
+                resp is None or resp.status_code >= 400,
+                len(retries.history) if retries else 0)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+async def arequest(method, url, **kwargs):
+    """Versión async de request (no bloquea el event loop)."""
+    return await asyncio.to_thread(request, method, url, **kwargs)
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url, **kwargs):
+    return await arequest("POST", url, **kwargs)
+
+
+def get_stats():
+    """Copia de las métricas por host, con latencia media en ms."""
+    with _stats_lock:
+        stats = {host: dict(s) for host, s in _stats.items()}
+    for s in stats.values():
+        s["avg_ms"] = s["total"] / s["calls"] * 1000 if s["calls"] else 0.0
+    return stats
+
+
+def format_stats(top=8):
+    """Resumen legible para /progreso: hosts más usados."""
+    stats = sorted(get_stats().items(), key=lambda kv: kv[1]["calls"], reverse=True)[:top]
+    if not stats:
+        return ""
+    lines = [f"   {host}: {s['calls']} llamadas, {s['avg_ms']:.0f} ms media "
+             f"(max {s['max'] * 1000:.0f}), {s['errors']} errores, {s['retries']} reintentos"
+             for host, s in stats]
+    return "🌐 HTTP saliente\n" + "\n".join(lines)
@@ -6,6 +6,12 @@
 
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+CREATE EXTENSION IF NOT EXISTS "unaccent";
+
+-- unaccent() no es IMMUTABLE: este wrapper permite indexar f_unaccent(lower(col)) (fuzzy.py)
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
 
 -- Tabla principal
 CREATE TABLE IF NOT EXISTS documents (
@@ -20,6 +26,7 @@ CREATE TABLE IF NOT EXISTS documents (
     created_at       TIMESTAMP    DEFAULT NOW(),
     updated_at       TIMESTAMP    DEFAULT NOW(),
     file_modified_at TIMESTAMP,
+    content_hash     TEXT,
     is_active        BOOLEAN      DEFAULT TRUE
 );
 
@@ -34,6 +41,17 @@ CREATE TABLE IF NOT EXISTS document_links (
     UNIQUE(source_doc_id, target_doc_id, link_text)
 );
 
+-- Secciones de cada nota (kb_search rankea por chunk)
+CREATE TABLE IF NOT EXISTS document_chunks (
+    id             SERIAL  PRIMARY KEY,
+    filepath       TEXT    NOT NULL,
+    chunk_index    INTEGER NOT NULL,
+    heading        TEXT,
+    content        TEXT    NOT NULL,
+    content_vector TSVECTOR,
+    UNIQUE(filepath, chunk_index)
+);
+
 -- Sesiones de aprendizaje (self-learning loop — futuro)
 CREATE TABLE IF NOT EXISTS learning_sessions (
     id                   UUID      PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -54,6 +72,9 @@ CREATE INDEX IF NOT EXISTS idx_documents_active  ON documents(is_active) WHERE i
 CREATE INDEX IF NOT EXISTS idx_documents_updated ON documents(updated_at DESC);
 CREATE INDEX IF NOT EXISTS idx_links_source      ON document_links(source_doc_id);
 CREATE INDEX IF NOT EXISTS idx_links_target      ON document_links(target_doc_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_fts        ON document_chunks USING GIN(content_vector);
+CREATE INDEX IF NOT EXISTS idx_documents_title_trgm ON documents USING GIN (f_unaccent(lower(title)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_documents_path_trgm  ON documents USING GIN (f_unaccent(lower(filepath)) gin_trgm_ops);
 
 -- Trigger: actualiza content_vector y updated_at automáticamente
 -- (columna explícita — correcto para Render, sin IMMUTABLE en GIN)
@@ -16,14 +16,26 @@ Requiere en env vars:
 
 import os
 import re
+import time
 import yaml
+import asyncio
+import hashlib
 import logging
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 
 import psycopg2
-from psycopg2.extras import Json, RealDictCursor
+from psycopg2.extras import Json, execute_values
+
+from db_pool import connection, run_queries
+from db_async import run_queries as run_queries_async
+from embeddings import EMBEDDINGS_DDL, semantic_search, rrf_fuse, update_kb_index
+from ttl_cache import TTLCache, VAULT_VERSION, LIBRARY_VERSION, KB_META_DDL, cached
+from fuzzy import setup_fuzzy_search, trgm_index_sql, fuzzy_query
 
 logger = logging.getLogger(__name__)
 
@@ -33,23 +45,152 @@ logger = logging.getLogger(__name__)
 # ──────────────────────────────────────────────
 
 def _get_conn():
-    """Conexión a PostgreSQL desde DATABASE_URL."""
-    db_url = os.environ.get("DATABASE_URL")
-    if not db_url:
-        raise ValueError("DATABASE_URL no configurado")
-    if "sslmode" not in db_url:
-        db_url += "?sslmode=require"
-    return psycopg2.connect(db_url, cursor_factory=RealDictCursor)
+    """Conexión del pool compartido (RealDictCursor). Uso: with _get_conn() as conn."""
+    return connection(dict_cursor=True)
+
+
+# Tools de lectura cacheadas; la clave incluye VAULT_VERSION (lo sube el ingestor)
+KB_CACHE = TTLCache("kb", maxsize=256, ttl=600)
 
 
 # ──────────────────────────────────────────────
 # TOOL 1: kb_search
 # ──────────────────────────────────────────────
+# El ranking es por chunk (document_chunks): se devuelven los pasajes que
+# matchean, agrupados por nota, en vez del inicio de cada nota. El ranking
+# full-text se fusiona (RRF) con el semántico de embeddings.py si está disponible.
+
+KB_PASSAGE_CHARS = 500
+KB_PASSAGES_PER_DOC = 2
+
+
+def _kb_search_query(query: str, limit: int, tag_filter: Optional[str]) -> Tuple[str, tuple]:
+    tag_clause = "AND %s = ANY(d.tags)" if tag_filter else ""
+    params = (query, tag_filter) if tag_filter else (query,)
+    return (
+        f"""
+        SELECT filepath, title, tags, word_count, chunk_index, heading, passage, rank
+        FROM (
+            SELECT c.filepath, d.title, d.tags, d.word_count,
+                   c.chunk_index, c.heading, c.content AS passage,
+                   ts_rank_cd(c.content_vector, q) AS rank,
+                   ROW_NUMBER() OVER (PARTITION BY c.filepath
+                                      ORDER BY ts_rank_cd(c.content_vector, q) DESC) AS rn
+            FROM document_chunks c
+            JOIN documents d ON d.filepath = c.filepath AND d.is_active = TRUE
+            CROSS JOIN plainto_tsquery('spanish', %s) AS q
+            WHERE c.content_vector @@ q {tag_clause}
+        ) hits
+        WHERE rn <= %s
+        ORDER BY rank DESC
+        LIMIT %s
+        """,
+        params + (KB_PASSAGES_PER_DOC, limit * KB_PASSAGES_PER_DOC)
+    )
+
+
+def _kb_search_docs_query(query: str, limit: int, tag_filter: Optional[str]) -> Tuple[str, tuple]:
+    # Fallback por nota completa: vault aún sin chunks (antes del primer kb_ingest)
+    tag_clause = "AND %s = ANY(tags)" if tag_filter else ""
+    params = (query, query, tag_filter) if tag_filter else (query, query)
+    return (
+        f"""
+        SELECT filepath, title, tags, word_count,
+               0 AS chunk_index, NULL AS heading, LEFT(content, 1500) AS passage,
+               ts_rank_cd(content_vector, plainto_tsquery('spanish', %s)) AS rank
+        FROM documents
+        WHERE is_active = TRUE
+          AND content_vector @@ plainto_tsquery('spanish', %s)
+          {tag_clause}
+        ORDER BY rank DESC
+        LIMIT %s
+        """,
+        params + (limit,)
+    )
+
+
+def _kb_chunks_by_key_query(keys: List[Tuple[str, int]], tag_filter: Optional[str]) -> Tuple[str, tuple]:
+    # Chunks que solo encontró la búsqueda semántica
+    tag_clause = "AND %s = ANY(d.tags)" if tag_filter else ""
+    params = ([fp for fp, _ in keys], [i for _, i in keys])
+    return (
+        f"""
+        SELECT c.filepath, d.title, d.tags, d.word_count,
+               c.chunk_index, c.heading, c.content AS passage, 0 AS rank
+        FROM document_chunks c
+        JOIN documents d ON d.filepath = c.filepath AND d.is_active = TRUE
+        JOIN unnest(%s::text[], %s::int[]) AS k(filepath, chunk_index)
+          ON k.filepath = c.filepath AND k.chunk_index = c.chunk_index
+        WHERE TRUE {tag_clause}
+        """,
+        params + ((tag_filter,) if tag_filter else ())
+    )
 
+
+def _fuse_kb_hits(hits: List[Dict], vector_hits: List[Tuple], limit: int) -> Tuple[List, List]:
+    """RRF entre full-text y semántico → (claves (filepath, chunk) en orden, claves sin fila aún)."""
+    ranked = [(h["filepath"], h["chunk_index"]) for h in hits]
+    order = rrf_fuse([ranked, [(ref, ci) for ref, ci, _ in vector_hits]])
+    order = order[:limit * KB_PASSAGES_PER_DOC * 2]
+    known = set(ranked)
+    return order, [key for key in order if key not in known]
+
+
+def _order_kb_hits(hits: List[Dict], order: List[Tuple[str, int]]) -> List[Dict]:
+    by_key = {(h["filepath"], h["chunk_index"]): h for h in hits}
+    return [by_key[key] for key in order if key in by_key]
+
+
+def _best_passage(text: str, query: str, max_chars: int = KB_PASSAGE_CHARS) -> str:
+    """Ventana de max_chars alrededor de la primera aparición de un término de la query."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    lower = text.lower()
+    # Prefijo de 5 letras: tolera plurales/conjugaciones como el stemmer de PG
+    terms = [w[:5] for w in re.findall(r"\w+", query.lower()) if len(w) >= 3]
+    hits = [pos for pos in (lower.find(t) for t in terms) if pos != -1]
+    start = max(0, min(hits) - max_chars // 4) if hits else 0
+    start = min(start, len(text) - max_chars)
+    if start > 0:
+        start = text.find(" ", start) + 1
+    passage = text[start:start + max_chars].rsplit(" ", 1)[0]
+    return ("…" if start > 0 else "") + passage + "…"
+
+
+def _format_kb_search(hits: List[Dict], query: str, limit: int) -> str:
+    if not hits:
+        return f"🔍 Sin resultados para: *{query}*"
+
+    docs = {}
+    for h in hits:
+        doc = docs.setdefault(h["filepath"], {**h, "passages": []})
+        if len(doc["passages"]) < KB_PASSAGES_PER_DOC:
+            doc["passages"].append((h["heading"], _best_passage(h["passage"], query)))
+    docs = list(docs.values())[:limit]
+
+    out = [f"🔍 *{len(docs)} resultado(s)* para: _{query}_\n"]
+    for i, d in enumerate(docs, 1):
+        tags_str = " ".join(f"#{t}" for t in (d["tags"] or []))
+        lines = [
+            f"*{i}. {d['title']}*",
+            f"   📁 `{d['filepath']}`",
+            f"   🏷️ {tags_str or '(sin tags)'} · {d['word_count']} palabras",
+        ]
+        for heading, passage in d["passages"]:
+            if heading:
+                lines.append(f"   § {heading}")
+            lines.append(f"   > {passage}")
+        out.append("\n".join(lines) + "\n")
+    return "\n".join(out)
+
+
+@cached(KB_CACHE, VAULT_VERSION, normalize=("query",))
 def kb_search(query: str, limit: int = 5, tag_filter: Optional[str] = None) -> str:
     """
-    Búsqueda full-text en el vault con ranking por relevancia.
-    
+    Búsqueda híbrida (full-text + semántica) en el vault con ranking por relevancia.
+    Devuelve los pasajes que matchean (chunks), agrupados por nota.
+
     Args:
         query:      Término(s) de búsqueda en español
         limit:      Máximo de resultados (default: 5)
@@ -59,59 +200,42 @@ def kb_search(query: str, limit: int = 5, tag_filter: Optional[str] = None) -> s
         return "❌ Proporciona un término de búsqueda."
 
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-
-        if tag_filter:
-            cur.execute(
-                """
-                SELECT filepath, title,
-                       LEFT(content, 400) AS snippet,
-                       tags, word_count,
-                       ts_rank_cd(content_vector, plainto_tsquery('spanish', %s)) AS rank
-                FROM documents
-                WHERE is_active = TRUE
-                  AND content_vector @@ plainto_tsquery('spanish', %s)
-                  AND %s = ANY(tags)
-                ORDER BY rank DESC
-                LIMIT %s
-                """,
-                (query, query, tag_filter, limit)
-            )
-        else:
-            cur.execute(
-                """
-                SELECT filepath, title,
-                       LEFT(content, 400) AS snippet,
-                       tags, word_count,
-                       ts_rank_cd(content_vector, plainto_tsquery('spanish', %s)) AS rank
-                FROM documents
-                WHERE is_active = TRUE
-                  AND content_vector @@ plainto_tsquery('spanish', %s)
-                ORDER BY rank DESC
-                LIMIT %s
-                """,
-                (query, query, limit)
-            )
+        hits, = run_queries([_kb_search_query(query, limit, tag_filter)], dict_cursor=True)
+        vector_hits = semantic_search(query, "KB", limit * 4)
+        if vector_hits:
+            order, missing = _fuse_kb_hits(hits, vector_hits, limit)
+            if missing:
+                extra, = run_queries([_kb_chunks_by_key_query(missing, tag_filter)], dict_cursor=True)
+                hits = hits + extra
+            hits = _order_kb_hits(hits, order)
+        if not hits:
+            hits, = run_queries([_kb_search_docs_query(query, limit, tag_filter)], dict_cursor=True)
+        return _format_kb_search(hits, query, limit)
+    except Exception as e:
+        logger.error(f"kb_search error: {e}")
+        return f"❌ Error en búsqueda: {e}"
 
-        rows = cur.fetchall()
-        conn.close()
 
-        if not rows:
-            return f"🔍 Sin resultados para: *{query}*"
-
-        out = [f"🔍 *{len(rows)} resultado(s)* para: _{query}_\n"]
-        for i, r in enumerate(rows, 1):
-            tags_str = " ".join(f"#{t}" for t in (r["tags"] or []))
-            snippet = r["snippet"].replace("\n", " ").strip()[:280]
-            out.append(
-                f"*{i}. {r['title']}*\n"
-                f"   📁 `{r['filepath']}`\n"
-                f"   🏷️ {tags_str or '(sin tags)'} · {r['word_count']} palabras\n"
-                f"   > {snippet}…\n"
-            )
-        return "\n".join(out)
+@cached(KB_CACHE, VAULT_VERSION, normalize=("query",))
+async def kb_search_async(query: str, limit: int = 5, tag_filter: Optional[str] = None) -> str:
+    """Versión async de kb_search (no bloquea el event loop)."""
+    if not query or not query.strip():
+        return "❌ Proporciona un término de búsqueda."
 
+    try:
+        (hits,), vector_hits = await asyncio.gather(
+            run_queries_async([_kb_search_query(query, limit, tag_filter)], dict_rows=True),
+            asyncio.to_thread(semantic_search, query, "KB", limit * 4),
+        )
+        if vector_hits:
+            order, missing = _fuse_kb_hits(hits, vector_hits, limit)
+            if missing:
+                extra, = await run_queries_async([_kb_chunks_by_key_query(missing, tag_filter)], dict_rows=True)
+                hits = hits + extra
+            hits = _order_kb_hits(hits, order)
+        if not hits:
+            hits, = await run_queries_async([_kb_search_docs_query(query, limit, tag_filter)], dict_rows=True)
+        return _format_kb_search(hits, query, limit)
     except Exception as e:
         logger.error(f"kb_search error: {e}")
         return f"❌ Error en búsqueda: {e}"
@@ -121,6 +245,93 @@ def kb_search(query: str, limit: int = 5, tag_filter: Optional[str] = None) -> s
 # TOOL 2: kb_list
 # ──────────────────────────────────────────────
 
+def _kb_list_queries(mode: str, tag: Optional[str], limit: int) -> List[Tuple[str, tuple]]:
+    if mode == "stats":
+        return [
+            ("""
+                SELECT COUNT(*) AS total_docs,
+                       COALESCE(SUM(word_count), 0) AS total_words,
+                       MAX(updated_at) AS last_updated
+                FROM documents WHERE is_active = TRUE
+            """, ()),
+            ("""
+                SELECT COUNT(DISTINCT tag) AS unique_tags
+                FROM documents, UNNEST(tags) AS tag
+                WHERE is_active = TRUE
+            """, ()),
+        ]
+    if mode == "tags":
+        return [("""
+                SELECT tag, COUNT(*) AS count
+                FROM documents, UNNEST(tags) AS tag
+                WHERE is_active = TRUE
+                GROUP BY tag ORDER BY count DESC LIMIT 30
+            """, ())]
+    if mode == "bytag":
+        return [(
+            """
+            SELECT filepath, title, word_count, updated_at
+            FROM documents
+            WHERE is_active = TRUE AND %s = ANY(tags)
+            ORDER BY updated_at DESC LIMIT %s
+            """,
+            (tag, limit)
+        )]
+    return [(
+        """
+        SELECT filepath, title, tags, word_count, updated_at
+        FROM documents WHERE is_active = TRUE
+        ORDER BY updated_at DESC LIMIT %s
+        """,
+        (limit,)
+    )]
+
+
+def _format_kb_list(mode: str, tag: Optional[str], results: List[List[Dict]]) -> str:
+    if mode == "stats":
+        row, tag_row = results[0][0], results[1][0]
+        last = row["last_updated"].strftime("%d/%m/%Y %H:%M") if row["last_updated"] else "N/A"
+        return (
+            f"📊 *Knowledge Base Stats*\n"
+            f"   📄 Documentos: {row['total_docs']:,}\n"
+            f"   📝 Palabras totales: {int(row['total_words']):,}\n"
+            f"   🏷️ Tags únicos: {tag_row['unique_tags'] or 0}\n"
+            f"   🕐 Última actualización: {last}"
+        )
+
+    rows = results[0]
+    if mode == "tags":
+        if not rows:
+            return "🏷️ No hay tags indexados aún."
+        lines = ["🏷️ *Tags disponibles:*\n"]
+        for r in rows:
+            lines.append(f"   `#{r['tag']}` ({r['count']})")
+        return "\n".join(lines)
+
+    if mode == "bytag":
+        if not rows:
+            return f"🏷️ No hay documentos con tag `#{tag}`."
+        lines = [f"🏷️ *Documentos con #{tag}:*\n"]
+        for r in rows:
+            date = r["updated_at"].strftime("%d/%m/%Y")
+            lines.append(f"   • *{r['title']}* — {r['word_count']} palabras · {date}")
+        return "\n".join(lines)
+
+    # recent
+    if not rows:
+        return "📚 Knowledge base vacía. Ejecuta kb_ingest para indexar tu vault."
+    lines = [f"📚 *Documentos recientes ({len(rows)}):*\n"]
+    for r in rows:
+        date = r["updated_at"].strftime("%d/%m")
+        tags_str = " ".join(f"#{t}" for t in (r["tags"] or [])[:3])
+        lines.append(
+            f"   • *{r['title']}* {tags_str}\n"
+            f"     `{r['filepath']}` · {r['word_count']}p · {date}"
+        )
+    return "\n".join(lines)
+
+
+@cached(KB_CACHE, VAULT_VERSION, normalize=("mode",))
 def kb_list(mode: str = "recent", tag: Optional[str] = None, limit: int = 10) -> str:
     """
     Lista documentos del vault.
@@ -133,95 +344,24 @@ def kb_list(mode: str = "recent", tag: Optional[str] = None, limit: int = 10) ->
         tag:   Tag a filtrar cuando mode="bytag"
         limit: Máximo de resultados
     """
+    if mode == "bytag" and not tag:
+        return "❌ Especifica un tag con el parámetro `tag=`."
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
+        results = run_queries(_kb_list_queries(mode, tag, limit), dict_cursor=True)
+        return _format_kb_list(mode, tag, results)
+    except Exception as e:
+        logger.error(f"kb_list error: {e}")
+        return f"❌ Error en listado: {e}"
 
-        if mode == "stats":
-            cur.execute("""
-                SELECT COUNT(*) AS total_docs,
-                       COALESCE(SUM(word_count), 0) AS total_words,
-                       MAX(updated_at) AS last_updated
-                FROM documents WHERE is_active = TRUE
-            """)
-            row = cur.fetchone()
-            cur.execute("""
-                SELECT COUNT(DISTINCT tag) AS unique_tags
-                FROM documents, UNNEST(tags) AS tag
-                WHERE is_active = TRUE
-            """)
-            tag_row = cur.fetchone()
-            conn.close()
-            last = row["last_updated"].strftime("%d/%m/%Y %H:%M") if row["last_updated"] else "N/A"
-            return (
-                f"📊 *Knowledge Base Stats*\n"
-                f"   📄 Documentos: {row['total_docs']:,}\n"
-                f"   📝 Palabras totales: {int(row['total_words']):,}\n"
-                f"   🏷️ Tags únicos: {tag_row['unique_tags'] or 0}\n"
-                f"   🕐 Última actualización: {last}"
-            )
-
-        elif mode == "tags":
-            cur.execute("""
-                SELECT tag, COUNT(*) AS count
-                FROM documents, UNNEST(tags) AS tag
-                WHERE is_active = TRUE
-                GROUP BY tag ORDER BY count DESC LIMIT 30
-            """)
-            rows = cur.fetchall()
-            conn.close()
-            if not rows:
-                return "🏷️ No hay tags indexados aún."
-            lines = ["🏷️ *Tags disponibles:*\n"]
-            for r in rows:
-                lines.append(f"   `#{r['tag']}` ({r['count']})")
-            return "\n".join(lines)
-
-        elif mode == "bytag":
-            if not tag:
-                return "❌ Especifica un tag con el parámetro `tag=`."
-            cur.execute(
-                """
-                SELECT filepath, title, word_count, updated_at
-                FROM documents
-                WHERE is_active = TRUE AND %s = ANY(tags)
-                ORDER BY updated_at DESC LIMIT %s
-                """,
-                (tag, limit)
-            )
-            rows = cur.fetchall()
-            conn.close()
-            if not rows:
-                return f"🏷️ No hay documentos con tag `#{tag}`."
-            lines = [f"🏷️ *Documentos con #{tag}:*\n"]
-            for r in rows:
-                date = r["updated_at"].strftime("%d/%m/%Y")
-                lines.append(f"   • *{r['title']}* — {r['word_count']} palabras · {date}")
-            return "\n".join(lines)
-
-        else:  # recent
-            cur.execute(
-                """
-                SELECT filepath, title, tags, word_count, updated_at
-                FROM documents WHERE is_active = TRUE
-                ORDER BY updated_at DESC LIMIT %s
-                """,
-                (limit,)
-            )
-            rows = cur.fetchall()
-            conn.close()
-            if not rows:
-                return "📚 Knowledge base vacía. Ejecuta kb_ingest para indexar tu vault."
-            lines = [f"📚 *Documentos recientes ({len(rows)}):*\n"]
-            for r in rows:
-                date = r["updated_at"].strftime("%d/%m")
-                tags_str = " ".join(f"#{t}" for t in (r["tags"] or [])[:3])
-                lines.append(
-                    f"   • *{r['title']}* {tags_str}\n"
-                    f"     `{r['filepath']}` · {r['word_count']}p · {date}"
-                )
-            return "\n".join(lines)
 
+@cached(KB_CACHE, VAULT_VERSION, normalize=("mode",))
+async def kb_list_async(mode: str = "recent", tag: Optional[str] = None, limit: int = 10) -> str:
+    """Versión async de kb_list."""
+    if mode == "bytag" and not tag:
+        return "❌ Especifica un tag con el parámetro `tag=`."
+    try:
+        results = await run_queries_async(_kb_list_queries(mode, tag, limit), dict_rows=True)
+        return _format_kb_list(mode, tag, results)
     except Exception as e:
         logger.error(f"kb_list error: {e}")
         return f"❌ Error en listado: {e}"
@@ -231,84 +371,194 @@ def kb_list(mode: str = "recent", tag: Optional[str] = None, limit: int = 10) ->
 # TOOL 3: kb_read
 # ──────────────────────────────────────────────
 
-def kb_read(filepath: str, max_chars: int = 3000) -> str:
+_KB_READ_EXACT_SQL = """
+    SELECT filepath, title, content, tags, word_count, updated_at
+    FROM documents
+    WHERE is_active = TRUE AND filepath = %s
+"""
+
+KB_FUZZY_CANDIDATES = 5   # sin filepath exacto: la mejor coincidencia + alternativas
+
+_KB_READ_COLUMNS = "filepath, title, content, tags, word_count, updated_at"
+
+
+def _kb_fuzzy_query(text: str, select: str, limit: int) -> Tuple[str, tuple]:
+    # Fallback: título o ruta parecidos (trigramas, tolera typos y acentos)
+    return fuzzy_query("documents", ["title", "filepath"], text, select, limit, where="is_active = TRUE")
+
+# Con query: secciones de la nota ordenadas por relevancia
+_KB_READ_CHUNKS_SQL = """
+    SELECT chunk_index, heading, content,
+           ts_rank_cd(content_vector, plainto_tsquery('spanish', %s)) AS rank
+    FROM document_chunks
+    WHERE filepath = %s
+    ORDER BY rank DESC, chunk_index
+"""
+
+
+def _relevant_sections(chunks: List[Dict], max_chars: int) -> Optional[str]:
+    """Las secciones más relevantes que quepan en max_chars, en orden de la nota."""
+    if not chunks or not chunks[0]["rank"]:
+        return None
+    picked, used = [], 0
+    for c in chunks:
+        if not c["rank"] or (picked and used + len(c["content"]) > max_chars):
+            break
+        picked.append(c)
+        used += len(c["content"])
+    picked.sort(key=lambda c: c["chunk_index"])
+    return "\n\n".join(
+        (f"## {c['heading']}\n" if c["heading"] else "") + c["content"][:max_chars]
+        for c in picked
+    )
+
+
+def _format_kb_read(row: Optional[Dict], filepath: str, max_chars: int,
+                    sections: Optional[str] = None, query: Optional[str] = None,
+                    alternatives: Optional[List[Dict]] = None) -> str:
+    if not row:
+        return (
+            f"❌ Documento no encontrado: `{filepath}`\n"
+            f"Usa `kb_search` para encontrar el filepath correcto."
+        )
+
+    tags_str = " ".join(f"#{t}" for t in (row["tags"] or []))
+    date = row["updated_at"].strftime("%d/%m/%Y")
+    content = sections or row["content"]
+    truncated = len(content) > max_chars
+    if truncated:
+        content = content[:max_chars]
+
+    out = [
+        f"📄 *{row['title']}*",
+        f"   📁 `{row['filepath']}`",
+        f"   🏷️ {tags_str or '(sin tags)'}",
+        f"   📝 {row['word_count']} palabras · {date}",
+        "─" * 35,
+        content,
+    ]
+    if sections:
+        out.append(f"\n_[Secciones más relevantes para '{query}'. Sin query: inicio de la nota]_")
+    elif truncated:
+        out.append(f"\n_[Truncado a {max_chars} chars. Total: {row['word_count']} palabras]_")
+    if alternatives is not None:
+        out.append(f"\n_[No existe `{filepath}`: coincidencia aproximada ({row['fuzzy_score']:.0%})]_")
+        for alt in alternatives:
+            out.append(f"   · {alt['title']} — `{alt['filepath']}` ({alt['fuzzy_score']:.0%})")
+
+    return "\n".join(out)
+
+
+@cached(KB_CACHE, VAULT_VERSION, normalize=False)
+def kb_read(filepath: str, max_chars: int = 3000, query: Optional[str] = None) -> str:
     """
     Lee contenido completo de un documento del vault.
 
     Args:
         filepath:  Ruta relativa del doc (como aparece en kb_search)
         max_chars: Máx caracteres a retornar (default: 3000)
+        query:     Si se indica, solo las secciones relevantes para la query
     """
     if not filepath or not filepath.strip():
         return "❌ Proporciona el filepath del documento."
 
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            SELECT filepath, title, content, tags, word_count, updated_at
-            FROM documents
-            WHERE is_active = TRUE AND filepath = %s
-            """,
-            (filepath.strip(),)
-        )
-        row = cur.fetchone()
+        rows, = run_queries([(_KB_READ_EXACT_SQL, (filepath.strip(),))], dict_cursor=True)
+        alternatives = None
+        if not rows:
+            rows, = run_queries([_kb_fuzzy_query(filepath, _KB_READ_COLUMNS, KB_FUZZY_CANDIDATES)], dict_cursor=True)
+            alternatives = rows[1:]
+        sections = None
+        if rows and query:
+            chunks, = run_queries([(_KB_READ_CHUNKS_SQL, (query, rows[0]["filepath"]))], dict_cursor=True)
+            sections = _relevant_sections(chunks, max_chars)
+        return _format_kb_read(rows[0] if rows else None, filepath, max_chars, sections, query, alternatives)
+    except Exception as e:
+        logger.error(f"kb_read error: {e}")
+        return f"❌ Error leyendo documento: {e}"
 
-        # Fallback: busca por título parcial
-        if not row:
-            cur.execute(
-                """
-                SELECT filepath, title, content, tags, word_count, updated_at
-                FROM documents
-                WHERE is_active = TRUE AND (filepath ILIKE %s OR title ILIKE %s)
-                ORDER BY updated_at DESC LIMIT 1
-                """,
-                (f"%{filepath}%", f"%{filepath}%")
-            )
-            row = cur.fetchone()
 
-        conn.close()
+@cached(KB_CACHE, VAULT_VERSION, normalize=False)
+async def kb_read_async(filepath: str, max_chars: int = 3000, query: Optional[str] = None) -> str:
+    """Versión async de kb_read."""
+    if not filepath or not filepath.strip():
+        return "❌ Proporciona el filepath del documento."
 
-        if not row:
-            return (
-                f"❌ Documento no encontrado: `{filepath}`\n"
-                f"Usa `kb_search` para encontrar el filepath correcto."
+    try:
+        rows, = await run_queries_async([(_KB_READ_EXACT_SQL, (filepath.strip(),))], dict_rows=True)
+        alternatives = None
+        if not rows:
+            rows, = await run_queries_async(
+                [_kb_fuzzy_query(filepath, _KB_READ_COLUMNS, KB_FUZZY_CANDIDATES)], dict_rows=True
             )
-
-        tags_str = " ".join(f"#{t}" for t in (row["tags"] or []))
-        date = row["updated_at"].strftime("%d/%m/%Y")
-        content = row["content"]
-        truncated = len(content) > max_chars
-        if truncated:
-            content = content[:max_chars]
-
-        out = [
-            f"📄 *{row['title']}*",
-            f"   📁 `{row['filepath']}`",
-            f"   🏷️ {tags_str or '(sin tags)'}",
-            f"   📝 {row['word_count']} palabras · {date}",
-            "─" * 35,
-            content,
-        ]
-        if truncated:
-            out.append(f"\n_[Truncado a {max_chars} chars. Total: {row['word_count']} palabras]_")
-
-        return "\n".join(out)
-
+            alternatives = rows[1:]
+        sections = None
+        if rows and query:
+            chunks, = await run_queries_async(
+                [(_KB_READ_CHUNKS_SQL, (query, rows[0]["filepath"]))], dict_rows=True
+            )
+            sections = _relevant_sections(chunks, max_chars)
+        return _format_kb_read(rows[0] if rows else None, filepath, max_chars, sections, query, alternatives)
     except Exception as e:
         logger.error(f"kb_read error: {e}")
         return f"❌ Error leyendo documento: {e}"
 
 
+def kb_fuzzy_find(text: str, limit: int = KB_FUZZY_CANDIDATES) -> List[Dict]:
+    """
+    Notas cuyo título o ruta se parecen a `text` (typos, acentos, fragmentos).
+    Retorna [{filepath, title, fuzzy_score}, ...] de mayor a menor score.
+    """
+    if not text or not text.strip():
+        return []
+    rows, = run_queries([_kb_fuzzy_query(text, "filepath, title", limit)], dict_cursor=True)
+    return rows
+
+
 # ──────────────────────────────────────────────
 # INGESTOR (usado por kb_ingest)
 # ──────────────────────────────────────────────
+# Pipeline por etapas:
+#   scan  → stat de los .md (sin leerlos)
+#   load  → mapa filepath → (mtime, hash, activo) en UNA consulta
+#   parse → solo archivos con mtime nuevo, en paralelo (procesos solo desde la CLI)
+#   write → documentos, chunks y links en lotes (execute_values), una transacción
+#   links → resolución de [[wikilinks]] en memoria, también los colgantes
+#   embed → embeddings de los chunks nuevos/modificados (embeddings.py)
+
+# Workers para el parseo; con pocos archivos cambiados se parsea en línea.
+# Dentro del bot el pool es de threads: hacer fork de un proceso con event loop,
+# pool de DB y threads de fondo puede colgar al hijo en un lock tomado.
+# Los procesos (spawn) quedan para la CLI: python knowledge_base.py [vault]
+KB_PARSE_WORKERS = int(os.environ.get("KB_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+KB_PARSE_POOL_MIN = 32
+
+_UPSERT_DOCS_SQL = """
+    INSERT INTO documents (filepath, title, content, tags, metadata, word_count,
+                           file_modified_at, content_hash, is_active)
+    VALUES %s
+    ON CONFLICT (filepath) DO UPDATE SET
+        title = EXCLUDED.title, content = EXCLUDED.content, tags = EXCLUDED.tags,
+        metadata = EXCLUDED.metadata, word_count = EXCLUDED.word_count,
+        file_modified_at = EXCLUDED.file_modified_at,
+        content_hash = EXCLUDED.content_hash, is_active = TRUE
+"""
+_UPSERT_DOCS_TEMPLATE = "(%s, %s, %s, %s::text[], %s, %s, %s, %s, TRUE)"
+
+# Chunks: secciones por heading, partidas por párrafo si exceden este tamaño
+KB_CHUNK_CHARS = 1500
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+def _parse_note(vault: str, filepath: str) -> Optional[Dict]:
+    """Parsea una nota; a nivel de módulo para poder enviarla al pool de procesos."""
+    return _ObsidianIngestor(vault)._process(Path(filepath))
+
 
 class _ObsidianIngestor:
-    def __init__(self, vault_path: str):
+    def __init__(self, vault_path: str, parse_processes: bool = False):
         self.vault = Path(vault_path)
+        self.parse_processes = parse_processes
 
     def _frontmatter(self, content: str) -> Tuple[Dict, str]:
         fm, body = {}, content
@@ -344,117 +594,336 @@ class _ObsidianIngestor:
     def _links(self, content: str) -> List[str]:
         return re.findall(r"\[\[([^\]]+)\]\]", content)
 
+    def _chunks(self, body: str) -> List[Dict]:
+        """Divide la nota en secciones por heading (ruta "H1 > H2") de hasta KB_CHUNK_CHARS."""
+        sections, path, pos = [], [], 0
+        for m in _HEADING_RE.finditer(body):
+            sections.append((" > ".join(h for _, h in path), body[pos:m.start()]))
+            level = len(m.group(1))
+            path = [(lvl, h) for lvl, h in path if lvl < level] + [(level, m.group(2).strip())]
+            pos = m.end()
+        sections.append((" > ".join(h for _, h in path), body[pos:]))
+
+        chunks = []
+        for heading, text in sections:
+            piece = ""
+            for para in re.split(r"\n\s*\n", text.strip()):
+                if piece and len(piece) + len(para) > KB_CHUNK_CHARS:
+                    chunks.append({"heading": heading, "content": piece})
+                    piece = ""
+                piece = f"{piece}\n\n{para}" if piece else para
+                while len(piece) > KB_CHUNK_CHARS:
+                    cut = piece.rfind(" ", 0, KB_CHUNK_CHARS)
+                    cut = cut if cut > 0 else KB_CHUNK_CHARS
+                    chunks.append({"heading": heading, "content": piece[:cut]})
+                    piece = piece[cut:].lstrip()
+            if piece.strip():
+                chunks.append({"heading": heading, "content": piece})
+        return chunks
+
     def _process(self, filepath: Path) -> Optional[Dict]:
         try:
-            content = filepath.read_text(encoding="utf-8")
+            raw = filepath.read_bytes()
+            content = raw.decode("utf-8")
+            stat = filepath.stat()
             rel = str(filepath.relative_to(self.vault))
             fm, body = self._frontmatter(content)
             return {
                 "filepath": rel,
-                "title": self._title(rel, body, fm),
+                "title": self._title(rel, body, fm)[:200],
                 "content": body,
                 "tags": self._tags(body, fm),
-                "metadata": Json({
+                "metadata": {
                     "frontmatter": fm,
                     "internal_links": self._links(body),
-                    "file_size": filepath.stat().st_size,
-                }),
+                    "file_size": stat.st_size,
+                },
                 "word_count": len(re.findall(r"\w+", body)),
-                "file_modified_at": datetime.fromtimestamp(filepath.stat().st_mtime),
+                "file_modified_at": datetime.fromtimestamp(stat.st_mtime),
+                "content_hash": hashlib.sha1(raw).hexdigest(),
+                "chunks": self._chunks(body),
             }
         except Exception as e:
             logger.warning(f"Error procesando {filepath}: {e}")
             return None
 
-    def _upsert(self, conn, doc: Dict) -> str:
+    # ── Etapas ─────────────────────────────────
+
+    def _scan(self) -> Dict[str, Tuple[Path, datetime]]:
+        """filepath relativo → (Path, mtime), solo con stat."""
+        files = {}
+        for f in self.vault.rglob("*.md"):
+            rel = f.relative_to(self.vault)
+            if any(p.startswith(".") for p in rel.parts):
+                continue
+            try:
+                files[str(rel)] = (f, datetime.fromtimestamp(f.stat().st_mtime))
+            except OSError:
+                continue
+        return files
+
+    def _load_state(self, conn, filepaths: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Estado indexado: filepath → {file_modified_at, content_hash, is_active, has_chunks}."""
+        cur = conn.cursor()
+        sql = """
+            SELECT filepath, file_modified_at, content_hash, is_active,
+                   EXISTS (SELECT 1 FROM document_chunks c WHERE c.filepath = d.filepath) AS has_chunks
+            FROM documents d
+        """
+        if filepaths is None:
+            cur.execute(sql)
+        else:
+            cur.execute(sql + " WHERE d.filepath = ANY(%s)", (list(filepaths),))
+        return {r["filepath"]: r for r in cur.fetchall()}
+
+    @staticmethod
+    def _needs_parse(state: Optional[Dict], mtime: datetime) -> bool:
+        if not state or not state["is_active"] or not state["file_modified_at"]:
+            return True
+        if not state["has_chunks"]:
+            return True  # indexado antes de existir document_chunks
+        return mtime > state["file_modified_at"]
+
+    def _parse_many(self, paths: List[Path]) -> List[Dict]:
+        """Parsea en un pool (procesos en la CLI, threads en el bot) si hay suficientes archivos."""
+        if len(paths) >= KB_PARSE_POOL_MIN and KB_PARSE_WORKERS > 1:
+            if self.parse_processes:
+                try:
+                    with ProcessPoolExecutor(max_workers=KB_PARSE_WORKERS,
+                                             mp_context=multiprocessing.get_context("spawn")) as pool:
+                        docs = list(pool.map(_parse_note, repeat(str(self.vault)), map(str, paths), chunksize=16))
+                    return [d for d in docs if d]
+                except Exception as e:
+                    logger.warning(f"Pool de procesos no disponible, parseando con threads: {e}")
+            with ThreadPoolExecutor(max_workers=KB_PARSE_WORKERS, thread_name_prefix="kb-parse") as pool:
+                return [d for d in pool.map(self._process, paths) if d]
+        return [d for d in (self._process(p) for p in paths) if d]
+
+    def _write(self, conn, docs: List[Dict], known: Dict[str, Dict]) -> Dict:
+        """Escribe documentos y links en lotes. No hace commit."""
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+        cur = conn.cursor()
+
+        changed, touched = [], []
+        for doc in docs:
+            state = known.get(doc["filepath"])
+            if (state and state["is_active"] and state["has_chunks"]
+                    and state["content_hash"] == doc["content_hash"]):
+                # Solo cambió el mtime (sync, touch): no re-indexar el contenido
+                touched.append((doc["filepath"], doc["file_modified_at"]))
+                counts["skipped"] += 1
+            else:
+                changed.append(doc)
+                counts["updated" if state else "inserted"] += 1
+
+        if touched:
+            execute_values(
+                cur,
+                """UPDATE documents d SET file_modified_at = v.mtime
+                   FROM (VALUES %s) AS v(filepath, mtime)
+                   WHERE d.filepath = v.filepath""",
+                touched, template="(%s, %s::timestamp)"
+            )
+
+        if changed:
+            execute_values(cur, _UPSERT_DOCS_SQL, [
+                (d["filepath"], d["title"], d["content"], d["tags"], Json(d["metadata"]),
+                 d["word_count"], d["file_modified_at"], d["content_hash"])
+                for d in changed
+            ], template=_UPSERT_DOCS_TEMPLATE, page_size=200)
+            self._write_chunks(cur, changed)
+            self._write_links(cur, changed)
+
+        return counts
+
+    def _write_chunks(self, cur, docs: List[Dict]):
+        """Reemplaza los chunks de los docs cambiados (tsvector por chunk)."""
+        cur.execute("DELETE FROM document_chunks WHERE filepath = ANY(%s)", ([d["filepath"] for d in docs],))
+        rows = [
+            (d["filepath"], i, c["heading"], c["content"], f"{c['heading']} {c['content']}")
+            for d in docs for i, c in enumerate(d["chunks"])
+        ]
+        if rows:
+            execute_values(
+                cur,
+                "INSERT INTO document_chunks (filepath, chunk_index, heading, content, content_vector) VALUES %s",
+                rows, template="(%s, %s, %s, %s, to_tsvector('spanish', %s))", page_size=500
+            )
+
+    def _write_links(self, cur, docs: List[Dict]):
+        """Reemplaza document_links de los docs cambiados (sin resolver: ver _resolve_links)."""
+        sources = [d["filepath"] for d in docs]
+        cur.execute("DELETE FROM document_links WHERE source_filepath = ANY(%s)", (sources,))
+        rows = [(d["filepath"], target) for d in docs
+                for target in set(d["metadata"]["internal_links"])]
+        if not rows:
+            return
+        execute_values(
+            cur,
+            """INSERT INTO document_links (source_filepath, target_title)
+               VALUES %s ON CONFLICT (source_filepath, target_title) DO NOTHING""",
+            rows, page_size=500
+        )
+
+    @staticmethod
+    def _link_key(target: str) -> str:
+        """[[carpeta/Nota#Sección|alias]] → "carpeta/nota"."""
+        target = target.split("|", 1)[0].split("#", 1)[0].split("^", 1)[0]
+        target = target.strip().replace("\\", "/")
+        if target.lower().endswith(".md"):
+            target = target[:-3]
+        return target.lower()
+
+    def _resolve_links(self, conn) -> Dict:
+        """
+        Resuelve todos los document_links contra un mapa en memoria
+        (ruta, nombre de archivo, título y aliases → filepath) y actualiza
+        en lote solo los que cambiaron. Re-resuelve links colgantes y los
+        que apuntaban a notas desactivadas.
+        """
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT filepath, title, metadata->'frontmatter'->'aliases' AS aliases
+            FROM documents WHERE is_active = TRUE
+        """)
+        by_path, by_stem, by_title, by_alias = {}, {}, {}, {}
+        for r in cur.fetchall():
+            fp = r["filepath"]
+            path_key = self._link_key(fp)
+            by_path.setdefault(path_key, fp)
+            by_stem.setdefault(path_key.rsplit("/", 1)[-1], fp)
+            by_title.setdefault((r["title"] or "").strip().lower(), fp)
+            aliases = r["aliases"] or []
+            if isinstance(aliases, str):
+                aliases = [aliases]
+            for alias in aliases:
+                by_alias.setdefault(str(alias).strip().lower(), fp)
+
+        def resolve(target: str) -> Optional[str]:
+            key = self._link_key(target)
+            if not key:
+                return None
+            return (by_path.get(key) or by_stem.get(key.rsplit("/", 1)[-1])
+                    or by_title.get(key) or by_alias.get(key))
+
+        cur.execute("SELECT source_filepath, target_title, target_filepath FROM document_links")
+        changes, dangling, total = [], 0, 0
+        for r in cur.fetchall():
+            total += 1
+            target_fp = resolve(r["target_title"])
+            if target_fp is None:
+                dangling += 1
+            if target_fp != r["target_filepath"]:
+                changes.append((r["source_filepath"], r["target_title"], target_fp))
+
+        if changes:
+            execute_values(
+                cur,
+                """UPDATE document_links dl SET target_filepath = v.target_filepath
+                   FROM (VALUES %s) AS v(source_filepath, target_title, target_filepath)
+                   WHERE dl.source_filepath = v.source_filepath AND dl.target_title = v.target_title""",
+                changes, template="(%s, %s, %s::text)", page_size=500
+            )
+        return {"links_resolved": total - dangling, "links_dangling": dangling}
+
+    def _deactivate_missing(self, conn, present: List[str]) -> int:
         cur = conn.cursor()
         cur.execute(
-            "SELECT id, file_modified_at FROM documents WHERE filepath = %s",
-            (doc["filepath"],)
+            "UPDATE documents SET is_active = FALSE WHERE is_active = TRUE AND NOT (filepath = ANY(%s))",
+            (list(present),)
         )
-        existing = cur.fetchone()
-        if existing:
-            if doc["file_modified_at"] > existing["file_modified_at"]:
-                cur.execute(
-                    """UPDATE documents SET title=%s, content=%s, tags=%s,
-                       metadata=%s, word_count=%s, file_modified_at=%s, updated_at=NOW()
-                       WHERE id=%s""",
-                    (doc["title"], doc["content"], doc["tags"], doc["metadata"],
-                     doc["word_count"], doc["file_modified_at"], existing["id"])
-                )
-                self._upsert_links(conn, doc)
-                return "updated"
-            return "skipped"
-        else:
+        return cur.rowcount
+
+    @staticmethod
+    def _bump_if_changed(conn, counts: Dict):
+        """Sube vault_version (invalida KB_CACHE) si hubo insert, update o desactivación."""
+        if counts.get("inserted") or counts.get("updated") or counts.get("deactivated"):
+            VAULT_VERSION.bump(conn.cursor())
+
+    # ── Entradas ───────────────────────────────
+
+    def deactivate_files(self, filepaths: List[str]) -> int:
+        """Desactiva docs borrados/renombrados y sus links salientes (sin escanear el vault)."""
+        with _get_conn() as conn:
+            cur = conn.cursor()
             cur.execute(
-                """INSERT INTO documents (filepath, title, content, tags, metadata, word_count, file_modified_at)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-                (doc["filepath"], doc["title"], doc["content"], doc["tags"],
-                 doc["metadata"], doc["word_count"], doc["file_modified_at"])
+                "UPDATE documents SET is_active = FALSE WHERE is_active = TRUE AND filepath = ANY(%s)",
+                (list(filepaths),)
             )
-            self._upsert_links(conn, doc)
-            return "inserted"
-
-    def _upsert_links(self, conn, doc: Dict):
-        """Actualiza document_links para este documento."""
+            deactivated = cur.rowcount
+            cur.execute("DELETE FROM document_links WHERE source_filepath = ANY(%s)", (list(filepaths),))
+            cur.execute("DELETE FROM document_chunks WHERE filepath = ANY(%s)", (list(filepaths),))
+            self._resolve_links(conn)
+            self._bump_if_changed(conn, {"deactivated": deactivated})
+            conn.commit()
+        self._embed()
+        return deactivated
+
+    @staticmethod
+    def _embed() -> Dict:
+        """Actualiza el índice semántico; si falla, la KB sigue con full-text."""
         try:
-            cur = conn.cursor()
-            # Extraer wikilinks del contenido original
-            links = self._links(doc["content"])
-            if not links:
-                return
-            # Borrar links previos de este source
-            cur.execute("DELETE FROM document_links WHERE source_filepath = %s", (doc["filepath"],))
-            for target_title in set(links):
-                # Intentar resolver el filepath del target
-                cur.execute(
-                    "SELECT filepath FROM documents WHERE title ILIKE %s AND is_active = TRUE LIMIT 1",
-                    (target_title,)
-                )
-                row = cur.fetchone()
-                target_fp = row["filepath"] if row else None
-                cur.execute(
-                    """INSERT INTO document_links (source_filepath, target_title, target_filepath)
-                       VALUES (%s, %s, %s)
-                       ON CONFLICT (source_filepath, target_title) DO UPDATE
-                       SET target_filepath = EXCLUDED.target_filepath""",
-                    (doc["filepath"], target_title, target_fp)
-                )
+            return update_kb_index()
         except Exception as e:
-            logger.warning(f"_upsert_links warning: {e}")
+            logger.warning(f"Embeddings KB no actualizados: {e}")
+            return {}
 
     def run(self, cleanup: bool = False) -> Dict:
         if not self.vault.exists():
             raise FileNotFoundError(f"Vault no encontrado: {self.vault}")
 
-        conn = _get_conn()
-        conn.autocommit = True
-
-        md_files = [
-            f for f in self.vault.rglob("*.md")
-            if not any(p.startswith(".") for p in f.parts)
-        ]
-
-        counts = {"inserted": 0, "updated": 0, "skipped": 0, "errors": 0}
-        for fp in md_files:
-            doc = self._process(fp)
-            if doc:
-                result = self._upsert(conn, doc)
-                counts[result] += 1
-            else:
-                counts["errors"] += 1
+        timings = {}
+        t = time.perf_counter()
+        files = self._scan()
+        timings["scan"] = time.perf_counter() - t
+
+        with _get_conn() as conn:
+            t = time.perf_counter()
+            known = self._load_state(conn)
+            timings["load"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            pending = [path for rel, (path, mtime) in files.items()
+                       if self._needs_parse(known.get(rel), mtime)]
+            docs = self._parse_many(pending)
+            timings["parse"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            counts = self._write(conn, docs, known)
+            counts["skipped"] += len(files) - len(pending)
+            counts["errors"] = len(pending) - len(docs)
+            if cleanup:
+                counts["deactivated"] = self._deactivate_missing(conn, list(files))
+            timings["write"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            counts.update(self._resolve_links(conn))
+            self._bump_if_changed(conn, counts)
+            conn.commit()
+            timings["links"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        counts["embedded"] = self._embed().get("embedded", 0)
+        timings["embed"] = time.perf_counter() - t
+
+        counts["timings"] = timings
+        logger.info(
+            f"kb_ingest: {len(files)} archivos, {len(pending)} parseados · "
+            + " · ".join(f"{k} {v:.2f}s" for k, v in timings.items())
+        )
+        return counts
 
-        if cleanup:
-            cur = conn.cursor()
-            cur.execute("SELECT id, filepath FROM documents WHERE is_active = TRUE")
-            deactivated = 0
-            for row in cur.fetchall():
-                if not (self.vault / row["filepath"]).exists():
-                    cur.execute("UPDATE documents SET is_active=FALSE WHERE id=%s", (row["id"],))
-                    deactivated += 1
-            counts["deactivated"] = deactivated
-
-        conn.close()
+    def ingest_files(self, paths: List[Path]) -> Dict:
+        """Re-indexa solo estos archivos (kb_save_insight, cambios puntuales)."""
+        docs = [d for d in (self._process(Path(p)) for p in paths) if d]
+        with _get_conn() as conn:
+            known = self._load_state(conn, [d["filepath"] for d in docs])
+            counts = self._write(conn, docs, known)
+            counts.update(self._resolve_links(conn))
+            self._bump_if_changed(conn, counts)
+            conn.commit()
+        self._embed()
+        counts["errors"] = len(paths) - len(docs)
         return counts
 
 
@@ -462,14 +931,16 @@ class _ObsidianIngestor:
 # TOOL 4: kb_ingest
 # ──────────────────────────────────────────────
 
-def kb_ingest(vault_path: Optional[str] = None, cleanup: bool = False) -> str:
+def kb_ingest(vault_path: Optional[str] = None, cleanup: bool = False,
+              parse_processes: bool = False) -> str:
     """
     Indexa o re-indexa el vault de Obsidian en PostgreSQL.
     Solo procesa archivos nuevos o modificados.
 
     Args:
-        vault_path: Ruta al vault (usa OBSIDIAN_VAULT_PATH si no se especifica)
-        cleanup:    Si True, desactiva docs de archivos eliminados
+        vault_path:      Ruta al vault (usa OBSIDIAN_VAULT_PATH si no se especifica)
+        cleanup:         Si True, desactiva docs de archivos eliminados
+        parse_processes: Parseo en procesos (solo desde la CLI, nunca dentro del bot)
     """
     path = vault_path or os.environ.get("OBSIDIAN_VAULT_PATH")
     if not path:
@@ -479,7 +950,7 @@ def kb_ingest(vault_path: Optional[str] = None, cleanup: bool = False) -> str:
         )
 
     try:
-        ingestor = _ObsidianIngestor(path)
+        ingestor = _ObsidianIngestor(path, parse_processes=parse_processes)
         counts = ingestor.run(cleanup=cleanup)
         lines = [
             f"✅ *Ingestión completada*",
@@ -490,6 +961,13 @@ def kb_ingest(vault_path: Optional[str] = None, cleanup: bool = False) -> str:
         ]
         if cleanup and "deactivated" in counts:
             lines.append(f"   🗑️ Desactivados: {counts['deactivated']}")
+        if "links_resolved" in counts:
+            lines.append(f"   🔗 Links: {counts['links_resolved']} resueltos · {counts['links_dangling']} sin destino")
+        if counts.get("embedded"):
+            lines.append(f"   🧭 Chunks embebidos: {counts['embedded']}")
+        timings = counts.get("timings", {})
+        if timings:
+            lines.append("   ⏱️ " + " · ".join(f"{k} {v:.1f}s" for k, v in timings.items()))
         return "\n".join(lines)
 
     except FileNotFoundError as e:
@@ -504,12 +982,12 @@ def kb_ingest(vault_path: Optional[str] = None, cleanup: bool = False) -> str:
 # ──────────────────────────────────────────────
 
 def setup_kb_extra_tables():
-    """Crea tablas document_links y mental_model_usage si no existen."""
+    """Crea tablas document_links, document_chunks y mental_model_usage si no existen (y columnas nuevas de documents)."""
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
+        with _get_conn() as conn:
+            cur = conn.cursor()
 
-        cur.execute("""
+            cur.execute("""
             CREATE TABLE IF NOT EXISTS document_links (
                 id SERIAL PRIMARY KEY,
                 source_filepath TEXT NOT NULL,
@@ -519,10 +997,38 @@ def setup_kb_extra_tables():
                 UNIQUE(source_filepath, target_title)
             )
         """)
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_doclinks_source ON document_links (source_filepath)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_doclinks_target ON document_links (target_filepath)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_doclinks_source ON document_links (source_filepath)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_doclinks_target ON document_links (target_filepath)")
 
-        cur.execute("""
+            # Hash del contenido: un mtime nuevo con el mismo contenido no re-indexa
+            cur.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash TEXT")
+
+            # Chunks por sección: kb_search rankea pasajes, no notas completas
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                id SERIAL PRIMARY KEY,
+                filepath TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                heading TEXT,
+                content TEXT NOT NULL,
+                content_vector TSVECTOR,
+                UNIQUE(filepath, chunk_index)
+            )
+        """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_chunks_fts ON document_chunks USING GIN(content_vector)")
+
+            # Búsqueda difusa de kb_read: trigramas sobre título y ruta (fuzzy.py)
+            setup_fuzzy_search(cur)
+            cur.execute(trgm_index_sql("idx_documents_title_trgm", "documents", "title"))
+            cur.execute(trgm_index_sql("idx_documents_path_trgm", "documents", "filepath"))
+
+            # Vectores del índice semántico (embeddings.py)
+            cur.execute(EMBEDDINGS_DDL)
+
+            # Versiones del vault/biblioteca para invalidar las cachés (ttl_cache.py)
+            cur.execute(KB_META_DDL)
+
+            cur.execute("""
             CREATE TABLE IF NOT EXISTS mental_model_usage (
                 id SERIAL PRIMARY KEY,
                 model_name TEXT NOT NULL,
@@ -531,11 +1037,10 @@ def setup_kb_extra_tables():
                 used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_mm_name ON mental_model_usage (LOWER(model_name))")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_mm_name ON mental_model_usage (LOWER(model_name))")
 
-        conn.commit()
-        cur.close()
-        conn.close()
+            conn.commit()
+            cur.close()
         logger.info("Tablas document_links y mental_model_usage verificadas/creadas")
         return True
     except Exception as e:
@@ -547,69 +1052,78 @@ def setup_kb_extra_tables():
 # TOOL D: kb_graph
 # ──────────────────────────────────────────────
 
-def kb_graph(filepath: str) -> str:
-    """
-    Muestra el grafo de conexiones de un documento del vault.
-    Retorna documentos que enlaza (salientes) y documentos que lo enlazan (entrantes).
-
-    Args:
-        filepath: Ruta relativa del documento (como aparece en kb_search)
-    """
-    if not filepath or not filepath.strip():
-        return "❌ Proporciona el filepath del documento."
-
-    try:
-        conn = _get_conn()
-        cur = conn.cursor()
-
+def _kb_graph_queries(filepath: str) -> List[Tuple[str, tuple]]:
+    return [
         # Links salientes: este doc enlaza a otros
-        cur.execute(
-            """
+        ("""
             SELECT dl.target_title, dl.target_filepath, d.title AS resolved_title
             FROM document_links dl
             LEFT JOIN documents d ON d.filepath = dl.target_filepath
             WHERE dl.source_filepath = %s
             ORDER BY dl.target_title
-            """,
-            (filepath.strip(),)
-        )
-        outgoing = cur.fetchall()
-
+        """, (filepath,)),
         # Links entrantes: otros docs enlazan a este
-        cur.execute(
-            """
+        ("""
             SELECT dl.source_filepath, d.title AS src_title
             FROM document_links dl
             LEFT JOIN documents d ON d.filepath = dl.source_filepath
             WHERE dl.target_filepath = %s
             ORDER BY dl.source_filepath
-            """,
-            (filepath.strip(),)
-        )
-        incoming = cur.fetchall()
+        """, (filepath,)),
+    ]
 
-        conn.close()
 
-        out = [f"🕸️ *Grafo:* `{filepath}`\n"]
+def _format_kb_graph(filepath: str, outgoing: List[Dict], incoming: List[Dict]) -> str:
+    out = [f"🕸️ *Grafo:* `{filepath}`\n"]
 
-        if outgoing:
-            out.append(f"*→ Enlaza a ({len(outgoing)}):*")
-            for r in outgoing:
-                resolved = r["resolved_title"] or r["target_filepath"] or r["target_title"]
-                out.append(f"  • [[{r['target_title']}]] → _{resolved}_")
-        else:
-            out.append("*→ Sin enlaces salientes*")
+    if outgoing:
+        out.append(f"*→ Enlaza a ({len(outgoing)}):*")
+        for r in outgoing:
+            resolved = r["resolved_title"] or r["target_filepath"] or r["target_title"]
+            out.append(f"  • [[{r['target_title']}]] → _{resolved}_")
+    else:
+        out.append("*→ Sin enlaces salientes*")
 
-        if incoming:
-            out.append(f"\n*← Referenciado por ({len(incoming)}):*")
-            for r in incoming:
-                src_title = r["src_title"] or r["source_filepath"]
-                out.append(f"  • `{r['source_filepath']}` — _{src_title}_")
-        else:
-            out.append("\n*← Sin referencias entrantes*")
+    if incoming:
+        out.append(f"\n*← Referenciado por ({len(incoming)}):*")
+        for r in incoming:
+            src_title = r["src_title"] or r["source_filepath"]
+            out.append(f"  • `{r['source_filepath']}` — _{src_title}_")
+    else:
+        out.append("\n*← Sin referencias entrantes*")
+
+    return "\n".join(out)
 
-        return "\n".join(out)
 
+@cached(KB_CACHE, VAULT_VERSION, normalize=False)
+def kb_graph(filepath: str) -> str:
+    """
+    Muestra el grafo de conexiones de un documento del vault.
+    Retorna documentos que enlaza (salientes) y documentos que lo enlazan (entrantes).
+
+    Args:
+        filepath: Ruta relativa del documento (como aparece en kb_search)
+    """
+    if not filepath or not filepath.strip():
+        return "❌ Proporciona el filepath del documento."
+
+    try:
+        outgoing, incoming = run_queries(_kb_graph_queries(filepath.strip()), dict_cursor=True)
+        return _format_kb_graph(filepath, outgoing, incoming)
+    except Exception as e:
+        logger.error(f"kb_graph error: {e}")
+        return f"❌ Error en grafo: {e}"
+
+
+@cached(KB_CACHE, VAULT_VERSION, normalize=False)
+async def kb_graph_async(filepath: str) -> str:
+    """Versión async de kb_graph."""
+    if not filepath or not filepath.strip():
+        return "❌ Proporciona el filepath del documento."
+
+    try:
+        outgoing, incoming = await run_queries_async(_kb_graph_queries(filepath.strip()), dict_rows=True)
+        return _format_kb_graph(filepath, outgoing, incoming)
     except Exception as e:
         logger.error(f"kb_graph error: {e}")
         return f"❌ Error en grafo: {e}"
@@ -619,42 +1133,40 @@ def kb_graph(filepath: str) -> str:
 # TOOL E: track_mental_model + mental_models_stats
 # ──────────────────────────────────────────────
 
+def _track_mental_model_query(model_name: str, context: str, project: str) -> Tuple[str, tuple]:
+    return (
+        "INSERT INTO mental_model_usage (model_name, context, project) VALUES (%s, %s, %s)",
+        (model_name.strip(), (context or "")[:500], project or "General")
+    )
+
+
 def track_mental_model(model_name: str, context: str = "", project: str = "General") -> str:
     """
     Registra que se aplicó un modelo mental en la conversación actual.
     Llamar silenciosamente cuando Claudette aplique uno de los 216 modelos mentales.
     """
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO mental_model_usage (model_name, context, project) VALUES (%s, %s, %s)",
-            (model_name.strip(), (context or "")[:500], project or "General")
-        )
-        conn.commit()
-        conn.close()
+        run_queries([_track_mental_model_query(model_name, context, project)], commit=True)
         return f"✓ Modelo mental registrado: {model_name}"
     except Exception as e:
         logger.error(f"track_mental_model error: {e}")
         return f"Error registrando: {e}"
 
 
-def mental_models_stats(top_n: int = 10) -> str:
-    """
-    Estadísticas de los modelos mentales más usados por Claudette con Pablo.
-
-    Args:
-        top_n: Cuántos modelos mostrar (default: 10)
-    """
+async def track_mental_model_async(model_name: str, context: str = "", project: str = "General") -> str:
+    """Versión async de track_mental_model."""
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
+        await run_queries_async([_track_mental_model_query(model_name, context, project)], commit=True)
+        return f"✓ Modelo mental registrado: {model_name}"
+    except Exception as e:
+        logger.error(f"track_mental_model error: {e}")
+        return f"Error registrando: {e}"
 
-        cur.execute("SELECT COUNT(*) AS total FROM mental_model_usage")
-        total = cur.fetchone()["total"]
 
-        cur.execute(
-            """
+def _mental_models_queries(top_n: int) -> List[Tuple[str, tuple]]:
+    return [
+        ("SELECT COUNT(*) AS total FROM mental_model_usage", ()),
+        ("""
             SELECT model_name, COUNT(*) AS count,
                    MAX(used_at) AS last_used,
                    array_agg(DISTINCT project ORDER BY project) AS projects
@@ -662,26 +1174,46 @@ def mental_models_stats(top_n: int = 10) -> str:
             GROUP BY model_name
             ORDER BY count DESC
             LIMIT %s
-            """,
-            (top_n,)
+        """, (top_n,)),
+    ]
+
+
+def _format_mental_models(total: int, rows: List[Dict]) -> str:
+    if not rows:
+        return "🧩 Sin modelos mentales registrados aún. Claudette los registrará al aplicarlos."
+
+    out = [f"🧩 *Modelos Mentales más aplicados* (total: {total} usos)\n"]
+    for i, r in enumerate(rows, 1):
+        last = r["last_used"].strftime("%d/%m/%Y") if r["last_used"] else "N/A"
+        projects = ", ".join(r["projects"] or [])
+        out.append(
+            f"  *{i}. {r['model_name']}* — {r['count']}x\n"
+            f"     Último uso: {last} · Proyectos: _{projects}_"
         )
-        rows = cur.fetchall()
-        conn.close()
 
-        if not rows:
-            return "🧩 Sin modelos mentales registrados aún. Claudette los registrará al aplicarlos."
-
-        out = [f"🧩 *Modelos Mentales más aplicados* (total: {total} usos)\n"]
-        for i, r in enumerate(rows, 1):
-            last = r["last_used"].strftime("%d/%m/%Y") if r["last_used"] else "N/A"
-            projects = ", ".join(r["projects"] or [])
-            out.append(
-                f"  *{i}. {r['model_name']}* — {r['count']}x\n"
-                f"     Último uso: {last} · Proyectos: _{projects}_"
-            )
+    return "\n".join(out)
+
+
+def mental_models_stats(top_n: int = 10) -> str:
+    """
+    Estadísticas de los modelos mentales más usados por Claudette con Pablo.
+
+    Args:
+        top_n: Cuántos modelos mostrar (default: 10)
+    """
+    try:
+        totals, rows = run_queries(_mental_models_queries(top_n), dict_cursor=True)
+        return _format_mental_models(totals[0]["total"], rows)
+    except Exception as e:
+        logger.error(f"mental_models_stats error: {e}")
+        return f"❌ Error: {e}"
 
-        return "\n".join(out)
 
+async def mental_models_stats_async(top_n: int = 10) -> str:
+    """Versión async de mental_models_stats."""
+    try:
+        totals, rows = await run_queries_async(_mental_models_queries(top_n), dict_rows=True)
+        return _format_mental_models(totals[0]["total"], rows)
     except Exception as e:
         logger.error(f"mental_models_stats error: {e}")
         return f"❌ Error: {e}"
@@ -750,13 +1282,7 @@ def kb_save_insight(category: str, title: str, content: str, project: str = "Gen
 
         # Re-indexar en PostgreSQL inmediatamente
         try:
-            conn = _get_conn()
-            conn.autocommit = True
-            ingestor = _ObsidianIngestor(vault_path)
-            doc = ingestor._process(memory_path)
-            if doc:
-                ingestor._upsert(conn, doc)
-            conn.close()
+            _ObsidianIngestor(vault_path).ingest_files([memory_path])
         except Exception as db_err:
             logger.warning(f"No se pudo re-indexar: {db_err}")
 
@@ -771,87 +1297,161 @@ def kb_save_insight(category: str, title: str, content: str, project: str = "Gen
         return f"Error guardando insight: {e}"
 
 
+# ──────────────────────────────────────────────
+# TOOL F: search_everything
+# ──────────────────────────────────────────────
+# Vault y biblioteca se consultan en paralelo (conexiones distintas del pool)
+# y se mezclan en un solo ranking: ambos lados usan ts_rank_cd con
+# normalización 1|32 (largo del doc, rank/(rank+1)) → score comparable en [0, 1).
+# Si hay índice semántico, el ranking full-text se fusiona con el semántico (RRF).
+
+def _se_kb_query(query: str, limit: int) -> Tuple[str, tuple]:
+    return ("""
+        SELECT 'KB' AS source, filepath AS ref, title, '' AS author,
+               LEFT(content, 300) AS snippet, tags,
+               ts_rank_cd(content_vector, plainto_tsquery('spanish', %s), 33) AS score
+        FROM documents
+        WHERE is_active = TRUE
+          AND content_vector @@ plainto_tsquery('spanish', %s)
+        ORDER BY score DESC
+        LIMIT %s
+    """, (query, query, limit))
+
+
+def _se_library_query(query: str, limit: int) -> Tuple[str, tuple]:
+    return ("""
+        SELECT 'LIBRO' AS source, CAST(id AS TEXT) AS ref, title,
+               COALESCE(author, '') AS author,
+               LEFT(COALESCE(summary, content, ''), 300) AS snippet, tags,
+               ts_rank_cd(fts_vector, plainto_tsquery('spanish', %s), 33) AS score
+        FROM library
+        WHERE fts_vector @@ plainto_tsquery('spanish', %s)
+        ORDER BY score DESC
+        LIMIT %s
+    """, (query, query, limit))
+
+
+def _se_missing_queries(missing: Dict[str, List[str]]) -> List[Tuple[str, tuple]]:
+    # Filas de lo que solo encontró la búsqueda semántica
+    queries = []
+    if missing.get("KB"):
+        queries.append(("""
+            SELECT 'KB' AS source, filepath AS ref, title, '' AS author,
+                   LEFT(content, 300) AS snippet, tags, 0.0 AS score
+            FROM documents WHERE is_active = TRUE AND filepath = ANY(%s)
+        """, (missing["KB"],)))
+    if missing.get("LIBRO"):
+        queries.append(("""
+            SELECT 'LIBRO' AS source, CAST(id AS TEXT) AS ref, title,
+                   COALESCE(author, '') AS author,
+                   LEFT(COALESCE(summary, content, ''), 300) AS snippet, tags, 0.0 AS score
+            FROM library WHERE id = ANY(%s)
+        """, ([int(i) for i in missing["LIBRO"]],)))
+    return queries
+
+
+def _se_semantic(query: str, limit: int) -> Dict[Tuple[str, str], float]:
+    """(source, ref) → mejor similitud; los chunks de una nota colapsan a la nota."""
+    best = {}
+    for source in ("KB", "LIBRO"):
+        for ref, _, score in semantic_search(query, source, limit * 3):
+            best[(source, ref)] = max(score, best.get((source, ref), 0.0))
+    return best
+
+
+def _se_merge(rows: List[Dict], semantic: Dict[Tuple[str, str], float], limit: int) -> List[Dict]:
+    """Un solo top-k: RRF entre el ranking full-text (vault + biblioteca) y el semántico."""
+    merged = {}
+    for r in rows:
+        key = (r["source"], r["ref"])
+        if key not in merged or float(r["score"]) > merged[key]["score"]:
+            merged[key] = {**r, "score": float(r["score"])}
+    # Las filas traídas solo por la semántica (score 0.0) no cuentan en el ranking full-text
+    ranked = [key for key, r in sorted(merged.items(), key=lambda kv: kv[1]["score"], reverse=True)
+              if r["score"] > 0]
+    order = rrf_fuse([ranked, sorted(semantic, key=semantic.get, reverse=True)])
+    return [merged[key] for key in order if key in merged][:limit]
+
+
+def _se_missing(rows: List[Dict], semantic: Dict[Tuple[str, str], float]) -> Dict[str, List[str]]:
+    found = {(r["source"], r["ref"]) for r in rows}
+    missing = {}
+    for source, ref in semantic:
+        if (source, ref) not in found:
+            missing.setdefault(source, []).append(ref)
+    return missing
+
+
+def _format_search_everything(query: str, results: List[Dict]) -> str:
+    if not results:
+        return f"🔍 Sin resultados para: *{query}*\n_(buscado en Vault y Biblioteca)_"
+
+    n_kb = sum(1 for r in results if r["source"] == "KB")
+    out = [f"🔍 *Búsqueda cruzada:* _{query}_",
+           f"_{n_kb} del vault · {len(results) - n_kb} de la biblioteca_\n"]
+    for i, r in enumerate(results, 1):
+        snippet = (r["snippet"] or "").replace("\n", " ").strip()[:220]
+        if r["source"] == "KB":
+            tags_str = " ".join(f"#{t}" for t in (r["tags"] or [])[:3])
+            line = f"  *{i}.* 📚 *{r['title']}*  {tags_str}\n     📁 `{r['ref']}`"
+        else:
+            author_str = f" · _{r['author']}_" if r["author"] else ""
+            line = f"  *{i}.* 📖 *{r['title']}*{author_str}"
+        if snippet:
+            line += f"\n     > {snippet}…"
+        out.append(line)
+
+    return "\n".join(out)
+
+
+@cached(KB_CACHE, (VAULT_VERSION, LIBRARY_VERSION))   # mezcla notas y libros
 def search_everything(query: str, limit: int = 5) -> str:
     """
     Búsqueda cruzada simultánea en Vault de Obsidian (KB) Y Biblioteca (2000+ libros).
-    Más potente que kb_search o search_library por separado.
+    Más potente que kb_search o search_library por separado: un solo ranking mezclado.
 
     Args:
         query: Términos de búsqueda
-        limit: Máximo de resultados por fuente (default: 5)
+        limit: Máximo de resultados (default: 5)
     """
     if not query or not query.strip():
         return "❌ Proporciona un término de búsqueda."
 
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            kb_future = pool.submit(run_queries, [_se_kb_query(query, limit)], True)
+            lib_future = pool.submit(run_queries, [_se_library_query(query, limit)], True)
+            sem_future = pool.submit(_se_semantic, query, limit)
+            rows = kb_future.result()[0] + lib_future.result()[0]
+            semantic = sem_future.result()
+        missing = _se_missing(rows, semantic)
+        if missing:
+            for extra in run_queries(_se_missing_queries(missing), dict_cursor=True):
+                rows += extra
+        return _format_search_everything(query, _se_merge(rows, semantic, limit))
+    except Exception as e:
+        logger.error(f"search_everything error: {e}")
+        return f"❌ Error en búsqueda cruzada: {e}"
 
-        # Busca en KB (vault Obsidian)
-        cur.execute(
-            """
-            SELECT 'KB' AS source, filepath AS ref, title,
-                   LEFT(content, 300) AS snippet, tags, word_count,
-                   ts_rank_cd(content_vector, plainto_tsquery('spanish', %s)) AS rank
-            FROM documents
-            WHERE is_active = TRUE
-              AND content_vector @@ plainto_tsquery('spanish', %s)
-            ORDER BY rank DESC
-            LIMIT %s
-            """,
-            (query, query, limit)
-        )
-        kb_rows = cur.fetchall()
 
-        # Busca en biblioteca (libros)
-        cur.execute(
-            """
-            SELECT 'LIBRO' AS source,
-                   COALESCE(filename, CAST(id AS TEXT)) AS ref,
-                   title,
-                   COALESCE(author, '') AS author,
-                   LEFT(COALESCE(summary, content, ''), 300) AS snippet,
-                   tags, word_count,
-                   ts_rank(fts_vector, plainto_tsquery('spanish', %s)) AS rank
-            FROM library
-            WHERE fts_vector @@ plainto_tsquery('spanish', %s)
-            ORDER BY rank DESC
-            LIMIT %s
-            """,
-            (query, query, limit)
-        )
-        lib_rows = cur.fetchall()
-        conn.close()
-
-        if not kb_rows and not lib_rows:
-            return f"🔍 Sin resultados para: *{query}*\n_(buscado en Vault y Biblioteca)_"
-
-        out = [f"🔍 *Búsqueda cruzada:* _{query}_\n"]
-
-        if kb_rows:
-            out.append(f"📚 *VAULT — {len(kb_rows)} nota(s):*")
-            for i, r in enumerate(kb_rows, 1):
-                tags_str = " ".join(f"#{t}" for t in (r["tags"] or [])[:3])
-                snippet = (r["snippet"] or "").replace("\n", " ").strip()[:220]
-                out.append(
-                    f"  *{i}. {r['title']}*  {tags_str}\n"
-                    f"     📁 `{r['ref']}`\n"
-                    f"     > {snippet}…"
-                )
-
-        if lib_rows:
-            out.append(f"\n📖 *BIBLIOTECA — {len(lib_rows)} libro(s):*")
-            for i, r in enumerate(lib_rows, 1):
-                author = r.get("author") or ""
-                snippet = (r.get("snippet") or "").replace("\n", " ").strip()[:180]
-                author_str = f" · _{author}_" if author else ""
-                line = f"  *{i}. {r['title']}*{author_str}"
-                if snippet:
-                    line += f"\n     > {snippet}…"
-                out.append(line)
-
-        return "\n".join(out)
+@cached(KB_CACHE, (VAULT_VERSION, LIBRARY_VERSION))   # mezcla notas y libros
+async def search_everything_async(query: str, limit: int = 5) -> str:
+    """Versión async de search_everything."""
+    if not query or not query.strip():
+        return "❌ Proporciona un término de búsqueda."
 
+    try:
+        (kb_rows,), (lib_rows,), semantic = await asyncio.gather(
+            run_queries_async([_se_kb_query(query, limit)], dict_rows=True),
+            run_queries_async([_se_library_query(query, limit)], dict_rows=True),
+            asyncio.to_thread(_se_semantic, query, limit),
+        )
+        rows = kb_rows + lib_rows
+        missing = _se_missing(rows, semantic)
+        if missing:
+            for extra in await run_queries_async(_se_missing_queries(missing), dict_rows=True):
+                rows += extra
+        return _format_search_everything(query, _se_merge(rows, semantic, limit))
     except Exception as e:
         logger.error(f"search_everything error: {e}")
         return f"❌ Error en búsqueda cruzada: {e}"
@@ -901,13 +1501,15 @@ KB_TOOLS_SCHEMA = [
         "name": "kb_read",
         "description": (
             "Lee el contenido completo de un documento del vault. "
-            "Usar después de kb_search para leer el documento completo de un resultado."
+            "Usar después de kb_search para leer el documento completo de un resultado. "
+            "Con query, devuelve solo las secciones relevantes (más barato que la nota entera)."
         ),
         "input_schema": {
             "type": "object",
             "properties": {
                 "filepath": {"type": "string", "description": "Ruta relativa del doc (como aparece en kb_search)"},
-                "max_chars": {"type": "integer", "description": "Máximo de caracteres a retornar (default: 3000)", "default": 3000}
+                "max_chars": {"type": "integer", "description": "Máximo de caracteres a retornar (default: 3000)", "default": 3000},
+                "query": {"type": "string", "description": "Opcional: solo las secciones relevantes para esta búsqueda"}
             },
             "required": ["filepath"]
         }
@@ -941,7 +1543,7 @@ KB_TOOLS_SCHEMA = [
             "type": "object",
             "properties": {
                 "query": {"type": "string", "description": "Términos de búsqueda en español"},
-                "limit": {"type": "integer", "description": "Máximo de resultados por fuente (default: 5)", "default": 5}
+                "limit": {"type": "integer", "description": "Máximo de resultados en total (default: 5)", "default": 5}
             },
             "required": ["query"]
         }
@@ -1034,28 +1636,42 @@ KB_TOOLS_SCHEMA = [
 
 
 async def execute_kb_tool(name: str, args: dict) -> str:
-    """Dispatcher para los KB tools. Llamar desde execute_tool_async()."""
+    """
+    Dispatcher para los KB tools. Llamar desde execute_tool().
+    Las consultas corren en el pool async; kb_ingest y kb_save_insight
+    (disco + muchas escrituras) van a un thread para no congelar el polling.
+    """
     if name == "search_everything":
-        return search_everything(args.get("query", ""), args.get("limit", 5))
+        return await search_everything_async(args.get("query", ""), args.get("limit", 5))
     elif name == "kb_search":
-        return kb_search(args.get("query", ""), args.get("limit", 5), args.get("tag_filter"))
+        return await kb_search_async(args.get("query", ""), args.get("limit", 5), args.get("tag_filter"))
     elif name == "kb_list":
-        return kb_list(args.get("mode", "recent"), args.get("tag"), args.get("limit", 10))
+        return await kb_list_async(args.get("mode", "recent"), args.get("tag"), args.get("limit", 10))
     elif name == "kb_read":
-        return kb_read(args.get("filepath", ""), args.get("max_chars", 3000))
+        return await kb_read_async(args.get("filepath", ""), args.get("max_chars", 3000), args.get("query"))
     elif name == "kb_ingest":
-        return kb_ingest(args.get("vault_path"), args.get("cleanup", False))
+        return await asyncio.to_thread(kb_ingest, args.get("vault_path"), args.get("cleanup", False))
     elif name == "kb_graph":
-        return kb_graph(args.get("filepath", ""))
+        return await kb_graph_async(args.get("filepath", ""))
     elif name == "track_mental_model":
-        return track_mental_model(args.get("model_name", ""), args.get("context", ""), args.get("project", "General"))
+        return await track_mental_model_async(args.get("model_name", ""), args.get("context", ""), args.get("project", "General"))
     elif name == "mental_models_stats":
-        return mental_models_stats(args.get("top_n", 10))
+        return await mental_models_stats_async(args.get("top_n", 10))
     elif name == "kb_save_insight":
-        return kb_save_insight(
+        return await asyncio.to_thread(
+            kb_save_insight,
             args.get("category", "decision"),
             args.get("title", "Sin título"),
             args.get("content", ""),
             args.get("project", "General")
         )
     return f"❌ KB tool desconocido: {name}"
+
+
+if __name__ == "__main__":
+    # python knowledge_base.py [vault] [--cleanup] → ingestión masiva con pool de procesos
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    cli_args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    print(kb_ingest(cli_args[0] if cli_args else None, cleanup="--cleanup" in sys.argv,
+                    parse_processes=True))
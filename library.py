@@ -4,8 +4,19 @@ Almacena y busca en la biblioteca de 2100+ libros de Pablo.
 Los extractos de Obsidian se indexan en PostgreSQL con búsqueda full-text.
 """
 
+import asyncio
 import logging
+import random
 import re
+import threading
+from datetime import date, timedelta
+
+from db_pool import connection, run_queries
+from db_async import run_queries as run_queries_async
+from embeddings import semantic_search, rrf_fuse
+from ttl_cache import TTLCache, LIBRARY_VERSION, KB_META_DDL, cached
+from fuzzy import setup_fuzzy_search, trgm_index_sql, fuzzy_query
+from library_passages import refresh_library_passages, setup_library_passages
 
 logger = logging.getLogger("claudette")
 
@@ -22,25 +33,38 @@ except Exception as e:
 
 
 def _get_conn():
-    import psycopg2
-    return psycopg2.connect(_pg_conn_string)
+    """Conexión del pool compartido. Uso: with _get_conn() as conn."""
+    return connection()
+
+
+# Tools de lectura cacheadas; la clave incluye LIBRARY_VERSION (lo sube migrate_library)
+LIBRARY_CACHE = TTLCache("biblioteca", maxsize=256, ttl=600)
+
+BOOK_CANDIDATES = 5   # get_book_content: el libro más parecido + alternativas
 
 
 # =====================================================
 # SETUP DE TABLA
 # =====================================================
 
+# Índices de trigramas (fuzzy.py); también los crea migrate_library
+LIBRARY_TRGM_INDEXES = [
+    trgm_index_sql("idx_library_title_trgm", "library", "title"),
+    trgm_index_sql("idx_library_author_trgm", "library", "author"),
+]
+
+
 def setup_library_table():
     """Crea la tabla library con índices de búsqueda full-text."""
     if not _pg_conn_string:
         logger.warning("Library: Sin PostgreSQL, no se puede crear tabla")
         return False
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
+        with _get_conn() as conn:
+            cur = conn.cursor()
 
-        # Tabla principal
-        cur.execute("""
+            # Tabla principal
+            cur.execute("""
             CREATE TABLE IF NOT EXISTS library (
                 id SERIAL PRIMARY KEY,
                 biblioteca_id INTEGER,
@@ -64,22 +88,33 @@ def setup_library_table():
             )
         """)
 
-        # Índice GIN sobre la columna precalculada
-        cur.execute("""
+            # Índice GIN sobre la columna precalculada
+            cur.execute("""
             CREATE INDEX IF NOT EXISTS idx_library_fts 
             ON library USING GIN (fts_vector)
         """)
 
-        # Índices adicionales
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_library_author ON library (LOWER(author))")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_library_category ON library (LOWER(category))")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_library_tags ON library USING GIN (tags)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_library_nivel ON library (nivel)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_library_has_ficha ON library (has_ficha)")
+            # Índices adicionales
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_library_author ON library (LOWER(author))")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_library_category ON library (LOWER(category))")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_library_tags ON library USING GIN (tags)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_library_nivel ON library (nivel)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_library_has_ficha ON library (has_ficha)")
 
-        conn.commit()
-        cur.close()
-        conn.close()
+            # Búsqueda difusa por título/autor (typos y acentos)
+            setup_fuzzy_search(cur)
+            for index_sql in LIBRARY_TRGM_INDEXES:
+                cur.execute(index_sql)
+
+            # Párrafos de las fichas (extractos de search_library)
+            setup_library_passages(cur)
+
+            # Libro del día: ids elegibles por index-only scan + historial
+            cur.execute(BOOK_OF_THE_DAY_INDEX)
+            cur.execute(BOOK_OF_THE_DAY_HISTORY_DDL)
+
+            conn.commit()
+            cur.close()
         logger.info("📚 Tabla library verificada/creada con índices FTS")
         return True
     except Exception as e:
@@ -87,6 +122,36 @@ def setup_library_table():
         return False
 
 
+# =====================================================
+# PÁRRAFOS DE LAS FICHAS
+# =====================================================
+# search_library muestra el párrafo más relevante de cada ficha. Los párrafos
+# (bloques separados por línea en blanco, >= 30 chars) viven indexados en
+# library_passages y el mejor se elige en la DB: el contenido completo de
+# la ficha no viaja en cada búsqueda.
+
+EXCERPT_CHARS = 600
+
+# Mejor párrafo de cada libro para la query; sin match, el primero sustancial
+_EXCERPT_SQL = f"""
+    COALESCE(
+        (SELECT LEFT(p.content, {EXCERPT_CHARS + 1}) FROM library_passages p
+         WHERE p.book_id = library.id AND p.fts_vector @@ plainto_tsquery('spanish', %s)
+         ORDER BY ts_rank_cd(p.fts_vector, plainto_tsquery('spanish', %s)) DESC, p.passage_index
+         LIMIT 1),
+        (SELECT LEFT(p.content, {EXCERPT_CHARS + 1}) FROM library_passages p
+         WHERE p.book_id = library.id AND length(p.content) > 50
+         ORDER BY p.passage_index
+         LIMIT 1)
+    ) AS excerpt"""
+
+
+def _clip_excerpt(excerpt):
+    if excerpt and len(excerpt) > EXCERPT_CHARS:
+        return excerpt[:EXCERPT_CHARS] + "..."
+    return excerpt or ""
+
+
 # =====================================================
 # PARSING DE ARCHIVOS OBSIDIAN
 # =====================================================
@@ -201,10 +266,10 @@ def add_book(title, author, category, subcategory, tags, content, summary="",
     if not _pg_conn_string:
         return None
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        word_count = len(content.split()) if content else 0
-        cur.execute("""
+        with _get_conn() as conn:
+            cur = conn.cursor()
+            word_count = len(content.split()) if content else 0
+            cur.execute("""
             INSERT INTO library (title, author, category, subcategory, tags, content, 
                                  summary, filename, drive_path, word_count, fts_vector)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
@@ -214,37 +279,54 @@ def add_book(title, author, category, subcategory, tags, content, summary="",
                     ))
             RETURNING id
         """, (title, author, category, subcategory, tags, content,
-              summary, filename, drive_path, word_count,
-              title, author, content, ' '.join(tags) if tags else ''))
-        book_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+                  summary, filename, drive_path, word_count,
+                  title, author, content, ' '.join(tags) if tags else ''))
+            book_id = cur.fetchone()[0]
+            refresh_library_passages(cur, [book_id])
+            cur.execute(KB_META_DDL)
+            LIBRARY_VERSION.bump(cur)   # invalida las búsquedas cacheadas
+            conn.commit()
+            cur.close()
         return book_id
     except Exception as e:
         logger.error(f"Error adding book: {e}")
         return None
 
 
+_STATS_QUERIES = [
+    ("SELECT COUNT(*) FROM library", ()),
+    ("SELECT COUNT(*) FROM library WHERE has_ficha = TRUE", ()),
+    ("SELECT COUNT(DISTINCT LOWER(author)) FROM library WHERE author IS NOT NULL AND author != ''", ()),
+    ("SELECT SUM(word_count) FROM library", ()),
+]
+
+
+def _format_stats(results):
+    total, with_ficha, authors, total_words = (rows[0][0] for rows in results)
+    total_words = total_words or 0
+    return (f"📚 Biblioteca: {total} libros ({with_ficha} con ficha detallada), "
+            f"{authors} autores, ~{total_words:,} palabras analizadas")
+
+
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
 def get_library_stats():
     """Estadísticas de la biblioteca."""
     if not _pg_conn_string:
         return "Biblioteca no disponible (sin PostgreSQL)"
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM library")
-        total = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM library WHERE has_ficha = TRUE")
-        with_ficha = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(DISTINCT LOWER(author)) FROM library WHERE author IS NOT NULL AND author != ''")
-        authors = cur.fetchone()[0]
-        cur.execute("SELECT SUM(word_count) FROM library")
-        total_words = cur.fetchone()[0] or 0
-        cur.close()
-        conn.close()
-        return (f"📚 Biblioteca: {total} libros ({with_ficha} con ficha detallada), "
-                f"{authors} autores, ~{total_words:,} palabras analizadas")
+        return _format_stats(run_queries(_STATS_QUERIES))
+    except Exception as e:
+        logger.error(f"Stats error: {e}")
+        return f"Error: {e}"
+
+
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+async def get_library_stats_async():
+    """Versión async de get_library_stats."""
+    if not _pg_conn_string:
+        return "Biblioteca no disponible (sin PostgreSQL)"
+    try:
+        return _format_stats(await run_queries_async(_STATS_QUERIES))
     except Exception as e:
         logger.error(f"Stats error: {e}")
         return f"Error: {e}"
@@ -254,119 +336,201 @@ def get_library_stats():
 # BÚSQUEDA
 # =====================================================
 
-def search_library(query, limit=5):
-    """
-    Búsqueda inteligente en la biblioteca usando full-text search de PostgreSQL.
-    Busca en título, autor, contenido y tags simultáneamente.
-    Retorna los extractos más relevantes.
-    """
-    if not _pg_conn_string:
-        return "Biblioteca no disponible."
-    try:
-        conn = _get_conn()
-        cur = conn.cursor()
-
-        # Full-text search con ranking
-        cur.execute("""
-            SELECT title, author, category, tags, summary, content,
+def _search_query(query, limit):
+    # Full-text search con ranking; el extracto ya viene elegido de library_passages
+    return (f"""
+            SELECT title, author, category, tags, summary, {_EXCERPT_SQL},
                    nivel, pablo_rating, has_ficha,
-                   ts_rank(fts_vector, plainto_tsquery('spanish', %s)) AS rank
+                   ts_rank(fts_vector, plainto_tsquery('spanish', %s)) AS rank, id
             FROM library
             WHERE fts_vector @@ plainto_tsquery('spanish', %s)
             ORDER BY rank DESC
             LIMIT %s
-        """, (query, query, limit))
+        """, (query, query, query, query, limit))
 
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
 
-        if not results:
-            # Fallback: búsqueda ILIKE más tolerante
-            return _search_fallback(query, limit)
+def _books_by_id_query(ids, query):
+    # Libros que solo encontró la búsqueda semántica (mismas columnas que _search_query)
+    return (f"""
+            SELECT title, author, category, tags, summary, {_EXCERPT_SQL},
+                   nivel, pablo_rating, has_ficha, 0 AS rank, id
+            FROM library
+            WHERE id = ANY(%s)
+        """, (query, query, [int(i) for i in ids]))
+
+
+def _fuse_results(results, vector_hits, limit):
+    """RRF entre full-text y semántico → (ids en orden, ids sin fila aún)."""
+    ranked = [str(row[10]) for row in results]
+    order = rrf_fuse([ranked, [ref for ref, _, _ in vector_hits]])[:limit]
+    known = set(ranked)
+    return order, [ref for ref in order if ref not in known]
+
 
-        output = []
-        for row in results:
-            title, author, category, tags, summary, content, nivel, pablo_rating, has_ficha, rank = row
-            tags_str = ', '.join(tags[:6]) if tags else ''
+def _order_results(results, order):
+    by_id = {str(row[10]): row for row in results}
+    return [by_id[ref] for ref in order if ref in by_id]
 
-            # Extracto relevante: buscar párrafo que contenga la query
-            excerpt = _find_relevant_excerpt(content, query) if has_ficha else summary or ''
 
-            entry = f"📖 **{title}**"
-            if author:
-                entry += f" — {author}"
-            if nivel:
-                entry += f" [Nivel {nivel}]"
-            if pablo_rating:
-                entry += f" ⭐{pablo_rating}/10"
-            if not has_ficha:
-                entry += " _(sin ficha)_"
-            if tags_str:
-                entry += f"\n🏷️ {tags_str}"
-            if excerpt:
-                entry += f"\n{excerpt}"
+def _search_fallback_query(query, limit):
+    # Fallback: título o autor parecidos (trigramas). El contenido ya lo cubre el full-text.
+    return fuzzy_query("library", ["title", "author"], query,
+                       f"title, author, category, tags, summary, {_EXCERPT_SQL}, nivel, pablo_rating, has_ficha",
+                       limit, order="nivel NULLS LAST, title", select_params=(query, query))
 
-            output.append(entry)
 
-        return "\n\n---\n\n".join(output)
+def _format_search(results, query, short=False):
+    output = []
+    for row in results:
+        title, author, category, tags, summary, excerpt, nivel, pablo_rating, has_ficha = row[:9]
+        tags_str = ', '.join(tags[:6]) if tags else ''
 
+        # Extracto relevante: párrafo elegido en la DB (library_passages)
+        excerpt = _clip_excerpt(excerpt) if has_ficha else summary or ''
+
+        entry = f"📖 **{title}**"
+        if author:
+            entry += f" — {author}"
+        if nivel:
+            entry += f" [N{nivel}]" if short else f" [Nivel {nivel}]"
+        if pablo_rating:
+            entry += f" ⭐{pablo_rating}" if short else f" ⭐{pablo_rating}/10"
+        if not has_ficha:
+            entry += " _(sin ficha)_"
+        if tags_str:
+            entry += f"\n🏷️ {tags_str}"
+        if excerpt:
+            entry += f"\n{excerpt}"
+
+        output.append(entry)
+
+    return "\n\n---\n\n".join(output)
+
+
+def _format_fallback(results, query):
+    if not results:
+        return f"No encontré nada sobre '{query}' en la biblioteca de 2100 libros."
+    return _format_search(results, query, short=True)
+
+
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+def search_library(query, limit=5):
+    """
+    Búsqueda inteligente en la biblioteca usando full-text search de PostgreSQL,
+    fusionada (RRF) con la búsqueda semántica de embeddings.py si está disponible.
+    Busca en título, autor, contenido y tags simultáneamente.
+    Retorna los extractos más relevantes.
+    """
+    if not _pg_conn_string:
+        return "Biblioteca no disponible."
+    try:
+        results, = run_queries([_search_query(query, limit)])
+        vector_hits = semantic_search(query, "LIBRO", limit * 2)
+        if vector_hits:
+            order, missing = _fuse_results(results, vector_hits, limit)
+            if missing:
+                extra, = run_queries([_books_by_id_query(missing, query)])
+                results = results + extra
+            results = _order_results(results, order)
+        if not results:
+            return _search_fallback(query, limit)
+        return _format_search(results, query)
     except Exception as e:
         logger.error(f"Library search error: {e}")
         return f"Error buscando en biblioteca: {e}"
 
 
-def search_by_author(author_name, limit=10):
-    """Buscar todos los libros de un autor."""
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+async def search_library_async(query, limit=5):
+    """Versión async de search_library (no bloquea el event loop)."""
     if not _pg_conn_string:
         return "Biblioteca no disponible."
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT title, author, category, tags, summary, nivel, pablo_rating, has_ficha
-            FROM library
-            WHERE LOWER(author) LIKE LOWER(%s)
-            ORDER BY nivel NULLS LAST, title
-            LIMIT %s
-        """, (f'%{author_name}%', limit))
+        (results,), vector_hits = await asyncio.gather(
+            run_queries_async([_search_query(query, limit)]),
+            asyncio.to_thread(semantic_search, query, "LIBRO", limit * 2),
+        )
+        if vector_hits:
+            order, missing = _fuse_results(results, vector_hits, limit)
+            if missing:
+                extra, = await run_queries_async([_books_by_id_query(missing, query)])
+                results = results + extra
+            results = _order_results(results, order)
+        if not results:
+            try:
+                results, = await run_queries_async([_search_fallback_query(query, limit)])
+            except Exception as e:
+                return f"Error en búsqueda: {e}"
+            return _format_fallback(results, query)
+        return _format_search(results, query)
+    except Exception as e:
+        logger.error(f"Library search error: {e}")
+        return f"Error buscando en biblioteca: {e}"
 
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
 
-        if not results:
-            return f"No encontré libros de '{author_name}' en la biblioteca."
-
-        output = [f"📚 Libros de {results[0][1]}:\n"]
-        for title, author, category, tags, summary, nivel, pablo_rating, has_ficha in results:
-            tags_str = ', '.join(tags[:4]) if tags else ''
-            line = f"• **{title}**"
-            if nivel:
-                line += f" [N{nivel}]"
-            if pablo_rating:
-                line += f" ⭐{pablo_rating}"
-            if not has_ficha:
-                line += " _(pendiente)_"
-            if tags_str:
-                line += f" — {tags_str}"
-            output.append(line)
-
-        return "\n".join(output)
+def _author_query(author_name, limit):
+    return fuzzy_query("library", ["author"], author_name,
+                       "title, author, category, tags, summary, nivel, pablo_rating, has_ficha",
+                       limit, order="author, nivel NULLS LAST, title")
+
 
+def _format_author(results, author_name):
+    if not results:
+        return f"No encontré libros de '{author_name}' en la biblioteca."
+
+    best = results[0][1]
+    output = [f"📚 Libros de {best}:\n"]
+    others = {}
+    for title, author, category, tags, summary, nivel, pablo_rating, has_ficha, score in results:
+        if author != best:
+            others.setdefault(author, score)
+            continue
+        tags_str = ', '.join(tags[:4]) if tags else ''
+        line = f"• **{title}**"
+        if nivel:
+            line += f" [N{nivel}]"
+        if pablo_rating:
+            line += f" ⭐{pablo_rating}"
+        if not has_ficha:
+            line += " _(pendiente)_"
+        if tags_str:
+            line += f" — {tags_str}"
+        output.append(line)
+
+    if others:
+        output.append("\n🔎 Otros autores parecidos: " +
+                      ", ".join(f"{a} ({s:.0%})" for a, s in others.items()))
+    return "\n".join(output)
+
+
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+def search_by_author(author_name, limit=10):
+    """Buscar todos los libros de un autor."""
+    if not _pg_conn_string:
+        return "Biblioteca no disponible."
+    try:
+        results, = run_queries([_author_query(author_name, limit)])
+        return _format_author(results, author_name)
     except Exception as e:
         logger.error(f"Author search error: {e}")
         return f"Error: {e}"
 
 
-def search_by_tag(tag, limit=10):
-    """Buscar libros por tag."""
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+async def search_by_author_async(author_name, limit=10):
+    """Versión async de search_by_author."""
     if not _pg_conn_string:
         return "Biblioteca no disponible."
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("""
+        results, = await run_queries_async([_author_query(author_name, limit)])
+        return _format_author(results, author_name)
+    except Exception as e:
+        logger.error(f"Author search error: {e}")
+        return f"Error: {e}"
+
+
+def _tag_query(tag, limit):
+    return ("""
             SELECT title, author, category, tags, summary
             FROM library
             WHERE %s = ANY(tags)
@@ -374,152 +538,228 @@ def search_by_tag(tag, limit=10):
             LIMIT %s
         """, (tag.lower().strip(), limit))
 
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
 
-        if not results:
-            return f"No encontré libros con tag '{tag}'."
+def _format_tag(results, tag):
+    if not results:
+        return f"No encontré libros con tag '{tag}'."
+
+    output = [f"🏷️ Libros con tag '{tag}' ({len(results)} encontrados):\n"]
+    for title, author, category, tags, summary in results:
+        output.append(f"• **{title}** — {author or 'S/A'} [{category}]")
 
-        output = [f"🏷️ Libros con tag '{tag}' ({len(results)} encontrados):\n"]
-        for title, author, category, tags, summary in results:
-            output.append(f"• **{title}** — {author or 'S/A'} [{category}]")
+    return "\n".join(output)
 
-        return "\n".join(output)
 
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+def search_by_tag(tag, limit=10):
+    """Buscar libros por tag."""
+    if not _pg_conn_string:
+        return "Biblioteca no disponible."
+    try:
+        results, = run_queries([_tag_query(tag, limit)])
+        return _format_tag(results, tag)
     except Exception as e:
         logger.error(f"Tag search error: {e}")
         return f"Error: {e}"
 
 
-def get_book_content(title_query):
-    """Obtener el contenido completo de un libro específico."""
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+async def search_by_tag_async(tag, limit=10):
+    """Versión async de search_by_tag."""
     if not _pg_conn_string:
         return "Biblioteca no disponible."
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT title, author, category, tags, content
-            FROM library
-            WHERE LOWER(title) LIKE LOWER(%s)
-            ORDER BY title
-            LIMIT 1
-        """, (f'%{title_query}%',))
+        results, = await run_queries_async([_tag_query(tag, limit)])
+        return _format_tag(results, tag)
+    except Exception as e:
+        logger.error(f"Tag search error: {e}")
+        return f"Error: {e}"
 
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
 
-        if not row:
-            return f"No encontré '{title_query}' en la biblioteca."
+def _book_query(title_query, limit=BOOK_CANDIDATES):
+    return fuzzy_query("library", ["title"], title_query,
+                       "title, author, category, tags, content", limit, order="title")
 
-        title, author, category, tags, content = row
-        tags_str = ', '.join(tags) if tags else ''
 
-        header = f"📖 {title}"
-        if author:
-            header += f" — {author}"
-        if tags_str:
-            header += f"\n🏷️ {tags_str}"
+def _format_book(rows, title_query):
+    if not rows:
+        return f"No encontré '{title_query}' en la biblioteca."
 
-        # Limitar contenido para no explotar el contexto
-        if len(content) > 8000:
-            content = content[:8000] + "\n\n[... Contenido truncado. Pedí una sección específica.]"
+    title, author, category, tags, content, score = rows[0]
+    tags_str = ', '.join(tags) if tags else ''
 
-        return f"{header}\n\n{content}"
+    header = f"📖 {title}"
+    if author:
+        header += f" — {author}"
+    if tags_str:
+        header += f"\n🏷️ {tags_str}"
 
+    # Limitar contenido para no explotar el contexto
+    if len(content) > 8000:
+        content = content[:8000] + "\n\n[... Contenido truncado. Pedí una sección específica.]"
+
+    out = f"{header}\n\n{content}"
+    if len(rows) > 1 or score < 1:
+        alts = "\n".join(f"   · {r[0]} — {r[1] or 'S/A'} ({r[5]:.0%})" for r in rows[1:])
+        out += f"\n\n🔎 Coincidencia aproximada ({score:.0%}) para '{title_query}'"
+        out += f". Otros títulos parecidos:\n{alts}" if alts else ""
+    return out
+
+
+def fuzzy_find_books(text, field="title", limit=BOOK_CANDIDATES):
+    """
+    Libros cuyo título (field="title") o autor (field="author") se parecen a `text`.
+    Tolera typos y acentos. Retorna [(title, author, score), ...] de mayor a menor score.
+    """
+    if field not in ("title", "author"):
+        raise ValueError(f"field inválido: {field}")
+    if not _pg_conn_string or not text or not text.strip():
+        return []
+    rows, = run_queries([fuzzy_query("library", [field], text, "title, author", limit)])
+    return rows
+
+
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+def get_book_content(title_query):
+    """Obtener el contenido completo de un libro específico."""
+    if not _pg_conn_string:
+        return "Biblioteca no disponible."
+    try:
+        rows, = run_queries([_book_query(title_query)])
+        return _format_book(rows, title_query)
+    except Exception as e:
+        logger.error(f"Get book error: {e}")
+        return f"Error: {e}"
+
+
+@cached(LIBRARY_CACHE, LIBRARY_VERSION)
+async def get_book_content_async(title_query):
+    """Versión async de get_book_content."""
+    if not _pg_conn_string:
+        return "Biblioteca no disponible."
+    try:
+        rows, = await run_queries_async([_book_query(title_query)])
+        return _format_book(rows, title_query)
     except Exception as e:
         logger.error(f"Get book error: {e}")
         return f"Error: {e}"
 
 
 # =====================================================
-# FUNCIONES AUXILIARES
+# LIBRO DEL DÍA
 # =====================================================
+# Reemplaza el ORDER BY RANDOM() del resumen matutino (ordenaba todos los
+# libros y traía el contenido completo). La lista de ids elegibles se
+# calcula una vez por versión de la biblioteca; la elección es determinista
+# por fecha y queda en book_of_the_day_history, así que un reintento del
+# resumen devuelve el mismo libro y no se repiten libros en
+# BOOK_OF_THE_DAY_AVOID_DAYS días.
+
+BOOK_OF_THE_DAY_MIN_WORDS = 200
+BOOK_OF_THE_DAY_AVOID_DAYS = 90
+BOOK_OF_THE_DAY_EXCERPT = 3000
+
+BOOK_OF_THE_DAY_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_library_book_of_day ON library (id) "
+    f"WHERE word_count > {BOOK_OF_THE_DAY_MIN_WORDS}"
+)
+
+BOOK_OF_THE_DAY_HISTORY_DDL = """
+    CREATE TABLE IF NOT EXISTS book_of_the_day_history (
+        day DATE PRIMARY KEY,
+        book_id INTEGER NOT NULL,
+        chosen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
 
-def _find_relevant_excerpt(content, query, max_chars=600):
-    """Encuentra el párrafo más relevante del contenido para la query."""
-    if not content:
-        return ""
+_eligible_ids = (None, [])   # (LIBRARY_VERSION, ids elegibles ordenados)
+_eligible_lock = threading.Lock()
 
-    query_words = query.lower().split()
-    paragraphs = content.split('\n\n')
 
-    best_para = ""
-    best_score = 0
+def _eligible_book_ids(cur):
+    global _eligible_ids
+    version = LIBRARY_VERSION.refresh()
+    with _eligible_lock:
+        if _eligible_ids[0] != version or not _eligible_ids[1]:
+            cur.execute(f"SELECT id FROM library WHERE word_count > {BOOK_OF_THE_DAY_MIN_WORDS} ORDER BY id")
+            _eligible_ids = (version, [row[0] for row in cur.fetchall()])
+        return _eligible_ids[1]
 
-    for para in paragraphs:
-        para_clean = para.strip()
-        if len(para_clean) < 30:
-            continue
-        para_lower = para_clean.lower()
-        score = sum(1 for w in query_words if w in para_lower)
-        if score > best_score:
-            best_score = score
-            best_para = para_clean
-
-    if not best_para and paragraphs:
-        # Si no hay match, tomar el primer párrafo sustancial
-        for para in paragraphs:
-            if len(para.strip()) > 50:
-                best_para = para.strip()
+
+def _pick_book_id(cur, day):
+    """Id del libro de `day`: el del historial o uno nuevo (determinista por fecha)."""
+    cur.execute("SELECT book_id FROM book_of_the_day_history WHERE day = %s", (day,))
+    row = cur.fetchone()
+    if row:
+        return row[0]
+
+    eligible = _eligible_book_ids(cur)
+    if not eligible:
+        return None
+    cur.execute("""
+        SELECT book_id FROM book_of_the_day_history
+        WHERE day >= %s AND day < %s
+    """, (day - timedelta(days=BOOK_OF_THE_DAY_AVOID_DAYS), day))
+    recent = {r[0] for r in cur.fetchall()}
+    candidates = [i for i in eligible if i not in recent] or eligible
+    book_id = random.Random(day.isoformat()).choice(candidates)
+
+    # ON CONFLICT: si otro proceso eligió primero para ese día, gana el suyo
+    cur.execute("""
+        INSERT INTO book_of_the_day_history (day, book_id) VALUES (%s, %s)
+        ON CONFLICT (day) DO UPDATE SET day = EXCLUDED.day
+        RETURNING book_id
+    """, (day, book_id))
+    return cur.fetchone()[0]
+
+
+def get_book_of_the_day(day=None, max_chars=BOOK_OF_THE_DAY_EXCERPT):
+    """
+    Libro del día: dict con title, author, category, tags y excerpt
+    (a lo sumo max_chars del contenido), o None si no hay biblioteca.
+    """
+    if not _pg_conn_string:
+        return None
+    day = day or date.today()
+    with _get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(BOOK_OF_THE_DAY_HISTORY_DDL)
+        row = None
+        for _ in range(2):
+            book_id = _pick_book_id(cur, day)
+            if book_id is None:
+                break
+            cur.execute("""
+                SELECT title, author, category, tags, LEFT(content, %s)
+                FROM library WHERE id = %s
+            """, (max_chars + 1, book_id))
+            row = cur.fetchone()
+            if row:
                 break
+            # El libro ya no existe (recarga completa de la biblioteca): se elige otro
+            cur.execute("DELETE FROM book_of_the_day_history WHERE day = %s", (day,))
+        conn.commit()
+        cur.close()
+    if not row:
+        return None
 
-    if len(best_para) > max_chars:
-        best_para = best_para[:max_chars] + "..."
+    title, author, category, tags, excerpt = row
+    excerpt = excerpt or ""
+    if len(excerpt) > max_chars:
+        excerpt = excerpt[:max_chars] + "\n[...]"
+    return {"title": title, "author": author, "category": category,
+            "tags": tags or [], "excerpt": excerpt}
 
-    return best_para
 
+# =====================================================
+# FUNCIONES AUXILIARES
+# =====================================================
 
 def _search_fallback(query, limit):
-    """Búsqueda fallback con ILIKE cuando full-text no encuentra nada."""
+    """Búsqueda fallback por título/autor aproximado cuando full-text no encuentra nada."""
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT title, author, category, tags, summary, content, nivel, pablo_rating, has_ficha
-            FROM library
-            WHERE LOWER(title) LIKE LOWER(%s)
-               OR LOWER(author) LIKE LOWER(%s)
-               OR LOWER(content) LIKE LOWER(%s)
-               OR LOWER(array_to_string(tags, ' ')) LIKE LOWER(%s)
-            ORDER BY nivel NULLS LAST, title
-            LIMIT %s
-        """, (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%', limit))
-
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        if not results:
-            return f"No encontré nada sobre '{query}' en la biblioteca de 2100 libros."
-
-        output = []
-        for title, author, category, tags, summary, content, nivel, pablo_rating, has_ficha in results:
-            tags_str = ', '.join(tags[:6]) if tags else ''
-            excerpt = _find_relevant_excerpt(content, query) if has_ficha else summary or ''
-            entry = f"📖 **{title}**"
-            if author:
-                entry += f" — {author}"
-            if nivel:
-                entry += f" [N{nivel}]"
-            if pablo_rating:
-                entry += f" ⭐{pablo_rating}"
-            if not has_ficha:
-                entry += " _(sin ficha)_"
-            if tags_str:
-                entry += f"\n🏷️ {tags_str}"
-            if excerpt:
-                entry += f"\n{excerpt}"
-            output.append(entry)
-
-        return "\n\n---\n\n".join(output)
-
+        results, = run_queries([_search_fallback_query(query, limit)])
+        return _format_fallback(results, query)
     except Exception as e:
         return f"Error en búsqueda: {e}"
 
-
-# --- Auto-crear tabla al importar ---
-if _pg_conn_string:
-    setup_library_table()
\ No newline at end of file
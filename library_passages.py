@@ -0,0 +1,50 @@
+"""
+Párrafos de las fichas de la biblioteca (tabla library_passages).
+search_library muestra el párrafo más relevante de cada ficha; los párrafos
+(bloques separados por línea en blanco, >= 30 chars) se generan en SQL a
+partir de library.content.
+
+Módulo sin efectos al importarse: lo usan library.py (add_book, setup) y
+migrate_library.py dentro de su transacción de carga, sin abrir otra conexión.
+"""
+
+_PASSAGES_INSERT_SQL = """
+    INSERT INTO library_passages (book_id, passage_index, content, fts_vector)
+    SELECT l.id, p.n, p.text, to_tsvector('spanish', p.text)
+    FROM library l
+    CROSS JOIN LATERAL (
+        SELECT btrim(t.text, E' \\t\\r\\n') AS text, t.n
+        FROM regexp_split_to_table(COALESCE(l.content, ''), E'\\n\\n') WITH ORDINALITY AS t(text, n)
+    ) p
+    WHERE l.has_ficha = TRUE AND length(p.text) >= 30 AND {books}
+"""
+
+
+def refresh_library_passages(cur, book_ids=None):
+    """
+    (Re)genera los párrafos de los libros indicados; sin book_ids, los de las
+    fichas que aún no tienen. Commit a cargo del llamador. Retorna filas insertadas.
+    """
+    if book_ids is None:
+        cur.execute(_PASSAGES_INSERT_SQL.format(
+            books="NOT EXISTS (SELECT 1 FROM library_passages x WHERE x.book_id = l.id)"))
+    else:
+        book_ids = [int(i) for i in book_ids]
+        cur.execute("DELETE FROM library_passages WHERE book_id = ANY(%s)", (book_ids,))
+        cur.execute(_PASSAGES_INSERT_SQL.format(books="l.id = ANY(%s)"), (book_ids,))
+    return cur.rowcount
+
+
+def setup_library_passages(cur):
+    """Crea library_passages y completa los párrafos que falten."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS library_passages (
+            book_id INTEGER NOT NULL,
+            passage_index INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            fts_vector TSVECTOR,
+            PRIMARY KEY (book_id, passage_index)
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_library_passages_fts ON library_passages USING GIN (fts_vector)")
+    return refresh_library_passages(cur)
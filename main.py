@@ -19,9 +19,9 @@ from telegram.ext import (
 
 from config import (
     TELEGRAM_BOT_TOKEN, OPENAI_API_KEY, ELEVENLABS_API_KEY,
-    ELEVENLABS_VOICE_ID, OWNER_CHAT_ID, DEFAULT_LOCATION, logger
+    ELEVENLABS_VOICE_ID, OWNER_CHAT_ID, DEFAULT_LOCATION, STREAM_RESPONSES, logger
 )
-from brain import process_chat, conversation_history, user_modes, build_system_prompt, generate_morning_summary, generate_weekly_synthesis
+from brain import process_chat, conversation_store, estimate_tokens, get_history_token_limit, user_modes, build_system_prompt, generate_morning_summary, generate_weekly_synthesis
 from tools_registry import (
     user_locations, get_weather, search_web_google
 )
@@ -31,6 +31,14 @@ from memory_manager import get_all_facts, save_fact, get_fact, setup_database
 # --- Inicializar base de datos ---
 setup_database()
 
+# --- Inicializar tabla library (índices, párrafos, libro del día) ---
+try:
+    from library import setup_library_table, _pg_conn_string
+    if _pg_conn_string:
+        setup_library_table()
+except Exception as _e:
+    logger.warning(f"Library setup: {_e}")
+
 # --- Inicializar tablas KB extra (document_links, mental_model_usage) ---
 try:
     from knowledge_base import setup_kb_extra_tables
@@ -137,12 +145,12 @@ async def button_handler(update, context):
         await query.edit_message_text("⚡ Modo Normal activado.")
 
     elif query.data == 'btn_clear':
-        conversation_history[chat_id] = []
+        await conversation_store.clear(chat_id)
         await query.edit_message_text("🧹 Chat reiniciado. (Memoria persistente intacta)")
 
     elif query.data == 'btn_mem':
         all_facts = get_all_facts() or {}
-        lines = [f"â€¢ {k}: {v}" for k, v in all_facts.items() if not k.startswith("System_Location")]
+        lines = [f"â€¢ {k}: {v}" for k, v in all_facts.items() if not k.startswith("System_")]
         if lines:
             memory_text = "🧠 Lo que recuerdo de ti:\n\n" + "\n".join(lines)
             if len(memory_text) > 4000:
@@ -245,11 +253,12 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if yt_transcript:
         text += f"\n\n[SISTEMA]: El usuario envió un video. {yt_transcript}"
 
-    # Procesar con brain
-    response = await process_chat(update, context, text)
+    # Procesar con brain (en modo streaming la respuesta se publica mientras se genera)
+    response = await process_chat(update, context, text, stream=STREAM_RESPONSES)
 
     # Enviar respuesta (split si es muy larga para Telegram)
-    await send_long_message(update, response)
+    if not STREAM_RESPONSES:
+        await send_long_message(update, response)
 
 
 @restricted
@@ -272,8 +281,9 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"🎤 {transcript}")
         await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
 
-        response = await process_chat(update, context, transcript)
-        await send_long_message(update, response)
+        response = await process_chat(update, context, transcript, stream=STREAM_RESPONSES)
+        if not STREAM_RESPONSES:
+            await send_long_message(update, response)
 
         # Respuesta por voz
         if elevenlabs_client:
@@ -303,8 +313,9 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     caption = update.message.caption or "Analiza esta imagen."
 
     await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
-    response = await process_chat(update, context, caption, image_data=image_data)
-    await send_long_message(update, response)
+    response = await process_chat(update, context, caption, image_data=image_data, stream=STREAM_RESPONSES)
+    if not STREAM_RESPONSES:
+        await send_long_message(update, response)
 
 
 @restricted
@@ -337,8 +348,9 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if caption:
             msg_text += f"\nMensaje: {caption}"
         msg_text += "\n(Formato no soportado para lectura directa. Sugerí subirlo a Drive.)"
-        response = await process_chat(update, context, msg_text)
-        await send_long_message(update, response)
+        response = await process_chat(update, context, msg_text, stream=STREAM_RESPONSES)
+        if not STREAM_RESPONSES:
+            await send_long_message(update, response)
         return
 
     try:
@@ -420,8 +432,9 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             msg_text += f"Mensaje: {caption}\n"
         msg_text += f"\n--- CONTENIDO DEL ARCHIVO ---\n{extracted_text}\n--- FIN DEL ARCHIVO ---"
 
-        response = await process_chat(update, context, msg_text)
-        await send_long_message(update, response)
+        response = await process_chat(update, context, msg_text, stream=STREAM_RESPONSES)
+        if not STREAM_RESPONSES:
+            await send_long_message(update, response)
 
     except Exception as e:
         logger.error(f"Document handler error: {e}", exc_info=True)
@@ -490,14 +503,37 @@ async def cmd_normal(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @restricted
 async def cmd_clear(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    conversation_history[update.effective_chat.id] = []
+    await conversation_store.clear(update.effective_chat.id)
     await update.message.reply_text("🧹 Memoria de conversación borrada. (Memoria persistente intacta)")
 
 
+@restricted
+async def cmd_contexto(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/contexto [tokens] - Ver o fijar el techo de tokens del historial de este chat."""
+    chat_id = update.effective_chat.id
+    if context.args:
+        try:
+            limit = int(context.args[0].replace('k', '000'))
+            if limit < 2000:
+                raise ValueError
+        except ValueError:
+            await update.message.reply_text("⚠️ Uso: /contexto 20000 (mínimo 2000 tokens)")
+            return
+        save_fact(f"System_History_Tokens_{chat_id}", str(limit))
+        await update.message.reply_text(f"✂️ Techo de historial: {limit:,} tokens.")
+        return
+
+    messages = await conversation_store.get(chat_id)
+    await update.message.reply_text(
+        f"🧾 Historial actual: ~{estimate_tokens(messages):,} tokens en {len(messages)} mensajes.\n"
+        f"Techo: {get_history_token_limit(chat_id):,} tokens. Cambialo con /contexto <tokens>."
+    )
+
+
 @restricted
 async def cmd_memoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     all_facts = get_all_facts() or {}
-    lines = [f"â€¢ {k}: {v}" for k, v in all_facts.items() if not k.startswith("System_Location")]
+    lines = [f"â€¢ {k}: {v}" for k, v in all_facts.items() if not k.startswith("System_")]
     if lines:
         memory_text = "🧠 Lo que recuerdo de ti:\n\n" + "\n".join(lines)
         if len(memory_text) > 4000:
@@ -549,6 +585,34 @@ async def cmd_progreso(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception:
         pass
 
+    # Rendimiento del pool de conexiones PostgreSQL
+    try:
+        from db_pool import format_stats
+        lines.append("\n" + format_stats())
+    except Exception:
+        pass
+
+    # Hits/misses de la caché de consultas KB y biblioteca
+    try:
+        from ttl_cache import format_cache_stats
+        lines.append("\n" + format_cache_stats())
+    except Exception:
+        pass
+
+    # Latencia de las llamadas HTTP salientes por host
+    try:
+        from http_client import format_stats as format_http_stats
+        lines.append("\n" + format_http_stats())
+    except Exception:
+        pass
+
+    # Páginas, transcripts y Firecrawl servidos sin volver a descargar
+    try:
+        from content_cache import format_stats as format_content_stats
+        lines.append("\n" + format_content_stats())
+    except Exception:
+        pass
+
     await send_long_message(update, "\n".join(lines))
 
 
@@ -648,11 +712,10 @@ def _log_dev_commits_to_kb():
 
     # Verificar cuales SHAs ya existen en KB para no duplicar
     try:
-        conn = _get_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT content FROM knowledge_chunks WHERE source ILIKE '%CLAUDETTE_MEMORY%'")
-        existing_text = " ".join(row[0] for row in cur.fetchall() if row[0])
-        conn.close()
+        with _get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT content FROM knowledge_chunks WHERE source ILIKE '%CLAUDETTE_MEMORY%'")
+            existing_text = " ".join(row[0] for row in cur.fetchall() if row[0])
     except Exception:
         existing_text = ""
 
@@ -692,6 +755,7 @@ def main():
     app.add_handler(CommandHandler("start", show_menu))
     app.add_handler(CommandHandler("menu", show_menu))
     app.add_handler(CommandHandler("clear", cmd_clear))
+    app.add_handler(CommandHandler("contexto", cmd_contexto))
     app.add_handler(CommandHandler("profundo", cmd_profundo))
     app.add_handler(CommandHandler("normal", cmd_normal))
     app.add_handler(CommandHandler("buenosdias", cmd_buenos_dias))
@@ -777,6 +841,7 @@ def main():
             BotCommand("normal",      "Volver al modo respuestas rapidas"),
             BotCommand("memoria",     "Ver datos que Claudette recuerda de ti"),
             BotCommand("clear",       "Borrar historial de conversacion"),
+            BotCommand("contexto",    "Ver o fijar el techo de tokens del historial"),
             BotCommand("menu",        "Menu completo con todas las habilidades"),
             BotCommand("start",       "Menu completo con todas las habilidades"),
         ]
@@ -790,6 +855,20 @@ def main():
 
     app.add_error_handler(error_handler)
 
+    # Watcher del vault: notas nuevas/modificadas quedan indexadas sin kb_ingest
+    try:
+        from vault_watcher import start_vault_watcher
+        start_vault_watcher()
+    except Exception as e:
+        logger.warning(f"Vault watcher no disponible: {e}")
+
+    # Modelo de embeddings en memoria antes de la primera consulta
+    try:
+        from embeddings import warm_up_embeddings
+        warm_up_embeddings()
+    except Exception as e:
+        logger.warning(f"Embeddings no disponibles: {e}")
+
     # Auto-log de commits de desarrollo al vault
     try:
         _log_dev_commits_to_kb()
@@ -6,7 +6,9 @@ Fallback a JSON local si no hay DATABASE_URL (desarrollo local).
 
 import json
 import os
+import time
 import logging
+import threading
 
 logger = logging.getLogger("claudette")
 
@@ -34,26 +36,31 @@ except Exception as e:
 # =====================================================
 
 def _pg_connect():
-    """Crea conexion a PostgreSQL."""
-    import psycopg2
-    return psycopg2.connect(_pg_conn_string)
+    """Conexion del pool compartido. Uso: with _pg_connect() as conn."""
+    from db_pool import connection
+    return connection()
+
+
+async def run_queries_async(queries, commit=False):
+    """Consultas en el pool async (db_async), importado solo si hay PostgreSQL."""
+    from db_async import run_queries
+    return await run_queries(queries, commit=commit)
 
 
 def _pg_setup():
     """Crea tabla si no existe."""
     try:
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute("""
+        with _pg_connect() as conn:
+            cur = conn.cursor()
+            cur.execute("""
             CREATE TABLE IF NOT EXISTS user_memory (
                 key TEXT PRIMARY KEY,
                 value TEXT NOT NULL,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        conn.commit()
-        cur.close()
-        conn.close()
+            conn.commit()
+            cur.close()
         logger.info("🗄️ Tabla user_memory verificada/creada")
         return True
     except Exception as e:
@@ -72,32 +79,41 @@ if _use_postgres:
                 json_data = json.load(f)
             if json_data:
                 logger.info(f"🔄 Migrando {len(json_data)} facts de JSON a PostgreSQL...")
-                conn = _pg_connect()
-                cur = conn.cursor()
-                for k, v in json_data.items():
-                    cur.execute("""
+                with _pg_connect() as conn:
+                    cur = conn.cursor()
+                    for k, v in json_data.items():
+                        cur.execute("""
                         INSERT INTO user_memory (key, value, updated_at)
                         VALUES (%s, %s, CURRENT_TIMESTAMP)
                         ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
                     """, (k, str(v)))
-                conn.commit()
-                cur.close()
-                conn.close()
+                    conn.commit()
+                    cur.close()
                 os.rename('user_memory.json', 'user_memory.json.migrated')
                 logger.info("✅ Migración completa. JSON respaldado.")
         except Exception as e:
             logger.error(f"Error migrando JSON: {e}")
 
 
+_GET_ALL_SQL = "SELECT key, value FROM user_memory"
+_SIGNATURE_SQL = "SELECT MAX(updated_at), COUNT(*) FROM user_memory"
+_SAVE_SQL = """
+    INSERT INTO user_memory (key, value, updated_at)
+    VALUES (%s, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (key)
+    DO UPDATE SET value = EXCLUDED.value, updated_at = CURRENT_TIMESTAMP
+"""
+_DELETE_SQL = "DELETE FROM user_memory WHERE key = %s"
+
+
 def _pg_get_all():
     """Lee todos los facts desde PostgreSQL."""
     try:
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT key, value FROM user_memory")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        with _pg_connect() as conn:
+            cur = conn.cursor()
+            cur.execute(_GET_ALL_SQL)
+            rows = cur.fetchall()
+            cur.close()
         return {row[0]: row[1] for row in rows}
     except Exception as e:
         logger.error(f"PG get_all error: {e}")
@@ -107,17 +123,11 @@ def _pg_get_all():
 def _pg_save(key, value):
     """Guarda o actualiza un fact en PostgreSQL."""
     try:
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO user_memory (key, value, updated_at)
-            VALUES (%s, %s, CURRENT_TIMESTAMP)
-            ON CONFLICT (key)
-            DO UPDATE SET value = EXCLUDED.value, updated_at = CURRENT_TIMESTAMP
-        """, (key, str(value)))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with _pg_connect() as conn:
+            cur = conn.cursor()
+            cur.execute(_SAVE_SQL, (key, str(value)))
+            conn.commit()
+            cur.close()
         return True
     except Exception as e:
         logger.error(f"PG save error: {e}")
@@ -127,12 +137,11 @@ def _pg_save(key, value):
 def _pg_get(key):
     """Lee un fact especifico desde PostgreSQL."""
     try:
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT value FROM user_memory WHERE key = %s", (key,))
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+        with _pg_connect() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT value FROM user_memory WHERE key = %s", (key,))
+            row = cur.fetchone()
+            cur.close()
         return row[0] if row else None
     except Exception as e:
         logger.error(f"PG get error: {e}")
@@ -142,18 +151,112 @@ def _pg_get(key):
 def _pg_delete(key):
     """Elimina un fact de PostgreSQL."""
     try:
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM user_memory WHERE key = %s", (key,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        with _pg_connect() as conn:
+            cur = conn.cursor()
+            cur.execute(_DELETE_SQL, (key,))
+            conn.commit()
+            cur.close()
         return True
     except Exception as e:
         logger.error(f"PG delete error: {e}")
         return False
 
 
+def _pg_signature():
+    """Firma barata de la tabla: (ultimo updated_at, cantidad de filas)."""
+    try:
+        with _pg_connect() as conn:
+            cur = conn.cursor()
+            cur.execute(_SIGNATURE_SQL)
+            row = cur.fetchone()
+            cur.close()
+        return (row[0], row[1])
+    except Exception as e:
+        logger.error(f"PG signature error: {e}")
+        return None
+
+
+# =====================================================
+# CACHE EN PROCESO (evita leer user_memory en cada mensaje)
+# =====================================================
+
+FACT_CACHE_RECHECK_SECONDS = 30   # cada cuanto se verifica si alguien edito la tabla por fuera
+
+_fact_cache = {}
+_fact_cache_loaded = False
+_fact_cache_signature = None
+_fact_cache_checked_at = 0.0
+_fact_cache_lock = threading.Lock()
+
+
+def _cache_is_fresh():
+    return _fact_cache_loaded and time.monotonic() - _fact_cache_checked_at < FACT_CACHE_RECHECK_SECONDS
+
+
+def _cache_still_valid(signature):
+    """Marca el chequeo; True si la firma no cambio (o no se pudo leer) y no hace falta recargar."""
+    global _fact_cache_checked_at
+    _fact_cache_checked_at = time.monotonic()
+    return _fact_cache_loaded and (signature is None or signature == _fact_cache_signature)
+
+
+def _cache_store(signature, facts):
+    global _fact_cache, _fact_cache_loaded, _fact_cache_signature
+    if facts or signature is not None:
+        _fact_cache = facts
+        _fact_cache_signature = signature
+        _fact_cache_loaded = True
+        logger.info(f"🗄️ Cache de memoria cargado: {len(facts)} facts")
+
+
+def _cached_facts():
+    """
+    Facts desde el cache. Como mucho cada FACT_CACHE_RECHECK_SECONDS consulta
+    MAX(updated_at)/COUNT(*) y recarga la tabla solo si la firma cambio.
+    """
+    with _fact_cache_lock:
+        if _cache_is_fresh():
+            return _fact_cache
+        signature = _pg_signature()
+        if not _cache_still_valid(signature):
+            _cache_store(signature, _pg_get_all())
+        return _fact_cache
+
+
+async def _cached_facts_async():
+    """Igual que _cached_facts pero con el pool async (no bloquea el event loop)."""
+    if _cache_is_fresh():
+        return _fact_cache
+    try:
+        (row,), = await run_queries_async([(_SIGNATURE_SQL, ())])
+        signature = (row[0], row[1])
+    except Exception as e:
+        logger.error(f"PG signature error: {e}")
+        signature = None
+    if _cache_still_valid(signature):
+        return _fact_cache
+    try:
+        rows, = await run_queries_async([(_GET_ALL_SQL, ())])
+        facts = {row[0]: row[1] for row in rows}
+    except Exception as e:
+        logger.error(f"PG get_all error: {e}")
+        facts = {}
+    with _fact_cache_lock:
+        _cache_store(signature, facts)
+    return _fact_cache
+
+
+def _cache_put(key, value):
+    with _fact_cache_lock:
+        if _fact_cache_loaded:
+            _fact_cache[key] = str(value)
+
+
+def _cache_pop(key):
+    with _fact_cache_lock:
+        _fact_cache.pop(key, None)
+
+
 # =====================================================
 # JSON FALLBACK (desarrollo local)
 # =====================================================
@@ -184,21 +287,25 @@ def _json_save_all(data):
 # =====================================================
 
 def setup_database():
-    """Compatibilidad — la tabla ya se crea automaticamente al importar."""
-    pass
+    """La tabla ya se crea al importar; aqui solo se precarga el cache de facts."""
+    if _use_postgres:
+        _cached_facts()
 
 
 def get_all_facts():
     """Devuelve todo lo que el bot recuerda como un diccionario."""
     if _use_postgres:
-        return _pg_get_all()
+        return dict(_cached_facts())
     return _json_load()
 
 
 def save_fact(key, value):
     """Guarda un dato nuevo."""
     if _use_postgres:
-        return _pg_save(key, value)
+        ok = _pg_save(key, value)
+        if ok:
+            _cache_put(key, value)
+        return ok
     data = _json_load()
     data[key] = value
     _json_save_all(data)
@@ -208,7 +315,7 @@ def save_fact(key, value):
 def get_fact(key):
     """Recupera un dato especifico."""
     if _use_postgres:
-        return _pg_get(key)
+        return _cached_facts().get(key)
     data = _json_load()
     return data.get(key)
 
@@ -216,7 +323,10 @@ def get_fact(key):
 def delete_fact(key):
     """Elimina un dato."""
     if _use_postgres:
-        return _pg_delete(key)
+        ok = _pg_delete(key)
+        if ok:
+            _cache_pop(key)
+        return ok
     data = _json_load()
     if key in data:
         del data[key]
@@ -224,26 +334,65 @@ def delete_fact(key):
     return True
 
 
+async def get_all_facts_async():
+    """Versión async de get_all_facts."""
+    if _use_postgres:
+        return dict(await _cached_facts_async())
+    return _json_load()
+
+
+async def get_fact_async(key):
+    """Versión async de get_fact."""
+    if _use_postgres:
+        return (await _cached_facts_async()).get(key)
+    return _json_load().get(key)
+
+
+async def save_fact_async(key, value):
+    """Versión async de save_fact."""
+    if not _use_postgres:
+        return save_fact(key, value)
+    try:
+        await run_queries_async([(_SAVE_SQL, (key, str(value)))], commit=True)
+    except Exception as e:
+        logger.error(f"PG save error: {e}")
+        return False
+    _cache_put(key, value)
+    return True
+
+
+async def delete_fact_async(key):
+    """Versión async de delete_fact."""
+    if not _use_postgres:
+        return delete_fact(key)
+    try:
+        await run_queries_async([(_DELETE_SQL, (key,))], commit=True)
+    except Exception as e:
+        logger.error(f"PG delete error: {e}")
+        return False
+    _cache_pop(key)
+    return True
+
+
 def get_recent_facts(days: int = 7) -> dict:
     """Devuelve facts actualizados en los últimos N días (solo PostgreSQL)."""
     if not _use_postgres:
         return {}
     try:
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute(
-            """
+        with _pg_connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
             SELECT key, value, updated_at
             FROM user_memory
             WHERE updated_at >= NOW() - INTERVAL '%s days'
               AND key NOT LIKE 'System_Location_%%'
             ORDER BY updated_at DESC
             """,
-            (days,)
-        )
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+                (days,)
+            )
+            rows = cur.fetchall()
+            cur.close()
         return {row[0]: {"value": row[1], "updated_at": str(row[2])} for row in rows}
     except Exception as e:
         logger.error(f"get_recent_facts error: {e}")
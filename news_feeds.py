@@ -0,0 +1,186 @@
+"""
+Feeds RSS/Atom de noticias para Claudette Bot.
+Lo usan search_news (tool), el boletín de noticias y la síntesis semanal:
+todos comparten la misma caché, así que un feed se descarga una vez
+cada NEWS_FEED_TTL segundos aunque lo pidan los tres.
+
+- Todos los feeds se piden a la vez (un thread por feed): el peor caso es
+  un timeout, no la suma de todos.
+- GET condicional con ETag / If-Modified-Since: si el feed no cambió, el
+  servidor responde 304 y se reutilizan los items ya parseados.
+- El XML se parsea en streaming (iterparse) directo del socket y se corta
+  al llegar a FEED_MAX_ITEMS.
+
+Uso:
+    from news_feeds import news_by_category
+    news_by_category(per_category=2)   # {"GEOPOLITICA": [(titulo, link), ...], ...}
+"""
+
+import time
+import logging
+import threading
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("claudette")
+
+NEWS_FEED_TTL = 600        # segundos en que un feed se sirve de caché sin tocar la red
+FEED_TIMEOUT = 5           # segundos por feed (se piden todos en paralelo)
+FEED_MAX_ITEMS = 20        # items parseados por feed
+FEED_MAX_WORKERS = 8
+
+# RSS feeds por categoria - mas confiables que DuckDuckGo
+RSS_FEEDS = {
+    "INTELIGENCIA ARTIFICIAL": [
+        "https://hnrss.org/frontpage?points=100",
+        "https://feeds.feedburner.com/oreilly/radar",
+    ],
+    "GEOPOLITICA": [
+        "https://feeds.bbci.co.uk/mundo/internacional/rss.xml",
+        "https://rss.nytimes.com/services/xml/rss/nyt/World.xml",
+    ],
+    "MERCADOS/ECONOMIA": [
+        "https://rss.nytimes.com/services/xml/rss/nyt/Business.xml",
+        "https://feeds.bbci.co.uk/mundo/economia/rss.xml",
+    ],
+    "CIENCIA/TECNOLOGIA": [
+        "https://rss.nytimes.com/services/xml/rss/nyt/Science.xml",
+        "https://www.sciencedaily.com/rss/top/science.xml",
+    ],
+}
+
+_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class _FeedState:
+    __slots__ = ("items", "etag", "last_modified", "fetched_at", "lock")
+
+    def __init__(self):
+        self.lock = threading.Lock()   # dos pedidos simultáneos del mismo feed → una descarga
+        self.items = []
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = 0.0
+
+
+_feeds = {}                 # url → _FeedState
+_feeds_lock = threading.Lock()
+_stats = {"hits": 0, "not_modified": 0, "downloaded": 0, "errors": 0}
+
+
+def _local(tag):
+    # "{http://www.w3.org/2005/Atom}entry" → "entry"
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_feed(stream, max_items=FEED_MAX_ITEMS):
+    """Items (titulo, link) de un RSS o Atom, parseando en streaming desde un file-like."""
+    items = []
+    for _, elem in ET.iterparse(stream, events=("end",)):
+        tag = _local(elem.tag)
+        if tag not in ("item", "entry"):
+            continue
+        title, link = "", ""
+        for child in elem:
+            name = _local(child.tag)
+            if name == "title":
+                title = (child.text or "").strip()
+            elif name == "link" and not link:
+                link = (child.text or child.get("href") or "").strip()
+        elem.clear()
+        if title and link:
+            items.append((title, link))
+            if len(items) >= max_items:
+                break
+    return items
+
+
+def _state(url):
+    with _feeds_lock:
+        return _feeds.setdefault(url, _FeedState())
+
+
+def fetch_feed(url, timeout=FEED_TIMEOUT):
+    """Items de un feed: de caché si es reciente, si no GET condicional. Nunca lanza."""
+    state = _state(url)
+    with state.lock:
+        return _fetch_locked(url, state, timeout)
+
+
+def _fetch_locked(url, state, timeout):
+    if time.monotonic() - state.fetched_at < NEWS_FEED_TTL:
+        _stats["hits"] += 1
+        return state.items
+
+    headers = dict(_HEADERS)
+    if state.etag:
+        headers["If-None-Match"] = state.etag
+    if state.last_modified:
+        headers["If-Modified-Since"] = state.last_modified
+
+    t = time.perf_counter()
+    try:
+        req = urllib.request.Request(url, headers=headers)
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            items = parse_feed(resp)
+            state.etag = resp.headers.get("ETag")
+            state.last_modified = resp.headers.get("Last-Modified")
+        state.items = items
+        _stats["downloaded"] += 1
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            _stats["errors"] += 1
+            logger.debug(f"Feed {url}: HTTP {e.code}")
+            return state.items
+        _stats["not_modified"] += 1
+    except Exception as e:
+        # Sin red o XML roto: se sirven los items viejos (si hay) y se reintenta en el próximo pedido
+        _stats["errors"] += 1
+        logger.debug(f"Feed {url}: {e}")
+        return state.items
+    state.fetched_at = time.monotonic()
+    logger.debug(f"Feed {url}: {len(state.items)} items en {(time.perf_counter() - t) * 1000:.0f} ms")
+    return state.items
+
+
+def fetch_feeds(urls, timeout=FEED_TIMEOUT):
+    """{url: items} de todos los feeds, pedidos en paralelo."""
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(FEED_MAX_WORKERS, len(urls))) as pool:
+        return dict(zip(urls, pool.map(lambda u: fetch_feed(u, timeout), urls)))
+
+
+def news_by_category(per_category=2, feeds=None):
+    """
+    Titulares por categoría: {categoria: [(titulo, link), ...]}.
+    Se recorren los feeds de cada categoría en orden hasta juntar per_category.
+    """
+    feeds = feeds or RSS_FEEDS
+    t = time.perf_counter()
+    fetched = fetch_feeds(url for urls in feeds.values() for url in urls)
+    result = {}
+    for category, urls in feeds.items():
+        picked = []
+        for url in urls:
+            for title, link in fetched.get(url, [])[:per_category]:
+                if len(title) > 10:
+                    picked.append((title, link))
+                if len(picked) >= per_category:
+                    break
+            if len(picked) >= per_category:
+                break
+        if picked:
+            result[category] = picked
+    logger.info(f"📰 Feeds: {sum(map(len, result.values()))} titulares en "
+                f"{(time.perf_counter() - t) * 1000:.0f} ms ({format_feed_stats()})")
+    return result
+
+
+def format_feed_stats():
+    s = dict(_stats)
+    return (f"{s['hits']} de caché, {s['not_modified']} sin cambios (304), "
+            f"{s['downloaded']} descargados, {s['errors']} errores")
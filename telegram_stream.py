@@ -0,0 +1,136 @@
+"""
+Streaming de respuestas hacia Telegram para Claudette Bot.
+Publica un mensaje placeholder y lo va editando mientras Claude genera texto.
+Respeta el rate limit de ediciones y abre un mensaje nuevo al pasar los 4000 chars.
+"""
+
+import time
+import asyncio
+from telegram.error import BadRequest, RetryAfter, TimedOut, NetworkError
+from config import STREAM_EDIT_INTERVAL, TELEGRAM_MAX_MESSAGE, logger
+
+PLACEHOLDER = "✍️ ..."
+CURSOR = " ▌"
+
+
+def _retry_seconds(err):
+    """RetryAfter.retry_after puede venir como int o timedelta segun la version de PTB."""
+    value = err.retry_after
+    if hasattr(value, "total_seconds"):
+        return value.total_seconds()
+    return float(value)
+
+
+class TelegramStreamWriter:
+    """
+    Refleja en Telegram una respuesta que se va generando.
+    - append(): agrega texto; edita el mensaje como mucho cada STREAM_EDIT_INTERVAL segundos
+    - set_status(): muestra una linea temporal (ej: herramienta en ejecucion)
+    - finish(): ultima edicion sin cursor
+    """
+
+    def __init__(self, bot, chat_id, interval=STREAM_EDIT_INTERVAL, max_length=TELEGRAM_MAX_MESSAGE):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.interval = interval
+        self.max_length = max_length
+        self._message = None        # mensaje de Telegram que se esta editando
+        self._text = ""             # texto acumulado del mensaje actual
+        self._shown = ""            # ultimo texto efectivamente enviado a Telegram
+        self._status = ""
+        self._pending_break = False
+        self._next_edit = 0.0
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        """Publica el placeholder antes de la primera llamada a Claude."""
+        self._message = await self.bot.send_message(chat_id=self.chat_id, text=PLACEHOLDER)
+        self._shown = PLACEHOLDER
+        self._next_edit = time.monotonic() + self.interval
+
+    async def append(self, delta):
+        """Agrega texto generado y edita el mensaje si ya paso el intervalo."""
+        if not delta:
+            return
+        async with self._lock:
+            if self._pending_break and self._text.strip():
+                self._text = self._text.rstrip() + "\n\n"
+            self._pending_break = False
+            self._status = ""
+            self._text += delta
+            while len(self._text) > self.max_length:
+                await self._rollover()
+            await self._edit(self._render(cursor=True))
+
+    async def set_status(self, status):
+        """Linea temporal al final del mensaje; el texto siguiente empieza en parrafo nuevo."""
+        async with self._lock:
+            self._status = status
+            self._pending_break = True
+            await self._edit(self._render(cursor=False))
+
+    async def finish(self):
+        """Edicion final (sin cursor ni status). Espera el rate limit si hace falta."""
+        async with self._lock:
+            self._status = ""
+            final = self._text.strip() or "✅"
+            await self._edit(final, force=True)
+
+    # --- internos ---
+
+    def _render(self, cursor):
+        text = self._text
+        if self._status:
+            text = (text.rstrip() + "\n\n" + self._status) if text.strip() else self._status
+        elif cursor:
+            text += CURSOR
+        return text if text.strip() else PLACEHOLDER
+
+    async def _rollover(self):
+        """Cierra el mensaje actual en un salto de linea y continua en uno nuevo."""
+        cut = self._text.rfind('\n', 0, self.max_length)
+        if cut <= 0:
+            cut = self.max_length
+        head, tail = self._text[:cut], self._text[cut:].lstrip('\n')
+        await self._edit(head, force=True)
+        self._text = tail
+        self._message = await self.bot.send_message(chat_id=self.chat_id, text=PLACEHOLDER)
+        self._shown = PLACEHOLDER
+        self._next_edit = time.monotonic() + self.interval
+
+    async def _edit(self, text, force=False):
+        if self._message is None:
+            self._message = await self.bot.send_message(chat_id=self.chat_id, text=text)
+            self._shown = text
+            self._next_edit = time.monotonic() + self.interval
+            return
+        if text == self._shown:
+            return
+
+        wait = self._next_edit - time.monotonic()
+        if wait > 0:
+            if not force:
+                return
+            await asyncio.sleep(wait)
+
+        for attempt in range(3):
+            try:
+                await self._message.edit_text(text)
+                self._shown = text
+                break
+            except RetryAfter as e:
+                delay = _retry_seconds(e)
+                logger.warning(f"Telegram rate limit en edicion: esperar {delay}s")
+                if not force:
+                    self._next_edit = time.monotonic() + delay
+                    return
+                await asyncio.sleep(delay)
+            except BadRequest as e:
+                if "not modified" not in str(e).lower():
+                    logger.warning(f"Stream edit rechazado: {e}")
+                break
+            except (TimedOut, NetworkError) as e:
+                logger.warning(f"Stream edit error de red: {e}")
+                if not force:
+                    break
+        self._next_edit = time.monotonic() + self.interval
@@ -5,14 +5,18 @@ Portado completo desde bot.py monolítico.
 """
 
 import os
+import time
 import asyncio
 import tempfile
 import logging
 import requests
+import http_client
+import content_cache
 from datetime import datetime
-from config import OPENAI_API_KEY, OPENWEATHER_API_KEY, DEFAULT_LOCATION, FIRECRAWL_API_KEY, logger
-from memory_manager import save_fact, get_fact
-from library import search_library, search_by_author, search_by_tag, get_book_content, get_library_stats
+from config import OPENAI_API_KEY, OPENWEATHER_API_KEY, DEFAULT_LOCATION, FIRECRAWL_API_KEY, TOOL_TIMEOUT, VERIFY_DEADLINE, logger
+from memory_manager import save_fact, save_fact_async, get_fact
+from library import (search_library_async, search_by_author_async, search_by_tag_async,
+                     get_book_content_async, get_library_stats_async)
 from knowledge_base import KB_TOOLS_SCHEMA, execute_kb_tool
 
 # --- Imports de servicios Google ---
@@ -86,7 +90,7 @@ def get_weather(lat, lon):
         return "⚠️ No tengo configurada la API Key de OpenWeather."
     try:
         url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric&lang=es"
-        res = requests.get(url, timeout=10).json()
+        res = http_client.get(url).json()
         if res.get('cod') != 200:
             return f"Error clima: {res.get('message')}"
         desc = res['weather'][0]['description']
@@ -104,7 +108,7 @@ def get_weather_by_city(city_name: str) -> str:
         return "No tengo la API Key de OpenWeather."
     try:
         url = f"https://api.openweathermap.org/data/2.5/weather?q={city_name}&appid={OPENWEATHER_API_KEY}&units=metric&lang=es"
-        res = requests.get(url, timeout=10).json()
+        res = http_client.get(url).json()
         if res.get('cod') != 200:
             return f"No encontre el clima para '{city_name}': {res.get('message')}"
         desc = res['weather'][0]['description']
@@ -150,58 +154,15 @@ def search_news(topics=None):
     """
     Busca noticias usando RSS feeds directos + DuckDuckGo como fallback.
     Fuentes RSS: Reuters, BBC Mundo, El Pais, Hacker News, Financial Times
+    Los feeds se piden en paralelo y se cachean (news_feeds.py), compartidos
+    con el boletin de noticias y la sintesis semanal.
     """
-    import urllib.request
-    import xml.etree.ElementTree as ET
-    from datetime import datetime, timezone
-
-    # RSS feeds por categoria - mas confiables que DuckDuckGo
-    RSS_FEEDS = {
-        "INTELIGENCIA ARTIFICIAL": [
-            "https://hnrss.org/frontpage?points=100",
-            "https://feeds.feedburner.com/oreilly/radar",
-        ],
-        "GEOPOLITICA": [
-            "https://feeds.bbci.co.uk/mundo/internacional/rss.xml",
-            "https://rss.nytimes.com/services/xml/rss/nyt/World.xml",
-        ],
-        "MERCADOS/ECONOMIA": [
-            "https://rss.nytimes.com/services/xml/rss/nyt/Business.xml",
-            "https://feeds.bbci.co.uk/mundo/economia/rss.xml",
-        ],
-        "CIENCIA/TECNOLOGIA": [
-            "https://rss.nytimes.com/services/xml/rss/nyt/Science.xml",
-            "https://www.sciencedaily.com/rss/top/science.xml",
-        ],
-    }
+    from news_feeds import news_by_category
 
     all_news = []
-    headers = {"User-Agent": "Mozilla/5.0"}
-
-    for category, feeds in RSS_FEEDS.items():
-        cat_items = []
-        for feed_url in feeds:
-            if len(cat_items) >= 2:
-                break
-            try:
-                req = urllib.request.Request(feed_url, headers=headers)
-                with urllib.request.urlopen(req, timeout=5) as resp:
-                    xml_data = resp.read()
-                root = ET.fromstring(xml_data)
-                ns = ""
-                items = root.findall(".//item")
-                for item in items[:2]:
-                    title = item.findtext("title", "").strip()
-                    link = item.findtext("link", "").strip()
-                    if title and link and len(title) > 10:
-                        cat_items.append("  - " + title + " | " + link)
-                        if len(cat_items) >= 2:
-                            break
-            except Exception:
-                continue
-
-        if cat_items:
-            all_news.append(f"{category}:\n" + "\n".join(cat_items))
+    for category, items in news_by_category(per_category=2).items():
+        cat_items = ["  - " + title + " | " + link for title, link in items]
+        all_news.append(f"{category}:\n" + "\n".join(cat_items))
 
     # Si RSS falla, intentar DuckDuckGo
     if not all_news:
@@ -349,18 +310,21 @@ def read_local_file(filename):
 
 
 def _fetch_with_firecrawl(url):
-    """Usa Firecrawl API para extraer contenido de páginas que bloquean scraping directo."""
+    """Usa Firecrawl API para extraer contenido de páginas que bloquean scraping directo (cacheado: es pago)."""
     if not FIRECRAWL_API_KEY:
         return None
+    return content_cache.cached_fetch("firecrawl", url, lambda: _scrape_with_firecrawl(url))
+
+
+def _scrape_with_firecrawl(url):
     try:
-        resp = requests.post(
+        resp = http_client.post(
             "https://api.firecrawl.dev/v1/scrape",
             headers={
                 "Authorization": f"Bearer {FIRECRAWL_API_KEY}",
                 "Content-Type": "application/json"
             },
             json={"url": url, "formats": ["markdown"]},
-            timeout=30
         )
         if resp.status_code == 200:
             data = resp.json()
@@ -377,8 +341,25 @@ def _fetch_with_firecrawl(url):
     return None
 
 
+def _fetch_cacheable(result):
+    # Errores y avisos ("⚠️ ...", "No pude ...") no se cachean: el próximo pedido reintenta
+    return not result.startswith(("⚠️", "❌", "No pude", "No hay"))
+
+
 def fetch_url(url):
-    """Lee el contenido de una página web, tweet, artículo, etc."""
+    """
+    Lee el contenido de una página web, tweet, artículo, etc.
+    Cacheado por URL canónica en content_cache (verify_content y
+    analyze_content_deep suelen volver a pedir el mismo link).
+    """
+    key = content_cache.canonical_url(url)
+    if key.startswith("youtube:"):
+        return _download_url(url)   # transcript y metadata ya se cachean por video
+    kind = "tweet" if key.startswith("https://x.com/") else "page"
+    return content_cache.cached_fetch(kind, url, lambda: _download_url(url), cacheable=_fetch_cacheable)
+
+
+def _download_url(url):
     import re as re_mod
     try:
         headers = {
@@ -393,7 +374,7 @@ def fetch_url(url):
         if 'x.com/' in clean_url or 'twitter.com/' in clean_url:
             fx_url = clean_url.replace('x.com/', 'api.fxtwitter.com/').replace('twitter.com/', 'api.fxtwitter.com/')
             try:
-                resp = requests.get(fx_url, headers=headers, timeout=15)
+                resp = http_client.get(fx_url, headers=headers)
                 if resp.status_code == 200:
                     import json
                     data = resp.json()
@@ -417,65 +398,25 @@ def fetch_url(url):
             )
 
 
-        # Manejar URLs de YouTube - extraer transcript
-        if 'youtube.com/watch' in clean_url or 'youtu.be/' in clean_url:
-            try:
-                from youtube_transcript_api import YouTubeTranscriptApi
-                import re as re_yt
-                # Extraer video ID
-                vid_match = re_yt.search(r'(?:v=|youtu\.be/)([\w-]{11})', clean_url)
-                if vid_match:
-                    video_id = vid_match.group(1)
-                    # Intentar transcript en espanol, luego ingles, luego cualquiera
-                    transcript_list = None
-                    for lang in [['es'], ['en'], None]:
-                        try:
-                            if lang:
-                                transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=lang)
-                            else:
-                                transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-                            break
-                        except Exception:
-                            continue
-                    if transcript_list:
-                        full_text = " ".join([t["text"] for t in transcript_list])
-                        if len(full_text) > 50000:
-                            full_text = full_text[:50000] + "\n\n[... Transcript truncado — video muy largo]"
-                        # Obtener titulo via oEmbed
-                        try:
-                            oembed = requests.get(
-                                "https://www.youtube.com/oembed",
-                                params={"url": clean_url, "format": "json"},
-                                timeout=5
-                            ).json()
-                            yt_title = oembed.get("title", "Video de YouTube")
-                            yt_author = oembed.get("author_name", "")
-                        except Exception:
-                            yt_title = "Video de YouTube"
-                            yt_author = ""
-                        result = f"\U0001f4fa **{yt_title}**"
-                        if yt_author:
-                            result += f"\nCanal: {yt_author}"
-                        result += f"\n\n**Transcript:**\n{full_text}"
-                        return result
-                    else:
-                        return "No hay transcript disponible para este video de YouTube."
-            except ImportError:
-                pass
-            except Exception as e:
-                pass
-            # Fallback: extraer metadata basica
-            try:
-                oembed = requests.get(
-                    "https://www.youtube.com/oembed",
-                    params={"url": clean_url, "format": "json"},
-                    timeout=5
-                ).json()
-                return f"\U0001f4fa **{oembed.get('title', '')}**\nCanal: {oembed.get('author_name', '')}\n\n(Transcript no disponible para este video)"
-            except Exception:
-                pass
-
-        resp = requests.get(clean_url, headers=headers, timeout=15, allow_redirects=True)
+        # Manejar URLs de YouTube - transcript y metadata (compartidos con get_youtube_transcript)
+        if content_cache.canonical_url(clean_url).startswith("youtube:"):
+            from utils_security import _extract_video_id, _get_video_metadata, fetch_video_transcript
+            video_id = _extract_video_id(clean_url)
+            if video_id:
+                meta = _get_video_metadata(video_id) or {}
+                full_text = fetch_video_transcript(video_id)
+                if full_text:
+                    result = f"\U0001f4fa **{meta.get('title') or 'Video de YouTube'}**"
+                    if meta.get('author'):
+                        result += f"\nCanal: {meta['author']}"
+                    result += f"\n\n**Transcript:**\n{full_text}"
+                    if len(full_text) >= 50000:
+                        result += "\n\n[... Transcript truncado — video muy largo]"
+                    return result
+                if meta:
+                    return f"\U0001f4fa **{meta.get('title', '')}**\nCanal: {meta.get('author', '')}\n\n(Transcript no disponible para este video)"
+
+        resp = http_client.get(clean_url, headers=headers, allow_redirects=True)
         resp.raise_for_status()
 
         content_type = resp.headers.get('content-type', '')
@@ -841,7 +782,7 @@ def search_reddit(query, subreddit=None, sort='relevance', time_filter='week', l
             url = 'https://www.reddit.com/search.json'
             params = {'q': query, 'sort': sort, 't': time_filter, 'limit': limit}
 
-        resp = requests.get(url, headers=headers, params=params, timeout=15)
+        resp = http_client.get(url, headers=headers, params=params)
         resp.raise_for_status()
         data = resp.json()
 
@@ -875,40 +816,15 @@ def search_reddit(query, subreddit=None, sort='relevance', time_filter='week', l
 # =====================================================
 
 def fetch_hackernews_top(limit=10, min_points=50):
-    """Obtiene top stories de Hacker News con titulo, puntos y URL."""
+    """Obtiene top stories de Hacker News con titulo, puntos y URL (items en paralelo y cacheados)."""
+    from hackernews import top_stories
     try:
-        resp = requests.get(
-            'https://hacker-news.firebaseio.com/v0/topstories.json',
-            timeout=10
-        )
-        resp.raise_for_status()
-        story_ids = resp.json()[:50]
-
-        results = []
-        for story_id in story_ids:
-            if len(results) >= limit:
-                break
-            try:
-                item_resp = requests.get(
-                    f'https://hacker-news.firebaseio.com/v0/item/{story_id}.json',
-                    timeout=5
-                )
-                item = item_resp.json()
-                if not item or item.get('type') != 'story':
-                    continue
-                score = item.get('score', 0)
-                if score < min_points:
-                    continue
-                title = item.get('title', '')
-                url = item.get('url', f'https://news.ycombinator.com/item?id={story_id}')
-                comments = item.get('descendants', 0)
-                results.append(f'\U0001f536 **{title}**\n   {score} pts - {comments} comentarios\n   {url}')
-            except Exception:
-                continue
-
-        if not results:
+        stories = top_stories(limit, min_points)
+        if not stories:
             return 'No hay stories en HN con suficientes puntos ahora.'
 
+        results = [f'\U0001f536 **{s["title"]}**\n   {s["score"]} pts - {s["comments"]} comentarios\n   {s["url"]}'
+                   for s in stories]
         return f'\U0001f536 Hacker News - Top {len(results)} stories:\n\n' + '\n\n'.join(results)
 
     except Exception as e:
@@ -979,52 +895,85 @@ def analyze_content_deep(content, title=''):
         return f'Error en analisis profundo: {e}'
 
 
-def verify_content(url_or_text, claim=None):
+async def _verify_source(name, func, *args, **kwargs):
+    """Corre una fuente de verify_content en un thread; '' si falla. Loguea su latencia."""
+    t = time.perf_counter()
+    try:
+        result = await asyncio.to_thread(func, *args, **kwargs)
+        logger.info(f"🛡️ Veracidad {name}: {(time.perf_counter() - t) * 1000:.0f} ms")
+        return result or ""
+    except Exception as e:
+        logger.warning(f"verify_content {name} error ({(time.perf_counter() - t) * 1000:.0f} ms): {e}")
+        return ""
+
+
+async def verify_content(url_or_text, claim=None):
     """
     Escudo de Veracidad: verifica si una noticia, URL o claim es real o fake news.
     Busca el mismo tema en 3 fuentes independientes (Reddit, HN, web) y analiza
     señales lingüísticas de desinformación. Retorna veredicto estructurado.
+
+    La URL y las tres fuentes se piden a la vez; a los VERIFY_DEADLINE segundos
+    se analiza con lo que haya llegado. Sin claim, Reddit y web esperan el
+    contenido de la URL para armar la búsqueda (HN no depende de nada).
     """
-    import anthropic as _anthropic
-    from config import ANTHROPIC_API_KEY
+    from brain import client   # AsyncAnthropic compartido (import diferido: brain importa este módulo)
 
+    t = time.perf_counter()
+    deadline = time.monotonic() + VERIFY_DEADLINE
     content_to_check = ""
     source_url = None
+    tasks = {}
+
+    def remaining():
+        return max(0.0, deadline - time.monotonic())
 
     # Detectar si es URL o texto libre
     stripped = url_or_text.strip()
     if stripped.startswith("http://") or stripped.startswith("https://"):
         source_url = stripped
-        fetched = fetch_url(source_url)
-        if fetched and not fetched.startswith("⚠️") and not fetched.startswith("❌"):
-            content_to_check = fetched[:3000]
-        else:
-            content_to_check = claim or stripped
+        tasks["url"] = asyncio.create_task(_verify_source("url", fetch_url, source_url))
     else:
         content_to_check = stripped
 
-    search_query = (claim or content_to_check)[:120]
+    tasks["hn"] = asyncio.create_task(_verify_source("hn", fetch_hackernews_top, limit=5, min_points=10))
 
-    # Fuente 1: Reddit
-    reddit_data = ""
-    try:
-        reddit_data = search_reddit(search_query, limit=3)[:600]
-    except Exception:
-        pass
+    def start_searches(search_query):
+        tasks["reddit"] = asyncio.create_task(_verify_source("reddit", search_reddit, search_query, limit=3))
+        tasks["web"] = asyncio.create_task(_verify_source("web", search_web_google, search_query, max_results=3))
 
-    # Fuente 2: Hacker News
-    hn_data = ""
-    try:
-        hn_data = fetch_hackernews_top(limit=5, min_points=10)[:600]
-    except Exception:
-        pass
+    if claim or content_to_check:
+        start_searches((claim or content_to_check)[:120])
 
-    # Fuente 3: Web (Google/DuckDuckGo)
-    web_data = ""
-    try:
-        web_data = search_web_google(search_query, max_results=3)[:600]
-    except Exception:
-        pass
+    if source_url:
+        fetched = ""
+        try:
+            fetched = await asyncio.wait_for(asyncio.shield(tasks["url"]), remaining())
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Veracidad url: sin respuesta en {VERIFY_DEADLINE}s")
+        if fetched and not fetched.startswith("⚠️") and not fetched.startswith("❌"):
+            content_to_check = fetched[:3000]
+        else:
+            content_to_check = claim or stripped
+        if "reddit" not in tasks:
+            start_searches(content_to_check[:120])
+
+    # Lo que no terminó al vencer el plazo queda afuera (el thread sigue, el resultado se descarta)
+    _, pending = await asyncio.wait(tasks.values(), timeout=remaining())
+    for task in pending:
+        task.cancel()
+    late = [name for name, task in tasks.items() if task in pending]
+    if late:
+        logger.warning(f"⏱️ Veracidad: sin respuesta de {', '.join(late)} en {VERIFY_DEADLINE}s")
+    logger.info(f"🛡️ Fuentes de veracidad listas en {(time.perf_counter() - t) * 1000:.0f} ms")
+
+    def source(name):
+        task = tasks.get(name)
+        return task.result()[:600] if task and task not in pending else ""
+
+    reddit_data = source("reddit")
+    hn_data = source("hn")
+    web_data = source("web")
 
     verification_prompt = f"""Eres un detector de fake news y desinformación experto. Analiza el siguiente contenido.
 
@@ -1061,8 +1010,7 @@ Analiza y responde con este formato exacto:
 Sé directo. No inventes información que no esté en las fuentes."""
 
     try:
-        _client = _anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-        response = _client.messages.create(
+        response = await client.messages.create(
             model="claude-haiku-4-5-20251001",
             max_tokens=1500,
             messages=[{"role": "user", "content": verification_prompt}]
@@ -1490,6 +1438,33 @@ Soporta múltiples hojas en un solo archivo. El Excel se genera con:
 ]
 
 
+# Politica de ejecucion por herramienta (brain.process_chat la consulta por ronda)
+#   serial:  tiene efectos secundarios -> corre sola y en orden, nunca en paralelo
+#   timeout: segundos maximos; sin entrada se usa TOOL_TIMEOUT
+TOOL_POLICIES = {
+    "send_email":            {"serial": True},
+    "create_calendar_event": {"serial": True},
+    "create_task":           {"serial": True},
+    "save_user_fact":        {"serial": True},
+    "search_contact_and_call": {"serial": True},
+    "generate_document":     {"serial": True, "timeout": 180},
+    "generate_spreadsheet":  {"serial": True, "timeout": 180},
+    "generate_image":        {"serial": True, "timeout": 120},
+    "kb_ingest":             {"serial": True, "timeout": 300},
+    "kb_save_insight":       {"serial": True},
+    "track_mental_model":    {"serial": True},
+    "analyze_content_deep":  {"timeout": 180},
+    "verify_content":        {"timeout": 120},
+}
+
+
+def get_tool_policy(tool_name: str) -> dict:
+    """Politica efectiva de una herramienta (defaults: paralela, TOOL_TIMEOUT)."""
+    policy = {"serial": False, "timeout": TOOL_TIMEOUT}
+    policy.update(TOOL_POLICIES.get(tool_name, {}))
+    return policy
+
+
 # =====================================================
 # EJECUCIÃ“N DE HERRAMIENTAS
 # =====================================================
@@ -1545,7 +1520,7 @@ async def execute_tool(tool_name: str, tool_input: dict, chat_id: int, context):
 
         elif tool_name == "save_user_fact":
             full_key = f"{tool_input.get('category', 'General')}: {tool_input.get('key', 'Dato')}"
-            await asyncio.to_thread(save_fact, full_key, tool_input['value'])
+            await save_fact_async(full_key, tool_input['value'])
             return f"Guardado: {full_key}"
 
         elif tool_name == "search_web":
@@ -1679,19 +1654,19 @@ async def execute_tool(tool_name: str, tool_input: dict, chat_id: int, context):
                 return f"Error generando Excel: {e}"
 
         elif tool_name == "search_library":
-            return await asyncio.to_thread(search_library, tool_input['query'], tool_input.get('limit', 5))
+            return await search_library_async(tool_input['query'], tool_input.get('limit', 5))
 
         elif tool_name == "search_library_by_author":
-            return await asyncio.to_thread(search_by_author, tool_input['author'])
+            return await search_by_author_async(tool_input['author'])
 
         elif tool_name == "search_library_by_tag":
-            return await asyncio.to_thread(search_by_tag, tool_input['tag'])
+            return await search_by_tag_async(tool_input['tag'])
 
         elif tool_name == "get_book_detail":
-            return await asyncio.to_thread(get_book_content, tool_input['title'])
+            return await get_book_content_async(tool_input['title'])
 
         elif tool_name == "library_stats":
-            return await asyncio.to_thread(get_library_stats)
+            return await get_library_stats_async()
 
         elif tool_name == "search_reddit":
             return await asyncio.to_thread(
@@ -1718,11 +1693,7 @@ async def execute_tool(tool_name: str, tool_input: dict, chat_id: int, context):
             )
 
         elif tool_name == "verify_content":
-            return await asyncio.to_thread(
-                verify_content,
-                tool_input["url_or_text"],
-                claim=tool_input.get("claim")
-            )
+            return await verify_content(tool_input["url_or_text"], claim=tool_input.get("claim"))
 
         # Knowledge Base tools
         if tool_name.startswith('kb_') or tool_name == "search_everything":
@@ -0,0 +1,243 @@
+"""
+Caché en memoria LRU + TTL para resultados de tools (thread-safe).
+Lo usan las tools de lectura de la KB y la biblioteca para no repetir el
+mismo round trip a PostgreSQL cuando Claude (o los jobs matutino, semanal
+y proactivo) repiten una consulta.
+
+Invalidación por versión: kb_meta guarda un contador por fuente
+(vault_version, library_version) que el ingestor / migrate_library
+incrementan en cada insert, update o desactivación. La versión forma parte
+de la clave, así que un cambio en el vault deja obsoletas todas las entradas.
+
+Uso:
+    from ttl_cache import TTLCache, VAULT_VERSION, cached
+    KB_CACHE = TTLCache("kb", maxsize=256, ttl=600)
+
+    @cached(KB_CACHE, VAULT_VERSION)
+    def kb_search(query, limit=5): ...
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+import threading
+import functools
+from collections import OrderedDict
+
+logger = logging.getLogger("claudette")
+
+VERSION_RECHECK_SECONDS = 30   # cada cuánto se relee kb_meta (cambios de otro proceso)
+
+KB_META_DDL = "CREATE TABLE IF NOT EXISTS kb_meta (key TEXT PRIMARY KEY, value BIGINT NOT NULL DEFAULT 0)"
+
+BUMP_VERSION_SQL = """
+    INSERT INTO kb_meta (key, value) VALUES (%s, 1)
+    ON CONFLICT (key) DO UPDATE SET value = kb_meta.value + 1
+    RETURNING value
+"""
+
+_GET_VERSION_SQL = "SELECT value FROM kb_meta WHERE key = %s"
+
+_caches = []
+
+
+def normalize_query(text):
+    """Minúsculas y espacios colapsados: "  Fragilidad del  Yo" → "fragilidad del yo"."""
+    return " ".join(str(text or "").lower().split())
+
+
+class TTLCache:
+    def __init__(self, name, maxsize=256, ttl=300):
+        _caches.append(self)
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key → (expira_en, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# =====================================================
+# VERSIONES (kb_meta)
+# =====================================================
+
+class DataVersion:
+    """Contador de versión de una fuente; se relee de kb_meta cada VERSION_RECHECK_SECONDS."""
+
+    def __init__(self, key):
+        self.key = key
+        self.value = 0
+        self._checked_at = 0.0
+
+    def _stale(self):
+        return time.monotonic() - self._checked_at >= VERSION_RECHECK_SECONDS
+
+    def _store(self, rows):
+        self._checked_at = time.monotonic()
+        if rows:
+            self.value = rows[0][0]
+
+    def refresh(self):
+        if not self._stale():
+            return self.value
+        try:
+            from db_pool import run_queries
+            rows, = run_queries([(_GET_VERSION_SQL, (self.key,))])
+            self._store(rows)
+        except Exception as e:
+            self._checked_at = time.monotonic()
+            logger.debug(f"kb_meta {self.key}: {e}")
+        return self.value
+
+    async def refresh_async(self):
+        if not self._stale():
+            return self.value
+        try:
+            from db_async import run_queries
+            rows, = await run_queries([(_GET_VERSION_SQL, (self.key,))])
+            self._store(rows)
+        except Exception as e:
+            self._checked_at = time.monotonic()
+            logger.debug(f"kb_meta {self.key}: {e}")
+        return self.value
+
+    def bump(self, cur):
+        """Incrementa la versión dentro de la transacción del cursor (commit a cargo del llamador)."""
+        cur.execute(BUMP_VERSION_SQL, (self.key,))
+        row = cur.fetchone()
+        self.value = row[0] if isinstance(row, tuple) else row["value"]
+        self._checked_at = time.monotonic()
+        return self.value
+
+
+VAULT_VERSION = DataVersion("vault_version")
+LIBRARY_VERSION = DataVersion("library_version")
+
+
+# =====================================================
+# DECORADOR
+# =====================================================
+
+def _cacheable(result):
+    # Los errores no se cachean: el siguiente intento debe ir a la DB
+    return not (isinstance(result, str) and result.startswith(("❌", "Error")))
+
+
+def cached(cache, version, normalize=True):
+    """
+    Cachea una tool (sync o async) por (nombre, args normalizados, versión).
+    Las versiones sync y *_async comparten entradas.
+    normalize=False: solo colapsa espacios (rutas y títulos exactos).
+    normalize=("query",): solo esos argumentos se normalizan; el resto va tal
+    cual (p. ej. tags, que se comparan con = ANY(tags) sensible a mayúsculas).
+    version: una DataVersion o una tupla (resultados que mezclan fuentes).
+    """
+    versions = version if isinstance(version, tuple) else (version,)
+    only = set(normalize) if isinstance(normalize, (tuple, list, set)) else None
+
+    def norm(value, arg=None):
+        if not isinstance(value, str):
+            return value
+        if only is not None:
+            return normalize_query(value) if arg in only else value
+        return normalize_query(value) if normalize else " ".join(value.split())
+
+    def decorator(func):
+        name = func.__name__.removesuffix("_async")
+        signature = inspect.signature(func)
+
+        def make_key(args, kwargs):
+            # f("x", 5), f("x", limit=5) y f("x") (default 5) → misma clave
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            items = []
+            for arg, value in bound.arguments.items():
+                if isinstance(value, dict):   # **kwargs
+                    value = tuple(sorted((k, norm(v, k)) for k, v in value.items()))
+                elif isinstance(value, tuple):   # *args
+                    value = tuple(norm(v, arg) for v in value)
+                else:
+                    value = norm(value, arg)
+                items.append((arg, value))
+            return (name, tuple(items), tuple(v.value for v in versions))
+
+        async def refresh_async():
+            for v in versions:
+                await v.refresh_async()
+
+        def refresh():
+            for v in versions:
+                v.refresh()
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                await refresh_async()
+                key = make_key(args, kwargs)
+                result = cache.get(key)
+                if result is None:
+                    result = await func(*args, **kwargs)
+                    if _cacheable(result):
+                        cache.set(key, result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            refresh()
+            key = make_key(args, kwargs)
+            result = cache.get(key)
+            if result is None:
+                result = func(*args, **kwargs)
+                if _cacheable(result):
+                    cache.set(key, result)
+            return result
+        return wrapper
+
+    return decorator
+
+
+def format_cache_stats():
+    """Resumen de hits/misses de todas las cachés, para /progreso."""
+    lines = []
+    for c in _caches:
+        st = c.stats()
+        lines.append(f"   {st['name']}: {st['hits']} hits / {st['misses']} misses "
+                     f"({st['hit_rate']:.0%}) · {st['size']} entradas")
+    return "🗃️ Caché de consultas\n" + "\n".join(lines) if lines else ""
@@ -1,13 +1,15 @@
 """
 Utilidades de seguridad y YouTube para Claudette Bot.
 YouTube: Intenta transcript directo -> Supadata API -> oEmbed titulo + busqueda web.
+Transcripts y metadata se guardan en content_cache (los comparte con fetch_url).
 """
 
 from functools import wraps
 from telegram import Update
 from config import OWNER_CHAT_ID, logger
 import re
-import requests as http_requests
+import http_client
+import content_cache
 
 # --- 1. IMPORTACION BLINDADA ---
 YTApi = None
@@ -69,10 +71,16 @@ def _extract_video_id(text):
 
 # --- 4. FALLBACK: oEmbed + Web Search ---
 def _get_video_metadata(video_id):
-    """Obtiene titulo y autor del video via oEmbed (no bloqueado por YouTube)."""
+    """Obtiene titulo y autor del video via oEmbed (no bloqueado por YouTube). Cacheado."""
+    return content_cache.cached_fetch(
+        "video_meta", f"https://youtu.be/{video_id}", lambda: _download_video_metadata(video_id)
+    )
+
+
+def _download_video_metadata(video_id):
     try:
         url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-        resp = http_requests.get(url, timeout=5)
+        resp = http_client.get(url)
         if resp.status_code == 200:
             data = resp.json()
             return {
@@ -104,22 +112,18 @@ def _web_search_video_summary(video_id, title=""):
     return None
 
 
-# --- 5. FUNCION PRINCIPAL YOUTUBE ---
-def get_youtube_transcript(text):
+# --- 5. TRANSCRIPCION (directa -> Supadata), CACHEADA ---
+def fetch_video_transcript(video_id):
     """
-    Extrae contenido de un video de YouTube.
-    Estrategia:
-    1. Intentar transcripcion directa (puede fallar desde cloud IPs)
-    2. Si falla -> Supadata API (proxy externo, no bloqueado)
-    3. Si falla -> obtener titulo via oEmbed + buscar resumen en web
-    4. Si todo falla -> dar contexto minimo a Claude para que ayude
+    Texto plano de la transcripcion (max 50000 chars) o None.
+    Cacheado en content_cache: get_youtube_transcript y fetch_url comparten la entrada.
     """
-    video_id = _extract_video_id(text)
-    if not video_id:
-        return None  # No es un link de YouTube
+    return content_cache.cached_fetch(
+        "transcript", f"https://youtu.be/{video_id}", lambda: _download_transcript(video_id)
+    )
 
-    logger.info(f"YouTube detectado: {video_id}")
 
+def _download_transcript(video_id):
     # --- INTENTO 1: Transcripcion directa ---
     if YTApi:
         try:
@@ -138,7 +142,7 @@ def get_youtube_transcript(text):
 
             if full_text.strip():
                 logger.info(f"Transcripcion directa obtenida ({len(full_text)} chars)")
-                return f"TRANSCRIPCION VIDEO (https://youtube.com/watch?v={video_id}):\n{full_text[:50000]}\n(Fin de transcripcion)"
+                return full_text[:50000]
 
         except Exception as e:
             error_str = str(e)
@@ -153,7 +157,7 @@ def get_youtube_transcript(text):
     if supadata_key:
         try:
             url = f"https://api.supadata.ai/v1/youtube/transcript?url=https://youtube.com/watch?v={video_id}"
-            resp = http_requests.get(url, headers={"x-api-key": supadata_key}, timeout=15)
+            resp = http_client.get(url, headers={"x-api-key": supadata_key})
             logger.info(f"Supadata status: {resp.status_code} | body: {resp.text[:300]}")
             if resp.status_code == 200:
                 data = resp.json()
@@ -170,7 +174,7 @@ def get_youtube_transcript(text):
                     full_text = ""
                 if full_text.strip():
                     logger.info(f"Supadata transcript obtenido ({len(full_text)} chars)")
-                    return f"TRANSCRIPCION VIDEO (https://youtube.com/watch?v={video_id}):\n{full_text[:50000]}\n(Fin de transcripcion)"
+                    return full_text[:50000]
                 else:
                     logger.warning(f"Supadata: respuesta 200 pero sin texto. Data keys: {list(data.keys())}")
             else:
@@ -178,6 +182,30 @@ def get_youtube_transcript(text):
         except Exception as e:
             logger.warning(f"Supadata fallo: {e}")
 
+    return None
+
+
+# --- 6. FUNCION PRINCIPAL YOUTUBE ---
+def get_youtube_transcript(text):
+    """
+    Extrae contenido de un video de YouTube.
+    Estrategia:
+    1. Intentar transcripcion directa (puede fallar desde cloud IPs)
+    2. Si falla -> Supadata API (proxy externo, no bloqueado)
+    3. Si falla -> obtener titulo via oEmbed + buscar resumen en web
+    4. Si todo falla -> dar contexto minimo a Claude para que ayude
+    """
+    video_id = _extract_video_id(text)
+    if not video_id:
+        return None  # No es un link de YouTube
+
+    logger.info(f"YouTube detectado: {video_id}")
+
+    # --- INTENTO 1 y 2: Transcripcion directa / Supadata (cacheadas) ---
+    full_text = fetch_video_transcript(video_id)
+    if full_text:
+        return f"TRANSCRIPCION VIDEO (https://youtube.com/watch?v={video_id}):\n{full_text}\n(Fin de transcripcion)"
+
     # --- INTENTO 3: oEmbed (titulo) + Web Search (resumen) ---
     logger.info("Intentando fallback: oEmbed + web search...")
 
@@ -0,0 +1,175 @@
+"""
+Watcher del vault de Obsidian para Claudette Bot.
+Re-indexa en vivo las notas que cambian (sync_vault.ps1, kb_save_insight,
+ediciones manuales) sin esperar a que alguien pida kb_ingest.
+
+- inotify vía watchdog si está instalado; si no, escaneo por stat cada
+  VAULT_WATCH_POLL_INTERVAL segundos.
+- Las ráfagas de eventos se agrupan (VAULT_WATCH_DEBOUNCE) y el lote pasa
+  por _ObsidianIngestor.ingest_files en un thread propio.
+- Borrados y renombres desactivan el documento (is_active = FALSE) sin
+  escanear todo el vault.
+
+Uso (main.py):
+    from vault_watcher import start_vault_watcher
+    start_vault_watcher()
+"""
+
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+
+from config import VAULT_WATCH, VAULT_WATCH_DEBOUNCE, VAULT_WATCH_POLL_INTERVAL
+
+logger = logging.getLogger("claudette")
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+    FileSystemEventHandler = object
+
+_watcher = None
+
+
+class VaultWatcher:
+    def __init__(self, vault_path: str):
+        from knowledge_base import _ObsidianIngestor
+        self.vault = Path(vault_path)
+        self.ingestor = _ObsidianIngestor(vault_path)
+        self._pending = set()
+        self._last_event = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._observer = None
+        self._snapshot = {}
+
+    # ── Eventos ────────────────────────────────
+
+    def _is_note(self, path: str) -> bool:
+        p = Path(path)
+        if p.suffix.lower() != ".md":
+            return False
+        try:
+            rel = p.relative_to(self.vault)
+        except ValueError:
+            return False
+        return not any(part.startswith(".") for part in rel.parts)
+
+    def notify(self, *paths: str):
+        """Encola rutas cambiadas; el worker decide al vaciar si existen o se borraron."""
+        notes = [p for p in paths if p and self._is_note(p)]
+        if not notes:
+            return
+        with self._lock:
+            self._pending.update(notes)
+            self._last_event = time.monotonic()
+        self._wakeup.set()
+
+    # ── Worker ─────────────────────────────────
+
+    def _worker(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            # Debounce: esperar a que la ráfaga se calme
+            while not self._stop.is_set():
+                with self._lock:
+                    quiet = time.monotonic() - self._last_event
+                if quiet >= VAULT_WATCH_DEBOUNCE:
+                    break
+                time.sleep(VAULT_WATCH_DEBOUNCE - quiet)
+            with self._lock:
+                batch, self._pending = self._pending, set()
+                self._wakeup.clear()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        present = [Path(p) for p in batch if os.path.exists(p)]
+        removed = [str(Path(p).relative_to(self.vault)) for p in batch if not os.path.exists(p)]
+        try:
+            t = time.perf_counter()
+            counts = {}
+            if present:
+                counts.update(self.ingestor.ingest_files(present))
+            if removed:
+                counts["deactivated"] = self.ingestor.deactivate_files(removed)
+            logger.info(
+                f"📚 Vault watcher: {len(present)} re-indexados, {len(removed)} borrados "
+                f"({time.perf_counter() - t:.2f}s) {counts}"
+            )
+        except Exception as e:
+            logger.error(f"Vault watcher: error re-indexando {len(batch)} archivos: {e}")
+
+    # ── Fuentes de eventos ─────────────────────
+
+    def _poll(self):
+        """Fallback sin inotify: compara snapshots de (ruta → mtime)."""
+        self._snapshot = {str(p): m for p, m in self.ingestor._scan().values()}
+        while not self._stop.wait(VAULT_WATCH_POLL_INTERVAL):
+            try:
+                current = {str(p): m for p, m in self.ingestor._scan().values()}
+            except Exception as e:
+                logger.warning(f"Vault watcher: error escaneando: {e}")
+                continue
+            changed = [p for p, m in current.items() if self._snapshot.get(p) != m]
+            removed = [p for p in self._snapshot if p not in current]
+            self._snapshot = current
+            self.notify(*changed, *removed)
+
+    def start(self):
+        threading.Thread(target=self._worker, name="vault-watcher", daemon=True).start()
+        if WATCHDOG_AVAILABLE:
+            try:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.schedule(_VaultEventHandler(self), str(self.vault), recursive=True)
+                self._observer.start()
+                logger.info(f"👁️ Vault watcher (inotify) activo en {self.vault}")
+                return
+            except Exception as e:
+                logger.warning(f"Vault watcher: inotify no disponible ({e}), usando polling")
+                self._observer = None
+        threading.Thread(target=self._poll, name="vault-watcher-poll", daemon=True).start()
+        logger.info(f"👁️ Vault watcher (polling {VAULT_WATCH_POLL_INTERVAL}s) activo en {self.vault}")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._observer:
+            self._observer.stop()
+
+
+_CONTENT_EVENTS = ("created", "modified", "deleted", "moved", "closed")
+
+
+class _VaultEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: VaultWatcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        # Solo cambios de contenido: opened/closed_no_write (watchdog >= 4) los genera
+        # el propio ingestor al leer las notas y re-encolarían el lote para siempre
+        if event.is_directory or event.event_type not in _CONTENT_EVENTS:
+            return
+        # moved: el origen queda como borrado y el destino como nuevo
+        self.watcher.notify(event.src_path, getattr(event, "dest_path", ""))
+
+
+def start_vault_watcher():
+    """Arranca el watcher si hay vault configurado. Retorna el watcher o None."""
+    global _watcher
+    vault_path = os.environ.get("OBSIDIAN_VAULT_PATH")
+    if not VAULT_WATCH or not vault_path or not os.path.isdir(vault_path):
+        logger.info("Vault watcher desactivado (VAULT_WATCH=0 o sin OBSIDIAN_VAULT_PATH)")
+        return None
+    if _watcher is None:
+        _watcher = VaultWatcher(vault_path)
+        _watcher.start()
+    return _watcher